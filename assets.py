@@ -0,0 +1,210 @@
+"""The asset module.
+
+The images of the GUI (the icons in ./gui/icons) are opened and resized with PIL. Decoding a PNG
+and resampling it is slow compared to the rest of the creation of a tab, so each image is
+decoded and resized once per process (see load_image()):
+
+* The resized image (a PIL image) and the image given to Tk (an ImageTk.PhotoImage) are kept in memory:
+  opening a tab or a window again costs no image decoding.
+* Optionally, the resized images are also saved on disk, in the directory specified by the setting
+  icon_cache of the configuration file (leave it empty to disable the cache on disk). The next time
+  the application runs, the small resized image is read instead of the source image. The name of
+  a file of the cache contains the modification time of the source image and the target size:
+  a file of the cache is never used after the source image is modified.
+
+When you run this file as a Python script, the instructions after the
+statement if __name__ == "__main__": are executed: they show how long it takes
+to load an image with and without the cache.
+
+    python assets.py
+"""
+
+import os
+import sys
+import time
+
+from PIL import Image, ImageTk
+
+# The directory of the icons of the GUI.
+ICONS_DIR = "./gui/icons"
+
+# The resized images (PIL images) already loaded: (path, size, alpha) -> PIL.Image.
+_images = {}
+
+# The images already given to Tk: (path, size, alpha, root window) -> ImageTk.PhotoImage.
+# A Tk image belongs to a window (and disappears with it), hence the window in the key.
+# The dictionary also keeps a reference to the images: Tk doesn't show an image that has
+# been garbage collected.
+_photo_images = {}
+
+# The directory of the cache on disk, "" if the cache on disk is disabled; None if the
+# configuration has not been read yet (see get_cache_dir()).
+_cache_dir = None
+
+def load_cache_dir(config=None):
+    """Returns the directory of the cache on disk specified in the configuration.
+
+    Parameters
+    ----------
+    config : dictionary, optional
+        The application configuration (default: the configuration loaded from ./config/config).
+
+    Returns
+    -------
+    string
+        The directory of the cache ("" if the cache on disk is disabled, or if the configuration
+        can't be read).
+    """
+    if config is None:
+        # Imported here: utils imports this module.
+        import utils
+        try:
+            config = utils.load_config()
+        except OSError:
+            config = {}
+    return config.get("icon_cache", "")
+
+def get_cache_dir():
+    """Returns the directory of the cache on disk ("" if it is disabled).
+
+    The configuration is read the first time the function is called.
+    """
+    global _cache_dir
+    if _cache_dir is None:
+        _cache_dir = load_cache_dir()
+    return _cache_dir
+
+def _cache_file(path, size, alpha):
+    """Returns the path to the file of the cache on disk that contains the resized image.
+
+    The name of the file contains the name and the modification time of the source image,
+    the target size and the alpha value.
+    """
+    name = os.path.splitext(os.path.basename(path))[0]
+    mtime = os.stat(path).st_mtime_ns
+    suffix = "" if alpha is None else "-a{}".format(alpha)
+    return os.path.join(get_cache_dir(), "{}-{}-{}x{}{}.png".format(name, mtime, size[0], size[1], suffix))
+
+def _resize(path, size, alpha):
+    """Opens the source image and resizes it.
+    """
+    image = Image.open(path)
+    image = image.resize(size, Image.Resampling.LANCZOS)
+    if alpha is not None:
+        image.putalpha(alpha)
+    return image
+
+def get_image(path, size, alpha=None):
+    """Returns an image resized to the given size, as a PIL image.
+
+    The image is decoded and resized the first time only; the result is kept in memory (and
+    on disk, if the cache on disk is enabled).
+
+    Parameters
+    ----------
+    path : string
+        The path to the source image.
+    size : tuple
+        The target size (width, height).
+    alpha : int, optional
+        If specified, the transparency (0-255) of the whole image (default: None, the transparency
+        of the source image).
+
+    Returns
+    -------
+    PIL.Image
+        The resized image. The image is shared: it must not be modified.
+    """
+    key = (path, size, alpha)
+    image = _images.get(key)
+    if image is not None:
+        return image
+
+    if not get_cache_dir():
+        image = _resize(path, size, alpha)
+    else:
+        cache_file = _cache_file(path, size, alpha)
+        try:
+            image = Image.open(cache_file)
+            image.load()
+        except (OSError, ValueError):
+            image = _resize(path, size, alpha)
+            # The image is written into a temporary file, then renamed: another instance of
+            # the application never reads a file that is partially written.
+            try:
+                os.makedirs(get_cache_dir(), exist_ok=True)
+                tmp_file = "{}.{}.tmp".format(cache_file, os.getpid())
+                image.save(tmp_file, format="PNG")
+                os.replace(tmp_file, cache_file)
+            except OSError as e:
+                print("The icon {} can't be saved into the cache: {}".format(path, e))
+
+    _images[key] = image
+    return image
+
+def load_image(path, size, alpha=None, master=None):
+    """Returns an image resized to the given size, ready to be shown in a widget.
+
+    The image is created once per window: the next calls with the same arguments
+    return the same image.
+
+    Parameters
+    ----------
+    path : string
+        The path to the source image.
+    size : tuple
+        The target size (width, height).
+    alpha : int, optional
+        If specified, the transparency (0-255) of the whole image (default: None).
+    master : tkinter widget, optional
+        A widget of the window where the image is shown (default: None, the first window of the application).
+
+    Returns
+    -------
+    ImageTk.PhotoImage
+        The image.
+    """
+    root = None if master is None else master.winfo_toplevel()
+    key = (path, size, alpha, root)
+    photo_image = _photo_images.get(key)
+    if photo_image is None:
+        photo_image = ImageTk.PhotoImage(get_image(path, size, alpha), master=master)
+        _photo_images[key] = photo_image
+    return photo_image
+
+def clear():
+    """Empties the cache in memory (the cache on disk is kept).
+    """
+    global _cache_dir
+    _images.clear()
+    _photo_images.clear()
+    _cache_dir = None
+
+# Entry point of the asset module: loads the logo of the application (the largest icon)
+# without cache, from the cache on disk and from the cache in memory.
+if __name__ == "__main__":
+
+    path = os.path.join(ICONS_DIR, "skisati-logo.png")
+    size = (400, 400)
+    runs = 20
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        _resize(path, size, 128)
+    print("Without cache: {:.2f} ms per image".format((time.perf_counter() - start) * 1000 / runs))
+
+    if get_cache_dir():
+        get_image(path, size, 128)
+        start = time.perf_counter()
+        for _ in range(runs):
+            _images.clear()
+            get_image(path, size, 128)
+        print("From the cache on disk ({}): {:.2f} ms per image".format(get_cache_dir(),
+            (time.perf_counter() - start) * 1000 / runs))
+    else:
+        print("The cache on disk is disabled (setting icon_cache)", file=sys.stderr)
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        get_image(path, size, 128)
+    print("From the cache in memory: {:.4f} ms per image".format((time.perf_counter() - start) * 1000 / runs))
@@ -1,9 +1,36 @@
 """The authentication module.
 
+The verification of a password is slow on purpose (pbkdf2 with many rounds): the GUI must not 
+call login_correct() from the Tk event loop, but start_login_check(), that verifies the 
+password in a background thread.
+
+The number of pbkdf2 rounds is read from the configuration file (setting pbkdf2_rounds). 
+It can be chosen for the host with the calibration command, that measures the time of a 
+verification and picks the number of rounds that takes about the target time:
+
+    python authentication.py --calibrate
+    python authentication.py --calibrate --target=500
+
+Many accounts can be created at once from a CSV file (one account per line: username,password) 
+with the provisioning command; the passwords are encrypted in parallel by a pool of processes:
+
+    python authentication.py --provision accounts.csv
+    python authentication.py --provision accounts.csv --processes=4
+
+When the number of rounds changes, the passwords already stored are encrypted again, with the new 
+number of rounds, the next time their owner logs in (see update_password_hash()): no password 
+needs to be reset.
 """
 
 from passlib.context import CryptContext
+import csv
+import multiprocessing
+import queue
 import sqlite3
+import sys
+import threading
+import time
+import db
 import utils
 
 # Error code used when a specified username 
@@ -17,12 +44,68 @@ INCORRECT_PASSWORD = 2
 # username.
 DUPLICATE_USERNAME = 3
 
+# Error code used when a username doesn't meet the validity criteria (see utils.username_ok()).
+INVALID_USERNAME = 4
+
+# Error code used when a password doesn't meet the validity criteria (see utils.password_ok()).
+INVALID_PASSWORD = 5
+
+# Number of pbkdf2 rounds used when the setting pbkdf2_rounds is missing from the configuration file.
+DEFAULT_ROUNDS = 30000
+
+# The calibration command never picks fewer rounds than this.
+MIN_ROUNDS = 10000
+
+# Default target time (in milliseconds) of a password verification, for the calibration command.
+CALIBRATION_TARGET = 250
+
+def make_context(rounds):
+    """Returns the object used to encrypt and verify the passwords.
+
+    The passwords encrypted with another number of rounds are still verified, but 
+    pwd_context.needs_update() is True for them: they are encrypted again at the next login.
+
+    Parameters
+    ----------
+    rounds : int
+        The number of pbkdf2 rounds.
+
+    Returns
+    -------
+    passlib.context.CryptContext
+        The object used to encrypt and verify the passwords.
+    """
+    return CryptContext(
+            schemes=["pbkdf2_sha256"],
+            default="pbkdf2_sha256",
+            pbkdf2_sha256__default_rounds=rounds,
+            # A hash with a different number of rounds (more or less) needs an update.
+            pbkdf2_sha256__min_rounds=rounds,
+            pbkdf2_sha256__max_rounds=rounds
+    )
+
+def load_rounds(config=None):
+    """Returns the number of pbkdf2 rounds specified in the configuration.
+
+    Parameters
+    ----------
+    config : dictionary, optional
+        The application configuration (default: the configuration loaded from ./config/config).
+
+    Returns
+    -------
+    int
+        The number of rounds (DEFAULT_ROUNDS if the configuration can't be read or doesn't specify it).
+    """
+    if config is None:
+        try:
+            config = utils.load_config()
+        except OSError:
+            config = {}
+    return int(config.get("pbkdf2_rounds") or DEFAULT_ROUNDS)
+
 # Specifying the encryption algorithm used to encrypt the password.
-pwd_context = CryptContext(
-        schemes=["pbkdf2_sha256"],
-        default="pbkdf2_sha256",
-        pbkdf2_sha256__default_rounds=30000
-)
+pwd_context = make_context(load_rounds())
 
 def encrypt_password(password):
     """Encrypts the given password.
@@ -79,6 +162,10 @@ def create_account(username, plain_password, cursor, conn):
 def login_correct(username, password, cursor):
     """Checks whether the given credentials are correct.
 
+    This function blocks while the password is verified: the GUI uses start_login_check() instead.
+    If the password is correct but was encrypted with another number of rounds, it is encrypted 
+    again and stored.
+
     Parameters
     ----------
     username : string
@@ -86,7 +173,7 @@ def login_correct(username, password, cursor):
     password : string
         The plain text password.
     cursor: 
-        The object used to query the database (unused in this first implementation).
+        The object used to query the database.
     
     Returns
     -------
@@ -96,42 +183,366 @@ def login_correct(username, password, cursor):
         (False, INCORRECT_PASSWORD, password) if the given password is incorrect.
  
     """
+    res = check_password(password, password_hash(username, cursor), username)
+    if res[0] and res[2] is not None:
+        update_password_hash(username, res[2], cursor, cursor.connection)
+        return (True, None, None)
+    return res
+
+def password_hash(username, cursor):
+    """Returns the encrypted password of an account.
 
-    #### CURRENT IMPLEMENTATION THAT ONLY GRANTS ACCESS TO USER admin WITH PASSWORD "Adm1n!"
-    # REMOVE THIS CODE WHEN YOU WRITE YOUR IMPLEMENTATION
+    Parameters
+    ----------
+    username : string
+        The username
+    cursor: 
+        The object used to query the database.
+
+    Returns
+    -------
+    string
+        The encrypted password, None if the given username does not exist.
+    """
     #On interroge la base de données pour avoir le mot de passe haché 
-    sql_query = "SELECT password FROM Login WHERE username = ?"
-    cursor.execute(sql_query, (username,))
+    cursor.execute("SELECT password FROM Login WHERE username = ?", (username,))
     result = cursor.fetchone()
+    return None if result is None else result[0]
+
+def check_password(password, hashed_password, username):
+    """Checks a plain text password against the encrypted password of an account.
+
+    This function is slow (it computes the pbkdf2 hash of the password), but it doesn't 
+    use the database: it can be called from any thread.
+
+    Parameters
+    ----------
+    password : string
+        The plain text password.
+    hashed_password : string
+        The encrypted password of the account (None if the account does not exist).
+    username : string
+        The username
 
+    Returns
+    -------
+    A tuple
+        The same tuple as login_correct(), except when the password is correct:
+        (True, None, new_hashed_password) if the stored password must be encrypted again 
+        (its number of rounds is not the current one), (True, None, None) otherwise.
+        The new encrypted password is stored with update_password_hash().
+    """
     #on regarde si le nom d'utilisateur existe bien
-    if result is None:
+    if hashed_password is None:
         return (False, USERNAME_NOT_FOUND, username)
-    
-    # le mot de passe enregistré est le premier
-    hashed_password_from_db = result[0]
-    
-    # On vérifie le mot de passe en clair par rapport au haché
-    # la variable `pwd_context` est accessible 
-    if pwd_context.verify(password, hashed_password_from_db):
-        return (True, None, None) # le password correspond
-    else:
-        return (False, INCORRECT_PASSWORD, password) #si le password ne marche pas 
-    
-    ############ TODO: WRITE HERE THE CODE TO IMPLEMENT THIS FUNCTION ##########
-    # The function must check whether an account with the given username and password 
-    # exists in table Login. Remember that the password passed as an argument is not encrypted!
-    # REMOVE THE CODE ABOVE WHEN YOU WRITE YOUR IMPLEMENTATION 
 
+    # On vérifie le mot de passe en clair par rapport au haché ; si le haché ne suit plus 
+    # la politique courante (nombre de rounds), passlib renvoie aussi le nouveau haché
+    correct, new_hashed_password = pwd_context.verify_and_update(password, hashed_password)
+    if correct:
+        return (True, None, new_hashed_password) # le password correspond
+    return (False, INCORRECT_PASSWORD, password) #si le password ne marche pas 
 
-    ####################################################################################
+def update_password_hash(username, hashed_password, cursor, conn):
+    """Replaces the encrypted password of an account (e.g., after a change of the number of rounds).
+
+    Parameters
+    ----------
+    username : string
+        The username
+    hashed_password : string
+        The new encrypted password.
+    cursor : 
+        The object used to query the database
+    conn : 
+        The object used to connect to the database.
+
+    Returns
+    -------
+    bool
+        True if the password has been replaced, False if a database error occurred.
+    """
+    try:
+        cursor.execute("UPDATE Login SET password = ? WHERE username = ?", (hashed_password, username))
+        conn.commit()
+    except sqlite3.Error as error:
+        conn.rollback()
+        print(error)
+        return False
+    return True
+
+def start_login_check(username, password, cursor):
+    """Checks the given credentials in a background thread.
+
+    The encrypted password is read from the database in the calling thread (the cursor 
+    can only be used by the thread that created its connection); the password is verified 
+    in a background thread.
+
+    Parameters
+    ----------
+    username : string
+        The username
+    password : string
+        The plain text password.
+    cursor: 
+        The object used to query the database.
+
+    Returns
+    -------
+    queue.Queue
+        The queue that receives the result of the check: the same tuple as check_password(). 
+        If the password must be encrypted again, the caller stores the new encrypted password 
+        with update_password_hash() (in the thread of the cursor).
+        If a database error occurs, the queue receives the tuple (False, None, error).
+    """
+    result = queue.Queue()
+    try:
+        hashed_password = password_hash(username, cursor)
+    except sqlite3.Error as error:
+        print(error)
+        result.put((False, None, error))
+        return result
+
+    # Daemon thread: it doesn't prevent the application from exiting.
+    threading.Thread(target=lambda: result.put(check_password(password, hashed_password, username)),
+        name="login-check", daemon=True).start()
+    return result
+
+def calibrate(target, samples=5):
+    """Returns the number of pbkdf2 rounds for which a password verification takes about the target time on this host.
+
+    Parameters
+    ----------
+    target : float
+        The target time of a verification, in milliseconds.
+    samples : int, optional
+        The number of measured verifications (default: 5); the fastest one is kept.
+
+    Returns
+    -------
+    A tuple T
+        T[0] is the number of rounds (a multiple of 1000, at least MIN_ROUNDS).
+        T[1] is the measured time of a verification with T[0] rounds, in milliseconds.
+    """
+    # The time of a verification is proportional to the number of rounds: we measure it 
+    # for MIN_ROUNDS rounds and we extrapolate.
+    def measure(rounds):
+        context = make_context(rounds)
+        hashed_password = context.hash("Calibrat1on!")
+        timings = []
+        for _ in range(samples):
+            start = time.perf_counter()
+            context.verify("Calibrat1on!", hashed_password)
+            timings.append(time.perf_counter() - start)
+        return min(timings) * 1000
+
+    rounds = max(MIN_ROUNDS, int(target / measure(MIN_ROUNDS) * MIN_ROUNDS) // 1000 * 1000)
+    return (rounds, measure(rounds))
+
+def save_rounds(rounds, config_file="./config/config"):
+    """Writes the number of pbkdf2 rounds into the configuration file (setting pbkdf2_rounds).
+
+    Parameters
+    ----------
+    rounds : int
+        The number of rounds.
+    config_file : string, optional
+        The path to the configuration file (default: ./config/config).
+    """
+    with open(config_file, mode="r", encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    lines = [line for line in lines if line.split(",")[0].strip() != "pbkdf2_rounds"]
+    lines.append("pbkdf2_rounds,{}".format(rounds))
+    with open(config_file, mode="w", encoding="utf-8") as f:
+        f.write("\n".join(lines))
+
+def read_accounts(csv_file):
+    """Reads the accounts to create from a CSV file.
+
+    Each line of the file contains a username and a password, separated by a comma.
+    The first line is ignored if it is the header username,password.
+
+    Parameters
+    ----------
+    csv_file : string
+        The path to the CSV file.
+
+    Returns
+    -------
+    list
+        Each item of the list is a tuple (username, plain_password).
+    """
+    accounts = []
+    with open(csv_file, mode="r", encoding="utf-8", newline="") as f:
+        for row in csv.reader(f, delimiter=","):
+            # ignore les lignes vides
+            if not row:
+                continue
+            username = row[0].strip()
+            password = row[1].strip() if len(row) > 1 else ""
+            if not accounts and (username, password) == ("username", "password"):
+                continue
+            accounts.append((username, password))
+    return accounts
+
+def _init_hash_worker(rounds):
+    """Initializes a process of the pool used by create_accounts().
+
+    The process encrypts the passwords with the number of rounds of the parent process, 
+    whatever the configuration file it reads.
+    """
+    global pwd_context
+    pwd_context = make_context(rounds)
+
+def _hash_account(account):
+    """Encrypts the password of an account; invoked in a process of the pool used by create_accounts().
+
+    Parameters
+    ----------
+    account : tuple
+        A tuple (username, plain_password).
+
+    Returns
+    -------
+    A tuple
+        (username, encrypted_password).
+    """
+    username, plain_password = account
+    return (username, encrypt_password(plain_password))
+
+def create_accounts(accounts, cursor, conn, processes=None):
+    """Creates many accounts at once.
+
+    The accounts are validated first (utils.username_ok(), utils.password_ok(), unique usernames), 
+    then the passwords are encrypted in parallel by a pool of processes (encrypting a password is 
+    slow on purpose, and a single Python process only uses one CPU core), and finally the accounts 
+    are inserted in a single transaction.
+
+    Parameters
+    ----------
+    accounts : list
+        Each item of the list is a tuple (username, plain_password).
+    cursor : 
+        The object used to query the database
+    conn : 
+        The object used to connect to the database.
+    processes : int, optional
+        The number of processes of the pool (default: the number of CPU cores).
+
+    Returns
+    -------
+    dictionary
+        "created": the number of accounts created.
+        "rejected": the list of the accounts that were not created, as tuples (username, error code);
+        the error code is INVALID_USERNAME, INVALID_PASSWORD or DUPLICATE_USERNAME.
+        "seconds": the duration of the provisioning.
+        "throughput": the number of accounts created per second.
+        If a database error occurs, no account is created and the function returns None.
+    """
+    start = time.perf_counter()
+    report = {"created": 0, "rejected": [], "seconds": 0.0, "throughput": 0.0}
+
+    # Validation, before the (slow) encryption of the passwords.
+    try:
+        cursor.execute("SELECT username FROM Login")
+        usernames = set(row[0] for row in cursor.fetchall())
+    except sqlite3.Error as error:
+        print(error)
+        return None
+    valid_accounts = []
+    for username, plain_password in accounts:
+        if not utils.username_ok(username):
+            report["rejected"].append((username, INVALID_USERNAME))
+        elif not utils.password_ok(plain_password):
+            report["rejected"].append((username, INVALID_PASSWORD))
+        elif username in usernames:
+            report["rejected"].append((username, DUPLICATE_USERNAME))
+        else:
+            usernames.add(username)
+            valid_accounts.append((username, plain_password))
+
+    # Encryption of the passwords, in parallel.
+    hashed_accounts = []
+    if valid_accounts:
+        rounds = pwd_context.to_dict()["pbkdf2_sha256__default_rounds"]
+        with multiprocessing.Pool(processes, initializer=_init_hash_worker, initargs=(rounds,)) as pool:
+            hashed_accounts = pool.map(_hash_account, valid_accounts, 
+                chunksize=max(1, len(valid_accounts) // (4 * (processes or multiprocessing.cpu_count()))))
+
+    # Insertion of all the accounts in a single transaction.
+    cursor.execute("BEGIN")
+    try:
+        cursor.executemany("INSERT INTO Login (username, password) VALUES (?, ?)", hashed_accounts)
+    except sqlite3.Error as error:
+        conn.rollback()
+        print(error)
+        return None
+    conn.commit()
+
+    report["created"] = len(hashed_accounts)
+    report["seconds"] = time.perf_counter() - start
+    if report["seconds"] > 0:
+        report["throughput"] = report["created"] / report["seconds"]
+    return report
 
 # Entry point of this module.
-# When we execute this file, the following instructions are executed that trigger a procedure to 
+# When we execute this file with the option --calibrate, the number of pbkdf2 rounds is calibrated 
+# for this host and written into the configuration file:
+#
+#   python authentication.py --calibrate [--target=MILLISECONDS]
+#
+# With the option --provision, the accounts listed in a CSV file are created:
+#
+#   python authentication.py --provision CSV_FILE [--processes=N]
+#
+# Otherwise, the following instructions are executed that trigger a procedure to 
 # create an account.
 # The user is prompted to enter the username and the password in the Visual Studio Code terminal;
 # the password is encrypted and the credentials are added to the database.
-if __name__ == "__main__":
+if __name__ == "__main__" and "--calibrate" in sys.argv:
+
+    target = CALIBRATION_TARGET
+    for arg in sys.argv:
+        if arg.startswith("--target="):
+            target = float(arg.split("=", 1)[1])
+
+    rounds, milliseconds = calibrate(target)
+    print("{} rounds: a password verification takes {:.0f} ms (target: {:.0f} ms, current setting: {} rounds)".format(
+        rounds, milliseconds, target, load_rounds()))
+    save_rounds(rounds)
+    print("The setting pbkdf2_rounds has been written into ./config/config; "
+        "the stored passwords are encrypted again at the next login.")
+
+elif __name__ == "__main__" and "--provision" in sys.argv:
+
+    processes = None
+    for arg in sys.argv:
+        if arg.startswith("--processes="):
+            processes = int(arg.split("=", 1)[1])
+    csv_file = sys.argv[sys.argv.index("--provision") + 1]
+
+    config = utils.load_config()
+    messages_bundle = utils.load_messages_bundle(config["bundle"] + config["lang"])
+    conn = db.connect(config=config)
+    cursor = conn.cursor()
+    db.create_database(conn, cursor)
+
+    report = create_accounts(read_accounts(csv_file), cursor, conn, processes)
+    if report is None:
+        print(messages_bundle["account_error"])
+    else:
+        reasons = {INVALID_USERNAME: messages_bundle["enter_username"], 
+            INVALID_PASSWORD: messages_bundle["enter_password"], 
+            DUPLICATE_USERNAME: messages_bundle["duplicate_username"]}
+        for username, error_code in report["rejected"]:
+            print("{}: {}".format(username, reasons[error_code]))
+        print("{} account(s) created, {} rejected in {:.2f} s ({:.1f} accounts/s)".format(report["created"], 
+            len(report["rejected"]), report["seconds"], report["throughput"]))
+
+    cursor.close()
+    conn.close()
+
+elif __name__ == "__main__":
 
     from utils import load_config
     from utils import load_messages_bundle
@@ -144,7 +555,7 @@ if __name__ == "__main__":
     messages_bundle = load_messages_bundle(config["bundle"] + config["lang"])
 
     # Connects to the database.
-    conn = sqlite3.connect(config["db"])
+    conn = db.connect(config=config)
     
     # Get the cursor for the connection. This object is used to execute queries 
     # in the database.
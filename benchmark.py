@@ -0,0 +1,625 @@
+"""The benchmark module.
+
+It measures the latency of the lookups performed by the SkisatiResa application
+on databases of different sizes.
+
+When you run this file as a Python script, the instructions after the
+statement if __name__ == "__main__": are executed.
+For each scale (number of students), a temporary database is created and filled with
+synthetic data.
+
+* The benchmark indexes times the lookups without the secondary indexes, then with the secondary indexes
+created by db.create_indexes().
+* The benchmark reminders compares the selection of the payment reminders with one query per unpaid 
+registration (the former implementation of mdeadline._late_payment_registrations()) and with the single 
+set-based query of mdeadline._late_payment_registrations(). The scale is the number of unpaid registrations.
+* The benchmark load compares the throughput of the two ETL load paths (DataFrame.to_sql() and the bulk load).
+* The benchmark suite times the public functions of the modules mstudent, mregistration and mdeadline 
+and a full ETL run. The latency percentiles and the throughput are saved as JSON and can be compared 
+against a baseline (a previous JSON file) to detect regressions.
+
+    python benchmark.py
+    python benchmark.py 10000 100000
+    python benchmark.py load 100000
+    python benchmark.py reminders 100000
+    python benchmark.py suite --output=baseline.json
+    python benchmark.py suite 1000 10000 --baseline=baseline.json
+"""
+
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+import db
+import mstudent as mstud
+import mregistration as mreg
+
+# The default scales (number of students).
+SCALES = [10000, 100000, 1000000]
+
+# The default scales of the benchmark reminders (number of unpaid registrations).
+REMINDER_SCALES = [100000]
+
+# The default scales of the benchmark suite (number of students).
+SUITE_SCALES = [1000, 10000, 100000]
+
+# Number of lookups timed for each function.
+NB_LOOKUPS = 200
+
+# Number of runs timed for the long operations (deadline management, ETL).
+NB_RUNS = 3
+
+# Default tolerance when comparing the suite results against a baseline (see compare()).
+TOLERANCE = 0.2
+
+# A slowdown smaller than this (in milliseconds) is considered as noise, whatever the ratio.
+MIN_SLOWDOWN_MS = 0.05
+
+# The Skisati editions of the synthetic database.
+YEARS = ["2018", "2019", "2020", "2021", "2022", "2023"]
+
+# The associations of the synthetic database.
+ASSOCIATIONS = ["BDE", "BDA", "BDS", "EsirBEP", "Club Roll&Draw"]
+
+def synthetic_rows(nb_students):
+    """Generates the rows of a synthetic database.
+
+    Parameters
+    ----------
+    nb_students : int
+        The number of students.
+
+    Returns
+    -------
+    dictionary
+        For each table loaded by the ETL, the tuple (columns, rows), where rows is a list of tuples.
+    """
+    rnd = random.Random(42)
+    return {
+        "Student": (["stud_number", "first_name", "last_name", "gender"],
+            [(i, "First{}".format(i), "LAST{}".format(i), rnd.choice("MF")) for i in range(nb_students)]),
+        "Association": (["asso_name", "asso_desc"], [(asso, "") for asso in ASSOCIATIONS]),
+        "SkisatiEdition": (["year", "registration_fee"], [(year, 20.5) for year in YEARS]),
+        "EmailAddress": (["stud_number", "email"],
+            [(i, "student{}@etudiant.univ-rennes1.fr".format(i)) for i in range(nb_students)]),
+        "membership": (["stud_number", "asso_name", "stud_role"],
+            [(i, rnd.choice(ASSOCIATIONS), "member") for i in range(nb_students)]),
+        "Registration": (["stud_number", "year", "registration_date", "payment_date", "payment_deadline"],
+            [(i, year, date, None if rnd.random() < 0.1 else "{}-10-05".format(int(year) - 1), mreg.payment_deadline(date))
+                for i in range(nb_students) for year in rnd.sample(YEARS, 2) 
+                for date in [_registration_date(rnd, year)]]),
+    }
+
+def _registration_date(rnd, year):
+    """Returns the registration date (yyyy-mm-dd) of a synthetic registration.
+
+    The registrations to the last edition are recent (less than 10 days ago), so that the deadline module
+    finds registrations with an approaching deadline; the other registrations are old (expired if unpaid).
+    """
+    if year == YEARS[-1]:
+        return (datetime.date.today() - datetime.timedelta(days=rnd.randrange(10))).isoformat()
+    return "{}-10-01".format(int(year) - 1)
+
+def populate(nb_students, conn, cursor):
+    """Fills the database with synthetic students, email addresses, memberships and registrations.
+
+    Parameters
+    ----------
+    nb_students : int
+        The number of students.
+    conn :
+        The object used to connect to the database.
+    cursor :
+        The object used to query the database.
+    """
+    cursor.execute("BEGIN")
+    for table, (columns, rows) in synthetic_rows(nb_students).items():
+        cursor.executemany("INSERT INTO {} ({}) VALUES ({})".format(table, ", ".join(columns), 
+            ", ".join("?" for _ in columns)), rows)
+    conn.commit()
+
+def time_function(function, arguments):
+    """Times the calls to a function.
+
+    Parameters
+    ----------
+    function :
+        The function to call.
+    arguments : list
+        Each item of the list is the tuple of arguments of one call.
+
+    Returns
+    -------
+    float
+        The mean latency of a call, in milliseconds.
+    """
+    start = time.perf_counter()
+    for args in arguments:
+        function(*args)
+    return (time.perf_counter() - start) * 1000 / len(arguments)
+
+def time_lookups(nb_students, cursor):
+    """Times the lookups of the application.
+
+    Parameters
+    ----------
+    nb_students : int
+        The number of students in the database.
+    cursor :
+        The object used to query the database.
+
+    Returns
+    -------
+    dictionary
+        The mean latency (in milliseconds) of each lookup.
+    """
+    rnd = random.Random(7)
+    stud_numbers = [rnd.randrange(nb_students) for _ in range(NB_LOOKUPS)]
+
+    def unpaid_registrations():
+        cursor.execute("SELECT stud_number, year, registration_date FROM Registration \
+            WHERE payment_date IS NULL OR payment_date = ''")
+        return cursor.fetchall()
+
+    def edition_registrations(year):
+        cursor.execute("SELECT COUNT(*) FROM Registration WHERE year = ?", (year,))
+        return cursor.fetchone()
+
+    def association_members(asso_name):
+        cursor.execute("SELECT COUNT(*) FROM membership WHERE asso_name = ?", (asso_name,))
+        return cursor.fetchone()
+
+    return {
+        "get_student": time_function(mstud.get_student, [(n, cursor) for n in stud_numbers]),
+        "get_memberships": time_function(mstud.get_memberships, [(n, cursor) for n in stud_numbers]),
+        "get_student_registrations": time_function(mreg.get_student_registrations, [(n, cursor) for n in stud_numbers]),
+        "association_members": time_function(association_members, [(asso,) for asso in ASSOCIATIONS]),
+        "edition_registrations": time_function(edition_registrations, [(year,) for year in YEARS]),
+        "unpaid_registrations": time_function(unpaid_registrations, [()]),
+    }
+
+def run_index_benchmark(nb_students):
+    """Measures the lookup latency before and after creating the secondary indexes.
+
+    Parameters
+    ----------
+    nb_students : int
+        The number of students in the database.
+
+    Returns
+    -------
+    A tuple T
+        T[0] is the dictionary of latencies without the secondary indexes.
+        T[1] is the dictionary of latencies with the secondary indexes.
+    """
+    fd, db_file = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    conn = db.connect(db_file)
+    cursor = conn.cursor()
+    try:
+        db.create_database(conn, cursor)
+        db.drop_indexes(cursor)
+        populate(nb_students, conn, cursor)
+        before = time_lookups(nb_students, cursor)
+        db.create_indexes(cursor)
+        conn.commit()
+        after = time_lookups(nb_students, cursor)
+    finally:
+        cursor.close()
+        conn.close()
+        os.remove(db_file)
+    return (before, after)
+
+def run_load_benchmark(nb_students):
+    """Measures the throughput of the ETL load paths (etl.load_to_sql() and etl.load_bulk()).
+
+    Parameters
+    ----------
+    nb_students : int
+        The number of students in the loaded data.
+
+    Returns
+    -------
+    dictionary
+        For each load path, the number of rows written per second.
+    """
+    # Imported here: pandas is only needed by this benchmark.
+    import pandas as pd
+    import etl
+
+    tables = {table: name for name, table in etl.ETL_TABLES.items()}
+    dataframes = {tables[table]: pd.DataFrame(rows, columns=columns) 
+        for table, (columns, rows) in synthetic_rows(nb_students).items()}
+    nb_rows = sum(len(df) for df in dataframes.values())
+
+    throughput = {}
+    for name, load in [("to_sql", etl.load_to_sql), ("bulk", etl.load_bulk)]:
+        fd, db_file = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        conn = db.connect(db_file)
+        cursor = conn.cursor()
+        try:
+            db.create_database(conn, cursor)
+            start = time.perf_counter()
+            load(dataframes, conn, cursor)
+            throughput[name] = nb_rows / (time.perf_counter() - start)
+        finally:
+            cursor.close()
+            conn.close()
+            os.remove(db_file)
+    return throughput
+
+def _late_payment_registrations_per_row(cursor, today):
+    """The former implementation of mdeadline._late_payment_registrations(): all the unpaid registrations 
+    are loaded, their deadline is computed in Python and the reminder data is loaded with one query 
+    per approaching registration (with the join on EmailAddress fixed).
+    """
+    import mdeadline
+
+    cursor.execute("SELECT stud_number, year, registration_date FROM Registration \
+        WHERE payment_date IS NULL OR payment_date = ''")
+    reminders = []
+    for stud_number, year, registration_date in cursor.fetchall():
+        date = datetime.date.fromisoformat(registration_date)
+        if (date + datetime.timedelta(days=5) - today).days == 2:
+            cursor.execute(mdeadline._REMINDER_DATA + " WHERE Registration.stud_number = ? AND Registration.year = ?", 
+                (stud_number, year))
+            reminders.extend(tuple(row) for row in cursor.fetchall())
+    return reminders
+
+def run_reminder_benchmark(nb_unpaid):
+    """Measures the selection of the payment reminders, per row and set-based.
+
+    The database contains nb_unpaid unpaid registrations (one per student) spread over the last 
+    10 days: about a tenth of them have a deadline two days from now.
+
+    Parameters
+    ----------
+    nb_unpaid : int
+        The number of unpaid registrations.
+
+    Returns
+    -------
+    A tuple T
+        T[0] is the number of reminders.
+        T[1] is the dictionary of latencies (ms) of the two implementations.
+    """
+    import mdeadline
+
+    fd, db_file = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    conn = db.connect(db_file)
+    cursor = conn.cursor()
+    try:
+        db.create_database(conn, cursor)
+        rows = synthetic_rows(nb_unpaid)
+        rnd = random.Random(17)
+        today = datetime.date.today()
+        dates = [(today - datetime.timedelta(days=rnd.randrange(10))).isoformat() for _ in range(nb_unpaid)]
+        rows["Registration"] = (["stud_number", "year", "registration_date", "payment_date", "payment_deadline"],
+            [(i, YEARS[-1], date, None, mreg.payment_deadline(date)) for i, date in enumerate(dates)])
+        cursor.execute("BEGIN")
+        for table, (columns, table_rows) in rows.items():
+            cursor.executemany("INSERT INTO {} ({}) VALUES ({})".format(table, ", ".join(columns), 
+                ", ".join("?" for _ in columns)), table_rows)
+        conn.commit()
+
+        mdeadline.deadline_management_init(None, cursor, conn)
+        latencies = {}
+        start = time.perf_counter()
+        per_row = _late_payment_registrations_per_row(cursor, today)
+        latencies["one query per registration"] = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        set_based = mdeadline._late_payment_registrations(today)
+        latencies["single query"] = (time.perf_counter() - start) * 1000
+        assert sorted(per_row) == sorted(set_based), "the two implementations must select the same reminders"
+    finally:
+        cursor.close()
+        conn.close()
+        os.remove(db_file)
+    return (len(set_based), latencies)
+
+def summarize(latencies):
+    """Computes the latency percentiles and the throughput of a series of calls.
+
+    Parameters
+    ----------
+    latencies : list
+        The latency of each call, in milliseconds.
+
+    Returns
+    -------
+    dictionary
+        The number of calls, the mean, p50, p90, p99 and max latencies (ms) 
+        and the throughput (calls per second).
+    """
+    ordered = sorted(latencies)
+
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+    total = sum(ordered)
+    return {
+        "calls": len(ordered),
+        "mean_ms": total / len(ordered),
+        "p50_ms": percentile(50),
+        "p90_ms": percentile(90),
+        "p99_ms": percentile(99),
+        "max_ms": ordered[-1],
+        "throughput": len(ordered) / (total / 1000) if total > 0 else None,
+    }
+
+def measure(function, arguments, before=None):
+    """Times each call to a function.
+
+    Parameters
+    ----------
+    function :
+        The function to call.
+    arguments : list
+        Each item of the list is the tuple of arguments of one call.
+    before : optional
+        A function called (without being timed) before each call.
+
+    Returns
+    -------
+    dictionary
+        The statistics computed by summarize().
+    """
+    latencies = []
+    for args in arguments:
+        if before is not None:
+            before()
+        start = time.perf_counter()
+        function(*args)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return summarize(latencies)
+
+def _suite_mstudent(nb_students, conn, cursor):
+    """Benchmarks of the module mstudent."""
+    rnd = random.Random(11)
+    stud_numbers = [rnd.randrange(nb_students) for _ in range(NB_LOOKUPS)]
+    new_students = [(nb_students + i, "New", "STUDENT", "F", ["new{}@etudiant.univ-rennes1.fr".format(i)], cursor)
+        for i in range(NB_LOOKUPS)]
+
+    results = {
+        "mstudent.get_student": measure(mstud.get_student, [(n, cursor) for n in stud_numbers]),
+        "mstudent.get_memberships": measure(mstud.get_memberships, [(n, cursor) for n in stud_numbers]),
+        "mstudent.get_students": measure(mstud.get_students, [(stud_numbers, cursor)]),
+        "mstudent.get_associations": measure(mstud.get_associations, [(cursor,)] * 20),
+        "mstudent.get_roles": measure(mstud.get_roles, [(cursor,)] * 20),
+    }
+    # The new students are not kept in the database.
+    cursor.execute("BEGIN")
+    results["mstudent.add_student"] = measure(mstud.add_student, new_students)
+    conn.rollback()
+    return results
+
+def _suite_mregistration(nb_students, conn, cursor):
+    """Benchmarks of the module mregistration."""
+    rnd = random.Random(13)
+    stud_numbers = [rnd.randrange(nb_students) for _ in range(NB_LOOKUPS)]
+    return {
+        "mregistration.get_student_registrations": measure(mreg.get_student_registrations, 
+            [(n, cursor) for n in stud_numbers]),
+        "mregistration.get_skisati_edition": measure(mreg.get_skisati_edition, [(year, cursor) for year in YEARS]),
+    }
+
+def _suite_mdeadline(template_conn):
+    """Benchmark of mdeadline.deadline_management().
+
+    The function deletes the expired registrations, so each run starts from a fresh copy of the 
+    database. The emails are not sent: only the database work is measured.
+    """
+    import mdeadline
+
+    fd, db_file = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    connections = []
+
+    def fresh_database():
+        for conn in connections:
+            conn.close()
+        os.remove(db_file)
+        conn = db.connect(db_file)
+        template_conn.backup(conn)
+        connections.append(conn)
+        mdeadline.deadline_management_init(None, conn.cursor(), conn)
+
+    send_reminders = mdeadline._send_late_payment_reminder
+    mdeadline._send_late_payment_reminder = lambda late_payment_registrations: None
+    try:
+        return {"mdeadline.deadline_management": measure(mdeadline.deadline_management, [()] * NB_RUNS, fresh_database)}
+    finally:
+        mdeadline._send_late_payment_reminder = send_reminders
+        for conn in connections:
+            conn.close()
+        os.remove(db_file)
+
+def _suite_etl(nb_students):
+    """Benchmark of a full ETL run (extract, transform and bulk load) on files generated by datagen."""
+    import datagen
+    import etl
+
+    input_dir = tempfile.mkdtemp()
+    fd, db_file = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    files = (etl.REGISTRATIONS_FILE, etl.MEMBERSHIPS_FILE)
+    try:
+        nb_rows, _ = datagen.generate(2 * nb_students, input_dir)
+        etl.REGISTRATIONS_FILE = os.path.join(input_dir, "student_registrations.csv")
+        etl.MEMBERSHIPS_FILE = os.path.join(input_dir, "student_memberships.csv")
+
+        def run():
+            conn = db.connect(db_file)
+            cursor = conn.cursor()
+            db.create_database(conn, cursor)
+            etl.load_bulk(etl.transform(etl.extract()), conn, cursor)
+            cursor.close()
+            conn.close()
+
+        return {"etl.run": measure(run, [()] * NB_RUNS)}
+    finally:
+        etl.REGISTRATIONS_FILE, etl.MEMBERSHIPS_FILE = files
+        shutil.rmtree(input_dir)
+        os.remove(db_file)
+
+def run_suite(nb_students):
+    """Runs the benchmark suite on a database of the given size.
+
+    A benchmark that fails is reported with the key "error" instead of its statistics.
+
+    Parameters
+    ----------
+    nb_students : int
+        The number of students in the database.
+
+    Returns
+    -------
+    dictionary
+        For each benchmark, the statistics computed by summarize().
+    """
+    fd, template_file = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    conn = db.connect(template_file)
+    cursor = conn.cursor()
+    results = {}
+    try:
+        db.create_database(conn, cursor)
+        populate(nb_students, conn, cursor)
+
+        # Each item is a tuple (name of the benchmark, function running the benchmark).
+        benchmarks = [
+            ("mstudent", lambda: _suite_mstudent(nb_students, conn, cursor)),
+            ("mregistration", lambda: _suite_mregistration(nb_students, conn, cursor)),
+            ("mdeadline", lambda: _suite_mdeadline(conn)),
+            ("etl", lambda: _suite_etl(nb_students)),
+        ]
+        for name, benchmark in benchmarks:
+            try:
+                results.update(benchmark())
+            except Exception as error:
+                print("The benchmark {} failed: {!r}".format(name, error))
+                results[name] = {"error": repr(error)}
+    finally:
+        cursor.close()
+        conn.close()
+        os.remove(template_file)
+    return results
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """Compares the results of the suite against a baseline.
+
+    Parameters
+    ----------
+    results : dictionary
+        The results of the suite (see the entry point of this module).
+    baseline : dictionary
+        The results of a previous run of the suite.
+    tolerance : float, optional
+        A benchmark is a regression if its median latency is more than (1 + tolerance) times 
+        the median latency in the baseline (default: TOLERANCE) and at least MIN_SLOWDOWN_MS higher.
+
+    Returns
+    -------
+    list
+        Each item is a tuple (scale, benchmark, baseline p50, p50, ratio) describing a regression.
+    """
+    regressions = []
+    for scale, benchmarks in results["scales"].items():
+        for name, stats in benchmarks.items():
+            reference = baseline.get("scales", {}).get(scale, {}).get(name)
+            if not reference or "p50_ms" not in reference or "p50_ms" not in stats or reference["p50_ms"] <= 0:
+                continue
+            ratio = stats["p50_ms"] / reference["p50_ms"]
+            regression = ratio > 1 + tolerance and stats["p50_ms"] - reference["p50_ms"] > MIN_SLOWDOWN_MS
+            print("{:>9} {:<44}{:>10.3f}{:>10.3f}{:>8.2f}x{}".format(scale, name, reference["p50_ms"], 
+                stats["p50_ms"], ratio, "  REGRESSION" if regression else ""))
+            if regression:
+                regressions.append((scale, name, reference["p50_ms"], stats["p50_ms"], ratio))
+    return regressions
+
+def _option(argv, name, default=None):
+    """Returns the value of the command line option --name=value and removes it from argv.
+    """
+    for arg in list(argv):
+        if arg.startswith("--{}=".format(name)):
+            argv.remove(arg)
+            return arg.split("=", 1)[1]
+    return default
+
+# Entry point of the benchmark module.
+# The first argument selects the benchmark: indexes (default), load or suite.
+# The other arguments are the scales (numbers of students).
+# Options of the suite:
+#   --output=FILE       the results are saved as JSON in FILE (default: benchmark_results.json).
+#   --baseline=FILE     the results are compared against the results saved in FILE; 
+#                       the exit code is 1 if a benchmark regressed.
+#   --tolerance=X       a benchmark regressed if its median latency grew by more than X (default: 0.2).
+if __name__ == "__main__":
+
+    output_file = _option(sys.argv, "output", "benchmark_results.json")
+    baseline_file = _option(sys.argv, "baseline")
+    tolerance = float(_option(sys.argv, "tolerance", TOLERANCE))
+
+    benchmark = "indexes"
+    if len(sys.argv) > 1 and not sys.argv[1].isdigit():
+        benchmark = sys.argv.pop(1)
+    default_scales = {"suite": SUITE_SCALES, "reminders": REMINDER_SCALES}
+    scales = [int(arg) for arg in sys.argv[1:]] or default_scales.get(benchmark, SCALES)
+
+    if benchmark == "suite":
+        results = {
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "scales": {},
+        }
+        for nb_students in scales:
+            results["scales"][str(nb_students)] = run_suite(nb_students)
+            print("\n===== {} students (latency, ms) =====".format(nb_students))
+            print("{:<44}{:>10}{:>10}{:>10}{:>12}".format("benchmark", "p50", "p90", "p99", "calls/s"))
+            for name, stats in results["scales"][str(nb_students)].items():
+                if "error" in stats:
+                    print("{:<44}{}".format(name, stats["error"]))
+                else:
+                    print("{:<44}{:>10.3f}{:>10.3f}{:>10.3f}{:>12.1f}".format(name, stats["p50_ms"], 
+                        stats["p90_ms"], stats["p99_ms"], stats["throughput"] or 0))
+
+        with open(output_file, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print("\nResults saved to {}".format(output_file))
+
+        if baseline_file is not None:
+            with open(baseline_file, encoding="utf-8") as f:
+                baseline = json.load(f)
+            print("\n===== Comparison with {} (p50, ms) =====".format(baseline_file))
+            regressions = compare(results, baseline, tolerance)
+            print("{} regression(s)".format(len(regressions)))
+            if regressions:
+                sys.exit(1)
+
+    for nb_students in scales if benchmark != "suite" else []:
+        if benchmark == "load":
+            throughput = run_load_benchmark(nb_students)
+            print("\n===== {} students (rows/second) =====".format(nb_students))
+            for name, rows_per_second in throughput.items():
+                print("{:<28}{:>12.0f}".format(name, rows_per_second))
+        elif benchmark == "reminders":
+            nb_reminders, latencies = run_reminder_benchmark(nb_students)
+            print("\n===== {} unpaid registrations, {} reminders (ms) =====".format(nb_students, nb_reminders))
+            for name, latency in latencies.items():
+                print("{:<28}{:>12.1f}".format(name, latency))
+        else:
+            before, after = run_index_benchmark(nb_students)
+            print("\n===== {} students (mean latency, ms) =====".format(nb_students))
+            print("{:<28}{:>12}{:>12}".format("lookup", "no index", "index"))
+            for name in before:
+                print("{:<28}{:>12.3f}{:>12.3f}".format(name, before[name], after[name]))
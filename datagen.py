@@ -0,0 +1,259 @@
+"""The synthetic data module.
+
+It generates input files for the ETL module (student_registrations.csv and student_memberships.csv)
+at an arbitrary scale, in exactly the same format as the files in ./data:
+
+* UTF-8 with a BOM, semicolon-separated, same columns in the same order.
+* The genders are messy (M, H, garçon, F, W, fille), as in the real files.
+* The dates are mostly ISO (yyyy-mm-dd), with a fraction in the format dd/mm/yyyy.
+* Some registrations are not paid (empty payment date).
+* A student registers to several editions and is a member of several associations,
+  so the same student appears many times in both files.
+* Some students use a second email address in some rows.
+
+The same seed always generates the same files.
+
+When you run this file as a Python script, the instructions after the
+statement if __name__ == "__main__": are executed.
+
+    python datagen.py 100000
+    python datagen.py 10000000 --seed=7 --output=./data/generated
+"""
+
+import csv
+import datetime
+import os
+import random
+import sys
+import unicodedata
+
+# Default directory of the generated files.
+OUTPUT_DIR = "./data/generated"
+
+# Default seed of the random generator.
+SEED = 42
+
+# Year of the last generated Skisati edition.
+LAST_EDITION = 2024
+
+# Columns of the generated files (same as the files in ./data).
+REGISTRATION_COLUMNS = ["stud_number", "first_name", "last_name", "gender", "email",
+    "registration_date", "payment_date", "registration_fee", "year"]
+MEMBERSHIP_COLUMNS = ["stud_number", "first_name", "last_name", "gender", "email",
+    "stud_role", "asso_name", "asso_desc"]
+
+# The ways a gender is written in the real files.
+MALE = ["M", "H", "garçon"]
+FEMALE = ["F", "W", "fille"]
+
+FIRST_NAMES = {
+    "M": ["Florian", "Jacob", "Ludwig", "Hugo", "Lucas", "Nathan", "Louis", "Gabriel", "Arthur", "Jules",
+        "Adam", "Raphaël", "Paul", "Victor", "Tom", "Théo", "Maël", "Noah", "Sacha", "Eliane"],
+    "F": ["Rolande", "Ericka", "Zineb", "Camille", "Emma", "Jade", "Louise", "Alice", "Chloé", "Léa",
+        "Manon", "Inès", "Lina", "Rose", "Anna", "Julia", "Zoé", "Lisa", "Sarah", "Nour"],
+}
+
+LAST_NAMES = ["CHOISNE", "COEFFARD", "ROUSSIERE", "JACQUET", "ROUAULT", "GUYOMARD", "ALGOURDIN", "MARTIN",
+    "BERNARD", "THOMAS", "PETIT", "ROBERT", "RICHARD", "DURAND", "DUBOIS", "MOREAU", "LAURENT", "SIMON",
+    "MICHEL", "LEFEBVRE", "LEROY", "ROUX", "DAVID", "BERTRAND", "MOREL", "FOURNIER", "GIRARD", "BONNET"]
+
+# The associations of the real files (name, description).
+ASSOCIATIONS = [
+    ("Club japonnais Shiro Kitsune", " club d'apprentissage de la langue et de la culture japonaise."),
+    ("Club Roll&Draw", "de projets étudiants développant applications, jeux et tous les types de jeux de société."),
+    ("BDA", "l’asso qui s’occupe de tout ce qui est artistique sur le campus."),
+    ("BDE", "représente les élèves de l'ESIR auprès de la direction et coordonne la vie associative sur le campus"),
+    ("Club Musique", "club où les étudiants qui se réunissent avec leur instrument, ou non, afin de jouer de la musique."),
+    ("Club Kulture", "club d'échanges autour des diverses cultures étrangères représentées à l'ESIR."),
+    ("Club Conférence", "club qui organise des conférences "),
+    ("Club ESIR Esport", "club de jeux vidéos avec des équipes Esiriennes qui jouent lors de challenges."),
+    ("Club Apero", ""),
+    ("Club Danse", ""),
+    ("EsirBEP", "association venant en aide aux élèves à besoins éducatifs particuliers"),
+]
+
+# The roles of the association board; the other members have the role "member".
+BOARD_ROLES = ["president", "vice-president", "secretary", "treasurer"]
+
+def _student(seed, index):
+    """Returns the personal data of a student.
+
+    The data only depends on the seed and the index of the student, so that the same
+    student has the same data in every row of both files.
+
+    Parameters
+    ----------
+    seed : int
+        The seed of the random generator.
+    index : int
+        The index of the student.
+
+    Returns
+    -------
+    A tuple T
+        T[0] is the student number, T[1] the first name, T[2] the last name, T[3] the gender
+        (as written in the files), T[4] the main email address and T[5] the second email address.
+    """
+    rnd = random.Random(seed * 1000003 + index)
+    gender = rnd.choice("MF")
+    first_name = rnd.choice(FIRST_NAMES[gender])
+    last_name = rnd.choice(LAST_NAMES)
+    login = "{}.{}{}".format(first_name.lower(), last_name.lower(), index)
+    # No accents in the email addresses.
+    login = unicodedata.normalize("NFKD", login).encode("ascii", "ignore").decode("ascii")
+    return (index + 1000, first_name, last_name, rnd.choice(MALE if gender == "M" else FEMALE),
+        "{}@etudiant.univ-rennes1.fr".format(login), "{}@gmail.com".format(login))
+
+def _editions(nb_editions, last_year):
+    """Returns the Skisati editions.
+
+    Parameters
+    ----------
+    nb_editions : int
+        The number of editions.
+    last_year : int
+        The year of the last edition.
+
+    Returns
+    -------
+    list
+        Each item is a tuple (year, registration_fee).
+    """
+    return [(year, 20.0 + (year % 7) * 0.5) for year in range(last_year - nb_editions + 1, last_year + 1)]
+
+def _format_date(rnd, date, dmy_ratio):
+    """Formats a date as yyyy-mm-dd or, with probability dmy_ratio, as dd/mm/yyyy.
+
+    Parameters
+    ----------
+    rnd : random.Random
+        The random generator.
+    date : datetime.date
+        The date to format.
+    dmy_ratio : float
+        The probability that the date is formatted as dd/mm/yyyy.
+
+    Returns
+    -------
+    string
+        The formatted date.
+    """
+    if rnd.random() < dmy_ratio:
+        return date.strftime("%d/%m/%Y")
+    return date.isoformat()
+
+def generate(nb_rows, output_dir=OUTPUT_DIR, seed=SEED, nb_editions=10, last_edition=LAST_EDITION, registrations_per_student=2,
+        memberships_per_student=1.5, member_ratio=0.8, unpaid_ratio=0.05, second_email_ratio=0.1, dmy_ratio=0.05):
+    """Generates the files student_registrations.csv and student_memberships.csv.
+
+    The rows are written as they are generated: the memory used does not depend on nb_rows.
+
+    Parameters
+    ----------
+    nb_rows : int
+        The number of rows of the file student_registrations.csv.
+    output_dir : string, optional
+        The directory of the generated files (default: OUTPUT_DIR).
+    seed : int, optional
+        The seed of the random generator (default: SEED).
+    nb_editions : int, optional
+        The number of Skisati editions (default: 10).
+    last_edition : int, optional
+        The year of the last Skisati edition (default: LAST_EDITION).
+    registrations_per_student : float, optional
+        The average number of editions to which a student registers (default: 2).
+    memberships_per_student : float, optional
+        The average number of associations of a member (default: 1.5).
+    member_ratio : float, optional
+        The fraction of the registered students that are members of an association (default: 0.8).
+    unpaid_ratio : float, optional
+        The fraction of unpaid registrations (default: 0.05).
+    second_email_ratio : float, optional
+        The fraction of rows in which the student uses a second email address (default: 0.1).
+    dmy_ratio : float, optional
+        The fraction of dates written as dd/mm/yyyy instead of yyyy-mm-dd (default: 0.05).
+
+    Returns
+    -------
+    A tuple T
+        T[0] is the number of rows of student_registrations.csv.
+        T[1] is the number of rows of student_memberships.csv.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    rnd = random.Random(seed)
+    editions = _editions(min(nb_editions, max(1, int(nb_rows))), last_edition)
+    max_registrations = min(len(editions), max(1, round(2 * registrations_per_student - 1)))
+    max_memberships = min(len(ASSOCIATIONS), max(1, round(2 * memberships_per_student - 1)))
+
+    # The board of each association: the board roles are given to the first members.
+    boards = {asso_name: list(BOARD_ROLES) for asso_name, _ in ASSOCIATIONS}
+
+    nb_registrations = 0
+    nb_memberships = 0
+    with open(os.path.join(output_dir, "student_registrations.csv"), "w", encoding="utf-8-sig", newline="") as reg_file, \
+        open(os.path.join(output_dir, "student_memberships.csv"), "w", encoding="utf-8-sig", newline="") as mem_file:
+        registrations = csv.writer(reg_file, delimiter=";")
+        memberships = csv.writer(mem_file, delimiter=";")
+        registrations.writerow(REGISTRATION_COLUMNS)
+        memberships.writerow(MEMBERSHIP_COLUMNS)
+
+        index = 0
+        while nb_registrations < nb_rows:
+            stud_number, first_name, last_name, gender, email, second_email = _student(seed, index)
+            index += 1
+
+            # Registrations of the student.
+            nb = min(rnd.randint(1, max_registrations), nb_rows - nb_registrations)
+            for year, fee in rnd.sample(editions, nb):
+                registration_date = datetime.date(year - 1, 9, 1) + datetime.timedelta(days=rnd.randrange(75))
+                payment_date = ""
+                if rnd.random() >= unpaid_ratio:
+                    payment_date = _format_date(rnd, registration_date + datetime.timedelta(days=rnd.randrange(40)), dmy_ratio)
+                registrations.writerow([stud_number, first_name, last_name, gender,
+                    second_email if rnd.random() < second_email_ratio else email,
+                    _format_date(rnd, registration_date, dmy_ratio), payment_date, fee, year])
+            nb_registrations += nb
+
+            # Memberships of the student.
+            if rnd.random() < member_ratio:
+                for asso_name, asso_desc in rnd.sample(ASSOCIATIONS, rnd.randint(1, max_memberships)):
+                    role = boards[asso_name].pop(0) if boards[asso_name] else "member"
+                    memberships.writerow([stud_number, first_name, last_name, gender,
+                        second_email if rnd.random() < second_email_ratio else email, role, asso_name, asso_desc])
+                    nb_memberships += 1
+
+    return (nb_registrations, nb_memberships)
+
+def _option(argv, name, default):
+    """Returns the value of a command line option --name=value.
+
+    Parameters
+    ----------
+    argv : list
+        The command line arguments.
+    name : string
+        The name of the option.
+    default :
+        The value returned if the option is missing.
+
+    Returns
+    -------
+    string
+        The value of the option (default if the option is missing).
+    """
+    for arg in argv:
+        if arg.startswith("--{}=".format(name)):
+            return arg.split("=", 1)[1]
+    return default
+
+# Entry point of the synthetic data module.
+# Usage: python datagen.py NB_ROWS [--seed=N] [--output=DIR] [--editions=N]
+if __name__ == "__main__":
+
+    nb_rows = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1].isdigit() else 1000
+    output_dir = _option(sys.argv, "output", OUTPUT_DIR)
+
+    nb_registrations, nb_memberships = generate(nb_rows, output_dir, seed=int(_option(sys.argv, "seed", SEED)),
+        nb_editions=int(_option(sys.argv, "editions", 10)))
+
+    print("{} registrations and {} memberships written to {}".format(nb_registrations, nb_memberships, output_dir))
@@ -7,13 +7,371 @@ executes the instructions after the
 statement if __name__ == "__main__": that you find at the bottom of the file.
 """
 
+import datetime
 import sqlite3
 import utils
 import os
 
+# Default connection settings, used when a setting is missing from the configuration file.
+# Each key is the name of the setting in ./config/config.
+CONNECTION_DEFAULTS = {
+    # Write-ahead log: readers don't block the writer and the writer doesn't block the readers.
+    "db_journal_mode": "WAL",
+    # In WAL mode, NORMAL is safe against corruption and avoids a fsync at every commit.
+    "db_synchronous": "NORMAL",
+    # Size of the page cache, in KiB.
+    "db_cache_size": "65536",
+    # Size of the memory-mapped I/O region, in bytes.
+    "db_mmap_size": "268435456",
+    # Temporary tables and indexes are kept in memory.
+    "db_temp_store": "MEMORY",
+    # How long (in milliseconds) a connection waits for a lock held by another connection.
+    "db_busy_timeout": "5000",
+}
+
+def connect(db_file=None, config=None):
+    """Opens a connection to the SkisatiResa database.
+
+    All the entry points of the application open their connection with this function, so that 
+    every connection has the same settings (journal mode, page cache, foreign keys...).
+    The settings are read from the configuration file; see CONNECTION_DEFAULTS for 
+    the names of the settings and their default values.
+
+    Parameters
+    ----------
+    db_file : string, optional
+        The path to the database file (default: the path specified in the configuration).
+    config : dictionary, optional
+        The application configuration (default: the configuration loaded from ./config/config).
+
+    Returns
+    -------
+        The object used to connect to the database.
+    """
+    if config is None:
+        config = utils.load_config()
+    if db_file is None:
+        db_file = config["db"]
+
+    settings = dict(CONNECTION_DEFAULTS)
+    settings.update({key: value for key, value in config.items() if key in CONNECTION_DEFAULTS})
+
+    conn = sqlite3.connect(db_file, timeout=int(settings["db_busy_timeout"]) / 1000)
+    conn.execute("PRAGMA journal_mode = {}".format(settings["db_journal_mode"]))
+    conn.execute("PRAGMA synchronous = {}".format(settings["db_synchronous"]))
+    # A negative value is a size in KiB, a positive value a number of pages.
+    conn.execute("PRAGMA cache_size = -{}".format(int(settings["db_cache_size"])))
+    conn.execute("PRAGMA mmap_size = {}".format(int(settings["db_mmap_size"])))
+    conn.execute("PRAGMA temp_store = {}".format(settings["db_temp_store"]))
+    conn.execute("PRAGMA busy_timeout = {}".format(int(settings["db_busy_timeout"])))
+    # Enables the foreign key contraints support in SQLite.
+    conn.execute("PRAGMA foreign_keys = 1")
+    return conn
+
+# SQL expression that converts the registration date of a Registration row into the sortable 
+# format yyyy-mm-dd. Before migration 6, the registration dates were stored as dd/mm/yyyy (GUI) or 
+# dd-mm-yyyy (ETL module): in both cases, the day, the month and the year are at the same positions.
+# It is used by the migration 5.
+REGISTRATION_DATE_ISO = \
+    "(substr(registration_date, 7, 4) || '-' || substr(registration_date, 4, 2) || '-' || substr(registration_date, 1, 2))"
+
+# The secondary indexes of the SkisatiResa database.
+# Each item is a tuple (index name, CREATE INDEX statement).
+# The primary keys already index the lookups by stud_number on Student, membership and Registration;
+# these indexes cover the other lookup paths used by the modules mstudent, mregistration and mdeadline.
+INDEXES = [
+    # Email addresses of a student (mstudent.get_student).
+    ("idx_email_stud_number", 
+        "CREATE INDEX IF NOT EXISTS idx_email_stud_number ON EmailAddress(stud_number)"),
+    # Members of an association.
+    ("idx_membership_asso_name", 
+        "CREATE INDEX IF NOT EXISTS idx_membership_asso_name ON membership(asso_name)"),
+    # Registrations to a Skisati edition.
+    ("idx_registration_year", 
+        "CREATE INDEX IF NOT EXISTS idx_registration_year ON Registration(year)"),
+    # Unpaid registrations (mdeadline). This is a partial index: only the unpaid rows are indexed.
+    # The ETL module stores a missing payment date as an empty string, the GUI as NULL.
+    ("idx_registration_unpaid", 
+        "CREATE INDEX IF NOT EXISTS idx_registration_unpaid ON Registration(registration_date) \
+            WHERE payment_date IS NULL OR payment_date = ''"),
+    # Payment deadlines of the unpaid registrations (mdeadline): the expired registrations and 
+    # the registrations that need a reminder are selected with a range scan.
+    ("idx_registration_deadline", 
+        "CREATE INDEX IF NOT EXISTS idx_registration_deadline ON Registration(payment_deadline) \
+            WHERE payment_date IS NULL OR payment_date = ''"),
+]
+
+def create_indexes(cursor):
+    """Creates the secondary indexes of the SkisatiResa database, if they don't exist yet.
+
+    The indexes are created by the migrations of create_database(); this function is used to 
+    recreate them after drop_indexes() (e.g., after a bulk load).
+
+    Parameters
+    ----------
+    cursor : 
+        The object used to query the database.
+    """
+    for name, statement in INDEXES:
+        print("Creating the index {}....".format(name))
+        cursor.execute(statement)
+
+def drop_indexes(cursor):
+    """Drops the secondary indexes of the SkisatiResa database.
+
+    Parameters
+    ----------
+    cursor : 
+        The object used to query the database.
+    """
+    for name, _ in INDEXES:
+        cursor.execute("DROP INDEX IF EXISTS {}".format(name))
+
+def _create_tables(cursor):
+    """Creates the tables of the SkisatiResa database (migration 1).
+
+    Parameters
+    ----------
+    cursor : 
+        The object used to query the database.
+    """
+    # We create the table Login.
+    # To do so, we call the function cursor.execute() and we pass it the 
+    # CREATE TABLE statement as a parameter.
+    # The function cursor.execute() can raise an exception sqlite3.Error, 
+    # that is handled in the function create_database().
+    print("Creating the table Login....")
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS Login(
+            username TEXT PRIMARY KEY,
+            password BINARY(256)
+        )
+    ''')
+
+    # table etudiant : 
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS Student (
+            stud_number INTEGER PRIMARY KEY,
+            first_name TEXT,
+            last_name TEXT,
+            gender TEXT
+        );
+    """)
+    # table EmailAddress : 
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS EmailAddress (
+            email TEXT PRIMARY KEY,
+            stud_number INTEGER,
+            FOREIGN KEY (stud_number) REFERENCES Student(stud_number)
+        );
+    """)
+    # table Skisatiedition
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS SkisatiEdition (
+            year TEXT PRIMARY KEY,
+            registration_fee REAL
+        );
+    """)
+    # table registration
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS Registration (
+            registration_date TEXT,
+            payment_date TEXT,
+            stud_number INTEGER,
+            year TEXT,
+            PRIMARY KEY (stud_number, year),
+            FOREIGN KEY (stud_number) REFERENCES Student(stud_number),
+            FOREIGN KEY (year) REFERENCES SkisatiEdition(year)
+        );
+    """)
+    # table Association
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS Association (
+            asso_name TEXT PRIMARY KEY,
+            asso_desc TEXT
+        );
+    """)
+    # table membership
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS membership (
+            stud_role TEXT,
+            stud_number INTEGER,
+            asso_name TEXT,
+            PRIMARY KEY (stud_number, asso_name),
+            FOREIGN KEY (stud_number) REFERENCES Student(stud_number),
+            FOREIGN KEY (asso_name) REFERENCES Association(asso_name)
+        );
+    """)
+
+def _create_lookup_indexes(cursor):
+    """Creates the indexes of the lookup paths (migration 2).
+
+    Parameters
+    ----------
+    cursor : 
+        The object used to query the database.
+    """
+    for name, statement in INDEXES:
+        if name in ["idx_email_stud_number", "idx_membership_asso_name", "idx_registration_year", 
+                "idx_registration_unpaid"]:
+            print("Creating the index {}....".format(name))
+            cursor.execute(statement)
+
+def _create_outbox(cursor):
+    """Creates the table Outbox (migration 3).
+
+    The table Outbox stores the emails to send (e.g., the payment reminders), until they 
+    are actually sent by the outbox module (moutbox.py).
+
+    Parameters
+    ----------
+    cursor : 
+        The object used to query the database.
+    """
+    print("Creating the table Outbox....")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS Outbox (
+            id INTEGER PRIMARY KEY,
+            idempotency_key TEXT NOT NULL UNIQUE,
+            recipient TEXT NOT NULL,
+            subject TEXT NOT NULL,
+            body TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt REAL NOT NULL,
+            last_error TEXT,
+            created_at REAL NOT NULL,
+            sent_at REAL
+        );
+    """)
+    # The sender only reads the pending emails whose next attempt is due.
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_outbox_pending ON Outbox(next_attempt) WHERE status = 'pending'")
+
+def _create_job_run(cursor):
+    """Creates the table JobRun (migration 4).
+
+    The table JobRun stores, for each daily job, the date of its last successful run and 
+    the lease of the instance that is running it (see the module mscheduler).
+
+    Parameters
+    ----------
+    cursor : 
+        The object used to query the database.
+    """
+    print("Creating the table JobRun....")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS JobRun (
+            job TEXT PRIMARY KEY,
+            last_run TEXT,
+            locked_until REAL,
+            owner TEXT
+        );
+    """)
+
+def _add_payment_deadline(cursor):
+    """Adds the column payment_deadline to the table Registration (migration 5).
+
+    The payment deadline (yyyy-mm-dd) is the registration date plus 5 days (mregistration.PAYMENT_DELAY 
+    when this migration was written). It is computed for the existing registrations, then 
+    maintained by the module mregistration and by the ETL module.
+
+    Parameters
+    ----------
+    cursor : 
+        The object used to query the database.
+    """
+    print("Adding the column payment_deadline to the table Registration....")
+    cursor.execute("ALTER TABLE Registration ADD COLUMN payment_deadline TEXT")
+    cursor.execute("UPDATE Registration SET payment_deadline = date({}, '+5 days') \
+        WHERE length(registration_date) = 10".format(REGISTRATION_DATE_ISO))
+
+    # The dates typed without leading zeros (e.g., 1/9/2023) are converted in Python.
+    cursor.execute("SELECT stud_number, year, registration_date FROM Registration WHERE length(registration_date) <> 10")
+    deadlines = []
+    for stud_number, year, registration_date in cursor.fetchall():
+        date = utils.get_date(str(registration_date).replace("-", "/"))
+        if date is not None:
+            deadlines.append(((date + datetime.timedelta(days=5)).date().isoformat(), stud_number, year))
+    cursor.executemany("UPDATE Registration SET payment_deadline = ? WHERE stud_number = ? AND year = ?", deadlines)
+
+    for name, statement in INDEXES:
+        if name == "idx_registration_deadline":
+            print("Creating the index {}....".format(name))
+            cursor.execute(statement)
+
+def _iso_registration_dates(cursor):
+    """Converts the registration and payment dates of the table Registration to yyyy-mm-dd (migration 6).
+
+    The dates were stored as typed in the GUI (dd/mm/yyyy) or as written by the ETL module (dd-mm-yyyy). 
+    In the format yyyy-mm-dd, the dates sort as strings: they can be compared and filtered with an index.
+    Since this migration, the GUI converts the dates at its boundary (see utils.to_iso_date() and 
+    utils.to_display_date()). A missing payment date is left as is (NULL or empty string).
+
+    Parameters
+    ----------
+    cursor : 
+        The object used to query the database.
+    """
+    print("Converting the registration and payment dates to yyyy-mm-dd....")
+    for column in ["registration_date", "payment_date"]:
+        # dd/mm/yyyy and dd-mm-yyyy: the day, the month and the year are at the same positions.
+        cursor.execute("UPDATE Registration \
+            SET {0} = substr({0}, 7, 4) || '-' || substr({0}, 4, 2) || '-' || substr({0}, 1, 2) \
+            WHERE {0} GLOB '[0-9][0-9][/-][0-9][0-9][/-][0-9][0-9][0-9][0-9]'".format(column))
+
+        # The dates typed without leading zeros (e.g., 1/9/2023) are converted in Python.
+        cursor.execute("SELECT stud_number, year, {0} FROM Registration \
+            WHERE {0} <> '' AND {0} NOT GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]'".format(column))
+        dates = []
+        for stud_number, year, value in cursor.fetchall():
+            iso_date = utils.to_iso_date(str(value).replace("-", "/"))
+            if iso_date is None:
+                print("Invalid {} left unchanged: {} (student {}, year {})".format(column, value, stud_number, year))
+            else:
+                dates.append((iso_date, stud_number, year))
+        cursor.executemany("UPDATE Registration SET {} = ? WHERE stud_number = ? AND year = ?".format(column), dates)
+
+# The schema migrations of the SkisatiResa database, in order.
+# The migration MIGRATIONS[i] upgrades the schema from version i to version i+1.
+# The current version of a database is stored in the database file itself (PRAGMA user_version);
+# a database created before the migrations were introduced has version 0.
+#
+# NEVER modify or remove a migration that has already been released: to change the schema, 
+# append a new migration to the list.
+MIGRATIONS = [
+    _create_tables,
+    _create_lookup_indexes,
+    _create_outbox,
+    _create_job_run,
+    _add_payment_deadline,
+    _iso_registration_dates,
+]
+
+# The latest schema version.
+SCHEMA_VERSION = len(MIGRATIONS)
+
+def schema_version(cursor):
+    """Returns the schema version of the database.
+
+    Parameters
+    ----------
+    cursor : 
+        The object used to query the database.
+
+    Returns
+    -------
+    int
+        The schema version (0 for an empty database).
+    """
+    cursor.execute("PRAGMA user_version")
+    return cursor.fetchone()[0]
+
 def create_database(conn, cursor):
 
-    """Creates the SkisatiResa database
+    """Creates the SkisatiResa database, or upgrades an existing database to the latest schema version.
+
+    The pending migrations (see MIGRATIONS) are applied in place, in a single transaction: 
+    the data already in the database (e.g., the Login accounts) is kept.
 
     Parameters
     ----------
@@ -25,7 +383,7 @@ def create_database(conn, cursor):
     Returns
     -------
     bool
-        True if the database could be created, False otherwise.
+        True if the database could be created or upgraded, False otherwise.
     
     """
 
@@ -33,7 +391,7 @@ def create_database(conn, cursor):
     # A transaction is a sequence of read/write statements that 
     # have a permanent result in the database only if they all succeed.
     #
-    # More concretely, in this function we create many tables in the database.
+    # More concretely, in this function we apply the migrations that create the tables in the database.
     # The transaction is therefore a sequence of CREATE TABLE statements such as :
     #
     # BEGIN
@@ -59,111 +417,45 @@ def create_database(conn, cursor):
     # 
     cursor.execute("BEGIN")
     
-    # Create the tables. 
+    # Apply the pending migrations.
     try:
-        # We create the table Login.
-        # To do so, we call the function cursor.execute() and we pass it the 
-        # CREATE TABLE statement as a parameter.
-        # The function cursor.execute() can raise an exception sqlite3.Error.
-        # That's why we write the code for creating the tables in a try...except block.
-        print("Creating the table Login....")
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS Login(
-                username TEXT PRIMARY KEY,
-                password BINARY(256)
-            )
-        ''')
-
-       #####TODO: COMPLETE THE CODE HERE TO CREATE THE OTHER TABLES ####
-       # table etudiant : 
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS Student (
-                stud_number INTEGER PRIMARY KEY,
-                first_name TEXT,
-                last_name TEXT,
-                gender TEXT
-            );
-        """)
-        # table EmailAddress : 
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS EmailAddress (
-                email TEXT PRIMARY KEY,
-                stud_number INTEGER,
-                FOREIGN KEY (stud_number) REFERENCES Student(stud_number)
-            );
-        """)
-        # table Skisatiedition
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS SkisatiEdition (
-                year TEXT PRIMARY KEY,
-                registration_fee REAL
-            );
-        """)
-        # table registration
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS Registration (
-                registration_date TEXT,
-                payment_date TEXT,
-                stud_number INTEGER,
-                year TEXT,
-                PRIMARY KEY (stud_number, year),
-                FOREIGN KEY (stud_number) REFERENCES Student(stud_number),
-                FOREIGN KEY (year) REFERENCES SkisatiEdition(year)
-            );
-        """)
-        # table Association
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS Association (
-                asso_name TEXT PRIMARY KEY,
-                asso_desc TEXT
-            );
-        """)
-        # table membership
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS membership (
-                stud_role TEXT,
-                stud_number INTEGER,
-                asso_name TEXT,
-                PRIMARY KEY (stud_number, asso_name),
-                FOREIGN KEY (stud_number) REFERENCES Student(stud_number),
-                FOREIGN KEY (asso_name) REFERENCES Association(asso_name)
-            );
-        """)
-
+        version = schema_version(cursor)
+        if version > SCHEMA_VERSION:
+            raise sqlite3.DatabaseError("the database schema version ({}) is newer than this application ({})".format(
+                version, SCHEMA_VERSION))
         
-       ###################################################################
+        # Each migration upgrades the schema by one version.
+        # The schema version is written in the same transaction as the migration.
+        for number in range(version + 1, SCHEMA_VERSION + 1):
+            print("Applying the migration {}....".format(number))
+            MIGRATIONS[number - 1](cursor)
+            cursor.execute("PRAGMA user_version = {}".format(number))
         
-    # Exception raised when something goes wrong while creating the tables.
+    # Exception raised when something goes wrong while applying the migrations.
     except sqlite3.Error as error:
-        print("An error occurred while creating the tables: {}".format(error))
-        # IMPORTANT : we rollback the transaction! No table is created in the database.
+        print("An error occurred while migrating the database: {}".format(error))
+        # IMPORTANT : we rollback the transaction! The database is left unchanged.
         conn.rollback()
         # Return False to indicate that something went wrong.
         return False
 
     # If we arrive here, that means that no error occurred.
-    # IMPORTANT : we must COMMIT the transaction, so that all tables are actually created in the database.
+    # IMPORTANT : we must COMMIT the transaction, so that the migrations are actually applied to the database.
     conn.commit()    
-    print("Database created successfully")
+    print("Database schema is up to date (version {})".format(SCHEMA_VERSION))
     # Returns True to indicate that everything went well!
     return True
 
 # The entry point of this module.
 if __name__ == "__main__":
 
-    # Loads the app config into the dictionary app_config.
-    app_config = utils.load_config()
-
-    # From the configuration, gets the path to the database file.
-    db_file = app_config["db"]
-
-    # Open a connection to the database.
-    conn = sqlite3.connect(db_file)
+    # Open a connection to the database file specified in the configuration.
+    conn = connect()
 
     # The cursor is used to execute queries to the database.
     cursor = conn.cursor()
 
-    # Creates the database. THIS IS THE FUNCTION THAT YOU'LL NEED TO MODIFY
+    # Creates the database, or upgrades it to the latest schema version.
     create_database(conn, cursor)
 
     # Closes the connection to the database
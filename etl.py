@@ -12,11 +12,58 @@ Look at the instructions after the statement if __name__ == "__main__":
 import pandas as pd
 import sqlite3
 import os
+import sys
 import db
+import mregistration as mreg
 import utils
 
 from datetime import datetime
 
+try:
+    import resource
+except ImportError:
+    # The module resource is not available on Windows.
+    resource = None
+
+# The tables loaded by the ETL, in an order compatible with the foreign keys 
+# (a table comes after the tables it references).
+# Each key is the name of a dataframe returned by extract(), the value is the name of the table.
+ETL_TABLES = {
+    "Student": "Student",
+    "Association": "Association",
+    "SkisatiEdition": "SkisatiEdition",
+    "EmailAddress": "EmailAddress",
+    "Membership": "membership",
+    "Registration": "Registration",
+}
+
+# The tables loaded by the ETL, in the order in which they can be emptied.
+ETL_TABLES_DELETE_ORDER = list(reversed(list(ETL_TABLES.values())))
+
+# The input CSV files.
+REGISTRATIONS_FILE = "./data/student_registrations.csv"
+MEMBERSHIPS_FILE = "./data/student_memberships.csv"
+
+# Default number of CSV rows in a chunk, when the input files are streamed (see extract_chunks()).
+CHUNK_SIZE = 50000
+
+# Default number of rows written by each call to executemany() in a bulk load (see load_bulk()).
+BATCH_SIZE = 10000
+
+# The tables in which the transformation removes the duplicates. 
+# When the input files are streamed, the duplicates across chunks are ignored at load time.
+DEDUPLICATED_TABLES = ["Student", "Association", "SkisatiEdition", "EmailAddress"]
+
+# The primary key of each table loaded by the ETL.
+PRIMARY_KEYS = {
+    "Student": ["stud_number"],
+    "Association": ["asso_name"],
+    "SkisatiEdition": ["year"],
+    "EmailAddress": ["email"],
+    "membership": ["stud_number", "asso_name"],
+    "Registration": ["stud_number", "year"],
+}
+
 
 def extract():
     """Implementation of the extraction submodule.
@@ -43,17 +90,51 @@ def extract():
     ################## TODO: COMPLETE THE CODE OF THIS FUNCTION  #####################
 
     # Lecture des CSV
-    registrations_df = pd.read_csv("./data/student_registrations.csv", delimiter=";")
-    memberships_df   = pd.read_csv("./data/student_memberships.csv", delimiter=";")
+    registrations_df = pd.read_csv(REGISTRATIONS_FILE, delimiter=";")
+    memberships_df   = pd.read_csv(MEMBERSHIPS_FILE, delimiter=";")
+
+    # Construire les dataframes
+    dataframes = _split(registrations_df, memberships_df)
+
+    ##################################################################################
+
+    # Return the dataframe collection.
+    return dataframes
+
+def _concat(frames):
+    """Concatenates dataframes with the same columns, ignoring the empty ones.
 
+    Parameters
+    ----------
+    frames : list
+        The dataframes.
+    """
+    non_empty = [df for df in frames if len(df) > 0] or frames[:1]
+    return pd.concat(non_empty, ignore_index=True)
+
+def _split(registrations_df, memberships_df):
+    """Splits the content of the input CSV files into one dataframe per table.
+
+    Parameters
+    ----------
+    registrations_df : dataframe
+        Rows of the file student_registrations.csv.
+    memberships_df : dataframe
+        Rows of the file student_memberships.csv.
+
+    Returns
+    -------
+    dictionary
+        The collection of dataframes, as described in extract().
+    """
     #Construire les dataframes
     students_from_reg = registrations_df[["stud_number", "first_name", "last_name", "gender"]]
     students_from_mem = memberships_df[["stud_number", "first_name", "last_name", "gender"]]
-    student_df = pd.concat([students_from_reg, students_from_mem], ignore_index=True)
+    student_df = _concat([students_from_reg, students_from_mem])
 
     emails_from_reg = registrations_df[["stud_number", "email"]]
     emails_from_mem = memberships_df[["stud_number", "email"]]
-    email_df = pd.concat([emails_from_reg, emails_from_mem], ignore_index=True)
+    email_df = _concat([emails_from_reg, emails_from_mem])
 
     association_df = memberships_df[["asso_name", "asso_desc"]]
     membership_df  = memberships_df[["stud_number", "asso_name", "stud_role"]]
@@ -73,11 +154,54 @@ def extract():
         "Registration": registration_df,
     }
 
-    ##################################################################################
-
-    # Return the dataframe collection.
     return dataframes
+
+def extract_chunks(chunk_size=CHUNK_SIZE):
+    """Streaming implementation of the extraction submodule.
+
+    The input CSV files are read chunk by chunk, so that the memory used does not depend 
+    on the size of the files. 
+
+    Parameters
+    ----------
+    chunk_size : int, optional
+        The number of CSV rows in each chunk (default: CHUNK_SIZE).
+
+    Returns
+    -------
+    generator
+        Each item is a collection of dataframes (as described in extract()) 
+        containing the data of one chunk of one of the input CSV files.
+    """
+    print("Extracting the data from the input CSV files (chunks of {} rows)...".format(chunk_size))
+
+    # Empty dataframes with the columns of each file.
+    no_registrations = pd.read_csv(REGISTRATIONS_FILE, delimiter=";", nrows=0)
+    no_memberships = pd.read_csv(MEMBERSHIPS_FILE, delimiter=";", nrows=0)
+
+    for chunk in pd.read_csv(REGISTRATIONS_FILE, delimiter=";", chunksize=chunk_size):
+        yield _split(chunk, no_memberships)
+    for chunk in pd.read_csv(MEMBERSHIPS_FILE, delimiter=";", chunksize=chunk_size):
+        yield _split(no_registrations, chunk)
     
+def _parse_dates(series):
+    """Converts a column of dates written as yyyy-mm-dd or dd/mm/yyyy into datetimes.
+
+    The formats are given explicitly: pandas doesn't have to guess the format of each value.
+
+    Parameters
+    ----------
+    series : Series
+        The dates (as strings, possibly missing).
+
+    Returns
+    -------
+    Series
+        The datetimes (NaT when a date is missing or can't be parsed).
+    """
+    dates = pd.to_datetime(series, format="%Y-%m-%d", errors="coerce")
+    return dates.fillna(pd.to_datetime(series, format="%d/%m/%Y", errors="coerce"))
+
 def transform(dataframes):
     """Implementation of the transformation submodule.
 
@@ -145,12 +269,17 @@ def transform(dataframes):
 
     dataframes["Student"] = student_df
 
-    #On remet les dates registration_date et payment_date en dd-mm-yyyy
+    #On remet les dates registration_date et payment_date en yyyy-mm-dd
+    #(format de stockage : les dates se trient comme des chaînes et peuvent être indexées)
     for col in ["registration_date", "payment_date"]:
         #conversion
-        dt_series = pd.to_datetime(registration_df[col], errors="coerce")
-        #format dd-mm-yyyy
-        registration_df[col] = dt_series.dt.strftime("%d-%m-%Y")
+        dt_series = _parse_dates(registration_df[col])
+        if col == "registration_date":
+            #date limite de paiement (yyyy-mm-dd, colonne indexée) : date d'inscription + PAYMENT_DELAY jours
+            registration_df["payment_deadline"] = \
+                (dt_series + pd.Timedelta(days=mreg.PAYMENT_DELAY)).dt.strftime("%Y-%m-%d")
+        #format yyyy-mm-dd
+        registration_df[col] = dt_series.dt.strftime("%Y-%m-%d")
         #remplacer NaN par chaîne vide
         registration_df[col] = registration_df[col].fillna("")
 
@@ -161,43 +290,159 @@ def transform(dataframes):
     # Returns the dataframe collection after the transformations.
     return dataframes
 
-def load(dataframes):
-    """Implementation of the load submodule.
+def _fingerprint(df, key):
+    """Returns the primary key and the content hash of each row of a dataframe.
 
-    Parameters:
+    The values are compared as text, so that a value read from the database (e.g., the year '2022')
+    and the same value read from a CSV file (e.g., the year 2022) have the same fingerprint.
+    A missing value and an empty string have the same fingerprint.
+
+    Parameters
     ----------
-    dataframes : dictionary
-        The dictionary returned by the function extract()
+    df : dataframe
+        The rows.
+    key : list
+        The columns of the primary key.
+
+    Returns
+    -------
+    dataframe
+        The primary key columns (as text), the column _hash with the hash of the row content 
+        and the column _row with the position of the row in df.
     """
-    # Loads the application configuration.
-    app_config = utils.load_config()
+    text = df.fillna("").astype(str)
+    fingerprint = text[key].copy()
+    fingerprint["_hash"] = pd.util.hash_pandas_object(text, index=False).values
+    fingerprint["_row"] = range(len(df))
+    return fingerprint
 
-    # Gets the path to the database file.
-    database_file = app_config["db"]
+def _delta(incoming, existing, key):
+    """Compares the incoming rows of a table against the rows already in the database.
 
-    # You might bump into some errors while debugging your code which 
-    # This might result in a database that is partially filled with some data.
-    # Each time you rerun the ETL module, you want the database to be in the same state as when
-    # you first created. 
-    # The simpler solution here is to remove the database and recreate the tables back again.
-    if os.path.exists(database_file):
-        # If the database file already exists, we remove it.
-        # In order to test the existence of a file, and to remove it, we use functions that are 
-        # available in a Python module called "os".
-        os.remove(database_file)
-    
-    # We open a connection to the database.
-    conn = sqlite3.connect(database_file)
+    Parameters
+    ----------
+    incoming : dataframe
+        The rows extracted from the input CSV files.
+    existing : dataframe
+        The rows in the database table (same columns as incoming).
+    key : list
+        The columns of the primary key.
 
-    # We get the cursor to query the database.
-    cursor = conn.cursor()
+    Returns
+    -------
+    A tuple T
+        T[0] is the dataframe of the rows to insert (the primary key is not in the database).
+        T[1] is the dataframe of the rows to update (same primary key, different content).
+        T[2] is the dataframe of the primary keys to delete (the primary key is not in the input files).
+    """
+    incoming = incoming.drop_duplicates(subset=key, keep="last").reset_index(drop=True)
+    existing = existing.reset_index(drop=True)
 
-    # We create the tables in the database, by using the function create_database that you implemented in the module
-    # db.
-    db.create_database(conn, cursor)
+    merged = _fingerprint(incoming, key).merge(_fingerprint(existing, key), on=key, 
+        how="outer", suffixes=("", "_db"), indicator=True)
+
+    inserted = merged["_merge"] == "left_only"
+    updated = (merged["_merge"] == "both") & (merged["_hash"] != merged["_hash_db"])
+    deleted = merged["_merge"] == "right_only"
+
+    return (incoming.iloc[merged.loc[inserted, "_row"].astype(int)],
+        incoming.iloc[merged.loc[updated, "_row"].astype(int)],
+        existing.iloc[merged.loc[deleted, "_row_db"].astype(int)][key])
+
+def _rows(df):
+    """Returns the rows of a dataframe as a list of tuples of Python values (missing values are None).
+
+    Parameters
+    ----------
+    df : dataframe
+        The rows.
+    """
+    columns = []
+    for name in df.columns:
+        values = df[name].tolist()
+        missing = df[name].isna()
+        if missing.any():
+            values = [None if is_missing else value for value, is_missing in zip(values, missing.tolist())]
+        columns.append(values)
+    return list(zip(*columns))
+
+def load_incremental(dataframes, conn, cursor):
+    """Loads only the changes between the dataframes and the database.
+
+    For each table loaded by the ETL, the incoming rows are compared against the rows in the 
+    database by primary key and content hash (see _delta()). Only the new rows are inserted, 
+    only the changed rows are updated and only the rows that disappeared from the input files are deleted.
+    All the changes are applied in a single transaction.
+
+    Parameters
+    ----------
+    dataframes : dictionary
+        The dictionary returned by the function transform()
+    conn : 
+        The object used to connect to the database.
+    cursor : 
+        The object used to query the database.
+
+    Returns
+    -------
+    dictionary
+        For each table, a tuple (number of inserted rows, number of updated rows, number of deleted rows).
+    """
+    deltas = {}
+    for name, table in ETL_TABLES.items():
+        incoming = dataframes[name]
+        columns = list(incoming.columns)
+        existing = pd.read_sql("SELECT {} FROM {}".format(", ".join(columns), table), conn)
+        deltas[table] = (columns, _delta(incoming, existing, PRIMARY_KEYS[table]))
+
+    cursor.execute("BEGIN")
+    try:
+        # Deletions first, children before parents.
+        for table in ETL_TABLES_DELETE_ORDER:
+            key = PRIMARY_KEYS[table]
+            deleted = deltas[table][1][2]
+            cursor.executemany("DELETE FROM {} WHERE {}".format(table, 
+                " AND ".join("{} = ?".format(column) for column in key)), _rows(deleted))
+
+        # Then insertions and updates, parents before children.
+        for table in ETL_TABLES.values():
+            key = PRIMARY_KEYS[table]
+            columns, (inserted, updated, _) = deltas[table]
+            values = [column for column in columns if column not in key]
+            cursor.executemany("INSERT INTO {} ({}) VALUES ({})".format(table, ", ".join(columns), 
+                ", ".join("?" for _ in columns)), _rows(inserted))
+            if values:
+                cursor.executemany("UPDATE {} SET {} WHERE {}".format(table, 
+                    ", ".join("{} = ?".format(column) for column in values), 
+                    " AND ".join("{} = ?".format(column) for column in key)), _rows(updated[values + key]))
+    except sqlite3.Error as error:
+        print("An error occurred while loading the changes: {}".format(error))
+        conn.rollback()
+        return None
+    conn.commit()
+
+    return {table: (len(delta[0]), len(delta[1]), len(delta[2])) for table, (_, delta) in deltas.items()}
+
+def load_to_sql(dataframes, conn, cursor):
+    """Empties the tables loaded by the ETL and reloads them with DataFrame.to_sql().
+
+    Parameters
+    ----------
+    dataframes : dictionary
+        The dictionary returned by the function transform()
+    conn : 
+        The object used to connect to the database.
+    cursor : 
+        The object used to query the database.
+    """
+    # Each time you rerun the ETL module, you want the database to contain the data of the input 
+    # CSV files only. We empty the tables that are loaded by the ETL, children before parents 
+    # so that the foreign key constraints are satisfied.
+    cursor.execute("BEGIN")
+    for table in ETL_TABLES_DELETE_ORDER:
+        cursor.execute("DELETE FROM {}".format(table))
+    conn.commit()
 
-    print("Loading the data into the database...")
-    
     ################## TODO: COMPLETE THE CODE OF THIS FUNCTION  #####################
     #On insère les dataframes dans les tables dans un ordre compatible avec les clés étrangères
 
@@ -225,14 +470,222 @@ def load(dataframes):
     
     ##################################################################################
 
-    print("Done!")
+def load_bulk(dataframes, conn, cursor, batch_size=BATCH_SIZE):
+    """Empties the tables loaded by the ETL and reloads them with a bulk load.
+
+    Compared to load_to_sql():
+    * all the rows are written with executemany(), in batches of batch_size rows, 
+      in a single transaction;
+    * the foreign keys are checked once, at the end of the load (PRAGMA foreign_key_check); 
+      if any row violates a foreign key, the transaction is rolled back;
+    * the secondary indexes are dropped before the load and rebuilt at the end;
+    * the journal is kept in memory and the database file is not synced during the load.
+    The connection settings are restored at the end of the load.
+
+    Parameters
+    ----------
+    dataframes : dictionary
+        The dictionary returned by the function transform()
+    conn : 
+        The object used to connect to the database.
+    cursor : 
+        The object used to query the database.
+    batch_size : int, optional
+        The number of rows written by each call to executemany() (default: BATCH_SIZE).
+
+    Returns
+    -------
+    bool
+        True if the data could be loaded, False otherwise.
+    """
+    # These settings can't be changed inside a transaction.
+    journal_mode = cursor.execute("PRAGMA journal_mode").fetchone()[0]
+    synchronous = cursor.execute("PRAGMA synchronous").fetchone()[0]
+    cursor.execute("PRAGMA foreign_keys = 0")
+    cursor.execute("PRAGMA journal_mode = MEMORY")
+    cursor.execute("PRAGMA synchronous = OFF")
+
+    loaded = False
+    cursor.execute("BEGIN")
+    try:
+        for table in ETL_TABLES_DELETE_ORDER:
+            cursor.execute("DELETE FROM {}".format(table))
+        db.drop_indexes(cursor)
+
+        for name, table in ETL_TABLES.items():
+            df = dataframes[name]
+            columns = list(df.columns)
+            insert = "INSERT INTO {} ({}) VALUES ({})".format(table, ", ".join(columns), ", ".join("?" for _ in columns))
+            for start in range(0, len(df), batch_size):
+                cursor.executemany(insert, _rows(df.iloc[start:start + batch_size]))
+
+        violations = cursor.execute("PRAGMA foreign_key_check").fetchall()
+        if violations:
+            raise sqlite3.IntegrityError("{} rows violate a foreign key constraint (first: {})".format(
+                len(violations), violations[0]))
+
+        db.create_indexes(cursor)
+        conn.commit()
+        loaded = True
+    except sqlite3.Error as error:
+        print("An error occurred while loading the data: {}".format(error))
+        conn.rollback()
+    finally:
+        cursor.execute("PRAGMA synchronous = {}".format(synchronous))
+        cursor.execute("PRAGMA journal_mode = {}".format(journal_mode))
+        cursor.execute("PRAGMA foreign_keys = 1")
+    return loaded
+
+def load(dataframes, incremental=False, bulk=False):
+    """Implementation of the load submodule.
+
+    Parameters:
+    ----------
+    dataframes : dictionary
+        The dictionary returned by the function extract()
+    incremental : bool, optional
+        If True, only the changes between the dataframes and the database are written
+        (see load_incremental()). Otherwise, the tables are emptied and reloaded (default: False).
+    bulk : bool, optional
+        If True, the tables are reloaded with load_bulk(), otherwise with load_to_sql() (default: False).
+    """
+    # Loads the application configuration.
+    app_config = utils.load_config()
+
+    # Gets the path to the database file.
+    database_file = app_config["db"]
+
+    # We open a connection to the database.
+    conn = db.connect(database_file, app_config)
+
+    # We get the cursor to query the database.
+    cursor = conn.cursor()
+
+    # We create the tables in the database (or we upgrade the schema of an existing database) 
+    # by using the function create_database that you implemented in the module db.
+    # The database file is NOT removed: the accounts in the table Login are kept.
+    if not db.create_database(conn, cursor):
+        cursor.close()
+        conn.close()
+        return
+
+    # In incremental mode, we only write the changes.
+    if incremental:
+        print("Loading the changes into the database...")
+        counts = load_incremental(dataframes, conn, cursor)
+        if counts is not None:
+            for table, (nb_inserted, nb_updated, nb_deleted) in counts.items():
+                print("{}: {} inserted, {} updated, {} deleted".format(table, nb_inserted, nb_updated, nb_deleted))
+            print("Done!")
+        cursor.close()
+        conn.close()
+        return
+
+    print("Loading the data into the database...")
+    if not bulk:
+        load_to_sql(dataframes, conn, cursor)
+        print("Done!")
+    elif load_bulk(dataframes, conn, cursor):
+        print("Done!")
     
     # We close the connection to the database.
     cursor.close()
     conn.close()
 
+def load_streaming(chunk_size=CHUNK_SIZE):
+    """Extracts, transforms and loads the input CSV files chunk by chunk.
+
+    Only one chunk is in memory at a time (see extract_chunks()), so the peak memory does not 
+    depend on the size of the input files. The tables are emptied and reloaded in a single transaction.
+    The duplicates across chunks are ignored when the rows are inserted (first occurrence wins, as in transform()).
+
+    Parameters
+    ----------
+    chunk_size : int, optional
+        The number of CSV rows in each chunk (default: CHUNK_SIZE).
+    """
+    app_config = utils.load_config()
+    conn = db.connect(app_config["db"], app_config)
+    cursor = conn.cursor()
+
+    if not db.create_database(conn, cursor):
+        cursor.close()
+        conn.close()
+        return
+
+    print("Loading the data into the database...")
+    cursor.execute("BEGIN")
+    try:
+        for table in ETL_TABLES_DELETE_ORDER:
+            cursor.execute("DELETE FROM {}".format(table))
+
+        for dataframes in extract_chunks(chunk_size):
+            dataframes = transform(dataframes)
+            for name, table in ETL_TABLES.items():
+                columns = list(dataframes[name].columns)
+                insert = "INSERT OR IGNORE" if table in DEDUPLICATED_TABLES else "INSERT"
+                cursor.executemany("{} INTO {} ({}) VALUES ({})".format(insert, table, ", ".join(columns), 
+                    ", ".join("?" for _ in columns)), _rows(dataframes[name]))
+    except sqlite3.Error as error:
+        print("An error occurred while loading the data: {}".format(error))
+        conn.rollback()
+        cursor.close()
+        conn.close()
+        return
+    conn.commit()
+
+    print("Done!")
+    cursor.close()
+    conn.close()
+
+def peak_rss():
+    """Returns the peak memory (resident set size) used by the process so far.
+
+    Returns
+    -------
+    float
+        The peak memory in MiB, or None if it cannot be measured on this platform.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS, in KiB on Linux.
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+def _chunk_size(argv):
+    """Returns the chunk size given on the command line with --chunk-size=N (default: CHUNK_SIZE).
+
+    Parameters
+    ----------
+    argv : list
+        The command line arguments.
+    """
+    for arg in argv:
+        if arg.startswith("--chunk-size="):
+            return int(arg.split("=", 1)[1])
+    return CHUNK_SIZE
+
 # Entry point of the ETL module.
+# Options:
+#   --incremental       only the changes are written to the database (see load_incremental()).
+#   --bulk              the tables are reloaded with a bulk load (see load_bulk()).
+#   --stream            the input files are processed chunk by chunk (see load_streaming()).
+#   --chunk-size=N      the number of CSV rows in a chunk (with --stream).
+#   --input=DIR         the input files are read from the directory DIR (default: ./data).
 if __name__ == "__main__":
+    # The input files can be read from another directory (e.g., the files generated by datagen.py).
+    for arg in sys.argv:
+        if arg.startswith("--input="):
+            REGISTRATIONS_FILE = os.path.join(arg.split("=", 1)[1], "student_registrations.csv")
+            MEMBERSHIPS_FILE = os.path.join(arg.split("=", 1)[1], "student_memberships.csv")
+
+if __name__ == "__main__" and "--stream" in sys.argv:
+    load_streaming(_chunk_size(sys.argv))
+    print("Peak memory (RSS): {} MiB".format("n/a" if peak_rss() is None else "{:.1f}".format(peak_rss())))
+
+elif __name__ == "__main__":
 
     ################## TODO: COMPLETE THE CODE OF THIS FUNCTION  #####################
     
@@ -261,6 +714,9 @@ if __name__ == "__main__":
         print(df)
     
     #Chargement dans la base
-    load(dataframes)
+    # With the option --incremental, only the changes are written to the database.
+    load(dataframes, incremental="--incremental" in sys.argv, bulk="--bulk" in sys.argv)
     ##################################################################################
+
+    print("Peak memory (RSS): {} MiB".format("n/a" if peak_rss() is None else "{:.1f}".format(peak_rss())))
     
\ No newline at end of file
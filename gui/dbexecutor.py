@@ -0,0 +1,212 @@
+"""The DB executor of the GUI.
+
+The callbacks of the tabs don't query the database on the Tk thread: a slow query, or a database
+locked by another connection (e.g., the deadline job), would freeze the window. Instead, they
+submit their queries to the DB executor (see submit()):
+
+* The queries run in a background thread, with its own connection to the database
+  (a SQLite connection can only be used by the thread that created it), one at a time and in
+  the order of submission.
+* The result of a query is given back to the Tk thread: the main window polls the results
+  with window.after(), then calls the callback given to submit(). The callbacks are the only
+  functions that update the widgets.
+* A lookup (e.g., the search of a student while the user types a student number) is submitted
+  with a key: a new lookup with the same key cancels the previous one, whose callback is never
+  called (see cancel()). A lookup that has not started yet is not run at all.
+
+The executor is started by the main window (see start()).
+"""
+
+import itertools
+import queue
+import threading
+import tkinter as tk
+
+import db
+
+# How often (in milliseconds) the main window checks whether some results are available.
+POLL_INTERVAL = 20
+
+# The queue of the jobs to run; each job is a tuple (job_id, function). None stops the worker.
+_jobs = queue.Queue()
+
+# The queue of the results; each result is a tuple (job_id, value).
+_results = queue.Queue()
+
+# The callback of each job that has not been delivered or cancelled yet: job_id -> (callback, key).
+_pending = {}
+
+# The job id of the last job submitted with each key: key -> job_id.
+_latest = {}
+
+# Protects the variables _pending and _latest, used by the Tk thread and the worker.
+_lock = threading.Lock()
+
+# Generates the job ids.
+_job_ids = itertools.count(1)
+
+# The widget whose method after() schedules the polling of the results; None if the executor
+# is not started.
+_widget = None
+
+# The identifier of the next call to _poll() scheduled with _widget.after(), None if no call is scheduled.
+_poll_id = None
+
+# The thread that runs the jobs.
+_worker_thread = None
+
+def _worker(db_file, config):
+    """Runs the jobs of the queue _jobs until it receives None.
+
+    This function is the target of the thread started by start().
+    """
+    conn = db.connect(db_file, config)
+    cursor = conn.cursor()
+    try:
+        while True:
+            job = _jobs.get()
+            if job is None:
+                break
+            job_id, function = job
+
+            # A cancelled job is not run.
+            with _lock:
+                if job_id not in _pending:
+                    continue
+
+            try:
+                value = function(cursor, conn)
+            except Exception as error:
+                # The worker keeps running; the transaction left open by the job, if any, is cancelled.
+                if conn.in_transaction:
+                    conn.rollback()
+                print(error)
+                value = None
+            _results.put((job_id, value))
+    finally:
+        cursor.close()
+        conn.close()
+
+def start(widget, db_file=None, config=None):
+    """Starts the DB executor.
+
+    Parameters
+    ----------
+    widget : tk.Tk
+        The window whose event loop delivers the results (the main window).
+    db_file : string, optional
+        The path to the database file (default: the path specified in the configuration).
+    config : dictionary, optional
+        The application configuration (default: the configuration loaded from ./config/config).
+    """
+    global _widget
+    global _worker_thread
+
+    _widget = widget
+    if _worker_thread is None:
+        # Daemon thread: a running query doesn't prevent the application from exiting.
+        _worker_thread = threading.Thread(target=_worker, args=(db_file, config), name="db-executor", daemon=True)
+        _worker_thread.start()
+
+def stop():
+    """Stops the DB executor, after the jobs already submitted; the results not delivered yet are dropped.
+    """
+    global _widget
+    global _worker_thread
+    global _poll_id
+
+    if _poll_id is not None:
+        try:
+            _widget.after_cancel(_poll_id)
+        except tk.TclError:
+            # The window may be already destroyed.
+            pass
+        _poll_id = None
+    _widget = None
+    with _lock:
+        _pending.clear()
+        _latest.clear()
+    if _worker_thread is not None:
+        _jobs.put(None)
+        _worker_thread.join()
+        _worker_thread = None
+
+def submit(function, callback=None, key=None):
+    """Submits a job to the DB executor.
+
+    Parameters
+    ----------
+    function : function
+        The job: a function that takes in as arguments the cursor and the connection of the executor,
+        and returns a value. It runs in the thread of the executor: it must not use the widgets.
+        If it raises an exception (e.g., a sqlite3.Error), its transaction (if any) is rolled back 
+        and the value is None.
+    callback : function, optional
+        A function that takes in as argument the value returned by the job; it is called by the
+        Tk thread, when the job is over (default: None, no callback).
+    key : string, optional
+        If specified, the previous job submitted with the same key is cancelled (default: None).
+
+    Returns
+    -------
+    int
+        The identifier of the job.
+    """
+    global _poll_id
+
+    job_id = next(_job_ids)
+    with _lock:
+        if key is not None:
+            _pending.pop(_latest.get(key), None)
+            _latest[key] = job_id
+        _pending[job_id] = (callback, key)
+    _jobs.put((job_id, function))
+
+    if _poll_id is None and _widget is not None:
+        _poll_id = _widget.after(POLL_INTERVAL, _poll)
+    return job_id
+
+def cancel(key):
+    """Cancels the last job submitted with the given key, if it is not over yet.
+
+    The job doesn't run if it has not started yet; in any case, its callback is not called.
+
+    Parameters
+    ----------
+    key : string
+        The key of the job.
+    """
+    with _lock:
+        job_id = _latest.pop(key, None)
+        _pending.pop(job_id, None)
+
+def _poll():
+    """Calls the callbacks of the jobs that are over.
+
+    This function is invoked by the Tk event loop (window.after()) as long as some jobs are
+    pending. It never blocks.
+    """
+    global _poll_id
+
+    _poll_id = None
+    while True:
+        try:
+            job_id, value = _results.get_nowait()
+        except queue.Empty:
+            break
+        with _lock:
+            # The callback of a cancelled job is not called.
+            callback, key = _pending.pop(job_id, (None, None))
+            if key is not None and _latest.get(key) == job_id:
+                del _latest[key]
+        if callback is not None:
+            # A failing callback doesn't prevent the delivery of the other results.
+            try:
+                callback(value)
+            except Exception as error:
+                print(error)
+
+    with _lock:
+        still_pending = len(_pending) > 0
+    if still_pending and _widget is not None:
+        _poll_id = _widget.after(POLL_INTERVAL, _poll)
@@ -4,20 +4,23 @@
 
 import tkinter.font as tkfont
 from tkinter import ttk
-from PIL import Image, ImageTk
+
+import assets
 
 # The SkisatiResa main window has a menu with three buttons. 
 # We store here the currently active (selected) button, it'll change 
 # color.
 active_button = None
 
-def load_icon_image():
-    """Loads the icon image of SkisatiResa
+def load_icon_image(master=None):
+    """Loads the icon image of SkisatiResa (decoded and resized once, see assets.py).
+
+    Parameters
+    ----------
+    master : tkinter widget, optional
+        The window of the icon (default: None).
     """
-    icon = Image.open("./gui/icons/skisati-logo.png")
-    icon = icon.resize((32, 32), Image.Resampling.LANCZOS)
-    icon = ImageTk.PhotoImage(icon)
-    return icon
+    return assets.load_image("./gui/icons/skisati-logo.png", (32, 32), master=master)
 
 def reset_active_button():
     """Resets the active button (no button is selected).
@@ -60,8 +63,10 @@ def configure_style():
     s.configure('SampleThree.TLabel', background="yellow")
     s.configure('SampleFour.TLabel', background="green")
     s.configure('Header.TLabel', background="#dcdad5", font=('TkDefaultFont', default_font_size + 2, tkfont.BOLD) )
+    s.configure('Treeview.Heading', background="#dcdad5", font=('TkDefaultFont', default_font_size + 2, tkfont.BOLD) )
     s.configure('Check.TLabel', background="#f1f1f1", foreground='red')
     s.configure('TRadiobutton', background="#f1f1f1")
+    s.configure('Menu.TLabel', background="#222323", foreground="#a0a0a0")
 
     s.configure('Menu.TButton', background="#222323", \
         foreground="white", font=('TkDefaultFont', default_font_size + 5), borderwidth=0)
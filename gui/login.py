@@ -9,6 +9,7 @@ READ THE CODE FROM TOP TO BOTTOM in order to read all the comments and understan
 # Import the tkinter widgets.
 import tkinter as tk
 from tkinter import ttk
+import queue
 
 # Import the configuration of the SkisatiResa GUI.
 import gui.gui_config as config
@@ -55,6 +56,16 @@ control_labels = {}
 # The buttons in the login window.
 buttons = {}
 
+# The queue that receives the result of the login check running in the background 
+# (see auth.start_login_check()), None when no check is running.
+login_check = None
+
+# The identifier of the next call to poll_login_check() scheduled with window.after().
+poll_id = None
+
+# How often (in milliseconds) the window checks whether the login check is over.
+LOGIN_POLL_INTERVAL = 50
+
 def open_login_window(_cursor, _conn, _messages_bundle, _lang):
     """Opens a new login window.
 
@@ -94,7 +105,7 @@ def open_login_window(_cursor, _conn, _messages_bundle, _lang):
     
     # Load the icon image of the application. 
     # This function is already implemented in the file ./gui/gui_config.py
-    icon = config.load_icon_image()
+    icon = config.load_icon_image(window)
     
     # Assigns the icon to the window.
     # If you're on Windows, the icon will appear next to the title in the title bar. 
@@ -428,60 +439,109 @@ def password_updated(*args):
 def login():
     """Invoked when the user clicks on the button Login.
 
-    The function calls auth.login_correct() to check whether the username and password typed by the user are correct.
-    The function auth.login_correct() takes in as arguments:
-    * The username
-    * The password
-    * The cursor (not used in the current implementation of the function, it will be used when we implement 
-    the authentication module).
+    The function calls auth.start_login_check() to check whether the username and password typed by the user are correct.
+    The password is verified in a background thread (the verification takes a while on purpose), so that 
+    the window stays responsive: while the check is running, the window is in the BUSY state and the 
+    function poll_login_check() waits for the result, then calls login_done().
+    """
+    global login_check
 
-    The function returns a tuple:
-    * (True, None, None) if the username and the password are correct (in the current implementation, the only correct
-    combination is ("admin", "Adm1n!") ).
+    # On récupère username et password via les helpers
+    username = get_username()
+    password = get_password()
 
-    * (False, USERNAME_NOT_FOUND, username) if the username doesn't exist.
+    # Appel au module d'authentification, en arrière-plan
+    login_check = auth.start_login_check(username, password, cursor)
+    busy_state()
+    poll_login_check()
 
-    * (False, INCORRECT_PASSWORD, password) if the password is not correct.
+def poll_login_check():
+    """Checks whether the login check running in the background is over.
 
-    Use the return value of this function to take the proper action.
+    This function is invoked periodically by the Tk event loop (window.after()) until the 
+    result of the check is available. It never blocks.
     """
-    res = auth.login_correct(get_username(), get_password(), cursor)
+    global login_check
+    global poll_id
 
-    ############ TODO: WRITE HERE THE CODE TO IMPLEMENT THIS FUNCTION ##########
-    # On récupère username et password via les helpers
-    username = get_username()
-    password = get_password()
+    try:
+        res = login_check.get_nowait()
+    except queue.Empty:
+        poll_id = window.after(LOGIN_POLL_INTERVAL, poll_login_check)
+        return
+    login_check = None
+    poll_id = None
+    login_done(res)
+
+def login_done(res):
+    """Invoked when the login check is over.
+
+    Parameters
+    ----------
+    res : tuple
+        The result of the check, as returned by auth.login_correct():
+
+        * (True, None, new_hashed_password) if the username and the password are correct;
+          new_hashed_password is not None if the stored password must be encrypted again
+          (the number of rounds has changed).
+
+        * (False, USERNAME_NOT_FOUND, username) if the username doesn't exist.
 
-    # Appel au module d'authentification
-    res = auth.login_correct(username, password, cursor)
+        * (False, INCORRECT_PASSWORD, password) if the password is not correct.
+    """
     ok, error_code, value = res
 
     if ok:
         # Message de succès
         control_labels["message"].config(text=messages_bundle["login_authorized"])
 
+        # Le mot de passe est chiffré à nouveau si le nombre de rounds a changé
+        if value is not None:
+            auth.update_password_hash(get_username(), value, cursor, conn)
+
         # Ouvrir la fenêtre principale
         open_main_window(cursor, conn, messages_bundle, lang)
 
         # Fermer la fenêtre de login
         window.destroy()
+        return
+
+    # L'utilisateur peut corriger ses identifiants
+    _set_credentials_state("normal")
+    buttons["clear"].configure(state="normal")
+
+    # Erreur : username inconnu
+    if error_code == auth.USERNAME_NOT_FOUND:
+        credentials_entered_state(messages_bundle["username_not_found"])
+    # Erreur : mauvais mot de passe
+    elif error_code == auth.INCORRECT_PASSWORD:
+        credentials_entered_state(messages_bundle["incorrect_password"])
+    # Erreur inattendue (par sécurité)
     else:
-        # Erreur : username inconnu
-        if error_code == auth.USERNAME_NOT_FOUND:
-            control_labels["message"].config(
-                text=messages_bundle["username_not_found"]
-            )
-        # Erreur : mauvais mot de passe
-        elif error_code == auth.INCORRECT_PASSWORD:
-            control_labels["message"].config(
-                text=messages_bundle["incorrect_password"]
-            )
-        # Erreur inattendue (par sécurité)
-        else:
-            control_labels["message"].config(
-                text=messages_bundle.get("unexpected_error", "Unexpected error")
-            )
-    ####################################################################################
+        credentials_entered_state(messages_bundle.get("unexpected_error", "Unexpected error"))
+
+def busy_state():
+    """Sets the state of the widgets in the BUSY state, while the credentials are being checked.
+
+    The text fields and the buttons Login and Clear are disabled; the button Cancel stays enabled.
+    """
+    _set_credentials_state("disabled")
+    buttons["login"].configure(state="disabled")
+    buttons["clear"].configure(state="disabled")
+    control_labels["message"].configure(text=messages_bundle["login_checking"])
+
+def _set_credentials_state(state):
+    """Enables or disables the username and password text fields.
+
+    Parameters
+    ----------
+    state : string
+        "normal" or "disabled".
+    """
+    for child in entries["username"][0].master.grid_slaves(row=0, column=1):
+        child.configure(state=state)
+    for child in entries["password"][0].master.grid_slaves(row=1, column=1):
+        child.configure(state=state)
 
 def clear():
     """Invoked when the user clicks on the button Clear.
@@ -509,6 +569,9 @@ def cancel():
     """
 
     ############ TODO: WRITE HERE THE CODE TO IMPLEMENT THIS FUNCTION ##########
+    # Le résultat d'une vérification en cours est ignoré.
+    if poll_id is not None:
+        window.after_cancel(poll_id)
     window.destroy()
 
     ####################################################################################
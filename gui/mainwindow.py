@@ -6,11 +6,13 @@ import csv
 
 from tkinter import ttk
 import gui.gui_config as config
+import gui.dbexecutor as dbexecutor
 from gui.student.frame import add_widgets as stud_add_widgets
 from gui.registration.newreg_frame import add_widgets as reg_add_widgets
 from gui.registration.editreg_frame import add_widgets as reg_edit_widgets
 import mdeadline
-from PIL import Image, ImageTk
+import queue
+import assets
 
 # The messages bundle
 messages_bundle = {}
@@ -33,6 +35,9 @@ tabs = {"student" : None, "add_registration": None, "edit_registration": None}
 # The ttk.Notebook (frame) containing the above tabs.
 nb = None
 
+# How often (in milliseconds) the main window checks the progress of the deadline management job.
+DEADLINE_POLL_INTERVAL = 200
+
 def destroy_tab(event, tab_name, button):
     """Destroys a given tab.
 
@@ -227,6 +232,41 @@ def open_edit_registration_tab(window, btn_edit_registration):
     tabs["edit_registration"] = edit_reg_tab
     
 
+def poll_deadline_management(window, progress, status_label, counts):
+    """Shows the progress of the deadline management job, that runs in a background thread.
+
+    This function is invoked periodically by the Tk event loop (window.after()) as long as the 
+    window is open, since the job runs once a day. It never blocks: it only reads the events 
+    already in the queue.
+
+    Parameters
+    ----------
+    window : tk.Tk
+        The SkisatiResa main window.
+    progress : queue.Queue
+        The queue through which the job reports its progress (see mdeadline.start_deadline_management()).
+    status_label : ttk.Label
+        The label that shows the progress of the job.
+    counts : dictionary
+        The number of reminders and of expired registrations reported so far by the current run.
+    """
+    while True:
+        try:
+            event, value = progress.get_nowait()
+        except queue.Empty:
+            break
+        if event == "error":
+            status_label.configure(text=messages_bundle["deadline_error"])
+        elif event == "skipped":
+            status_label.configure(text=messages_bundle["deadline_skipped"])
+        elif event == "done":
+            status_label.configure(text=messages_bundle["deadline_done"].format(**counts))
+            counts.update({"reminders": 0, "expired": 0})
+        else:
+            counts[event] = value
+    window.after(DEADLINE_POLL_INTERVAL, 
+        lambda: poll_deadline_management(window, progress, status_label, counts))
+
 def open_main_window(_cursor, _conn, _messages_bundle, _lang):
     """Opens the SkisatiResa main window.
 
@@ -257,7 +297,7 @@ def open_main_window(_cursor, _conn, _messages_bundle, _lang):
     window.title("SkisatiResa")
 
     # Add an icon to the window.
-    icon = config.load_icon_image()
+    icon = config.load_icon_image(window)
     window.iconphoto(False, icon)
 
     # Set the window as non-resizable.
@@ -280,10 +320,7 @@ def open_main_window(_cursor, _conn, _messages_bundle, _lang):
     frm_intro.grid(row=0, column=1, sticky='nsew')
 
     # Add the background image.
-    image = Image.open("./gui/icons/skisati-logo.png")
-    image = image.resize((400, 400), Image.ANTIALIAS)
-    image.putalpha(128)
-    image = ImageTk.PhotoImage(image)
+    image = assets.load_image("./gui/icons/skisati-logo.png", (400, 400), alpha=128, master=window)
     ttk.Label(frm_intro, borderwidth=0, image=image).grid(row=0, column=0)
     
     # Add the left menu with the three buttons.
@@ -300,12 +337,25 @@ def open_main_window(_cursor, _conn, _messages_bundle, _lang):
         command=lambda: open_edit_registration_tab(frm_intro, btn_edit_registration))
     btn_edit_registration.grid(row=2, column=0, padx=5, pady=0, ipadx=20, ipady=5, sticky='ew')
     
+    # The label that shows the progress of the deadline management job.
+    deadline_status = ttk.Label(frm_menu, text=messages_bundle["deadline_running"], style="Menu.TLabel", wraplength=180)
+    deadline_status.grid(row=3, column=0, padx=5, pady=20, sticky='ew')
+
     frm_menu.grid(row=0, column=0, sticky='nsew')
     frm_menu.columnconfigure(0, weight=1)
 
-    # Start the deadline module that runs in the background.
-    mdeadline.deadline_management_init(window, cursor, conn)
-    window.after(0, mdeadline.deadline_management)
+    # Start the deadline module that runs in the background once a day, with its own connection to the 
+    # database. The main window polls its progress, so that the user can work while the job is running.
+    _, progress = mdeadline.start_deadline_management()
+    window.after(DEADLINE_POLL_INTERVAL, 
+        lambda: poll_deadline_management(window, progress, deadline_status, {"reminders": 0, "expired": 0}))
+
+    # Start the DB executor: the tabs run their queries in the background, with their own connection 
+    # to the database, so that a slow query never freezes the window.
+    dbexecutor.start(window)
 
     # Start the event loop
-    window.mainloop()
\ No newline at end of file
+    window.mainloop()
+
+    # The window is closed: the queries already submitted are finished before the executor stops.
+    dbexecutor.stop()
\ No newline at end of file
@@ -6,6 +6,7 @@ All the callbacks associated to users' actions on the edit registration tab are
 defined here.
 """
 
+import gui.dbexecutor as dbexecutor
 import mstudent as mstud
 import mregistration as mreg
 
@@ -16,6 +17,9 @@ from datetime import date
 import tkinter as tk
 from tkinter import ttk
 
+# The key of the search of a student in the DB executor: a new search cancels the previous one.
+FIND_STUDENT_KEY = "edit_reg_tab.find_student"
+
 # Here we store all the different widgets of the student tab.
 control_labels = {}
 entries = {}
@@ -60,40 +64,43 @@ current_state = INIT_STATE
 # When nb_rows_selected > 0, we transition to the DELETE state.
 nb_rows_selected = 0
 
-# When we load from the database the list of all registrations of a student,
-# we create a table, where each cell contains a widget (a label, a text entry or a check button).
-# All the widgets are stored in this list.
-# Specifically, each item of the list is a tuple that contains the widgets on one row of the table.
-#
-# The first item is a tuple (ttk.Checkbutton, ttk.Label, ttk.Label, ttk.Label).
-# The check button is used to select all rows in the table; the three labels contain the headers 
-# of the table (edition year, registration date and payment date).
+# The registrations of the current student are shown in a table (a ttk.Treeview), where each row 
+# is a registration and the three columns are the edition year, the registration date and the payment date.
+# The Treeview only draws the rows that are visible, and a row is not a widget: the table stays fast 
+# and light however many registrations it shows.
+# A date is edited in place: when the user double-clicks a cell, a single text field 
+# (registration_editor) is placed over the cell (see start_edit()); the date is checked at each keystroke.
+# The rows are selected with the mouse (<Control> and <Shift> to select several rows, <Control-a> to 
+# select all the rows); the selected rows can be deleted.
 #
-# Each subsequent item is a tuple (ttk.Checkbutton, ttk.Entry, ttk.Entry, ttk.Entry);
-# the check button is used to select the corresponding row; the three entries contain
-# the edition year, the registration and payment date of a registration.
-registration_data = []
+# The identifier of the row of student_registrations[i] in the table is str(i).
+REGISTRATION_COLUMNS = ("edition_year", "registration_date", "payment_date")
+
+# The table (ttk.Treeview) with the registrations of the current student.
+registration_table = None
+
+# The text field used to edit a date of the table in place.
+registration_editor = None
+
+# The cell being edited, as a tuple (index of the registration, index of the column, value of the cell 
+# before the edition), None if no cell is being edited.
+edited_cell = None
 
-# It contains all the variables that track the current value of the widgets stored in 
-# registration_data.
-# registration_data_var[i][j] is the variable with the current value of the widget 
-# registration_data[i][j]
-registration_data_var = []
+# It contains the current values of the registrations of the current student, with the changes of the user.
+# Each item is a list [edition year, registration date, payment date]; the dates are displayed as dd/mm/yyyy.
+student_registrations = []
 
 # It contains the registrations of the current student as they are loaded from the database.
-# The values in registration_data_var reflect the changes of the user; 
+# The values in student_registrations reflect the changes of the user; 
 # the values in current_student_registrations reflect the original values.
-# By comparing registration_data_var against current_student_registrations we know if 
+# By comparing student_registrations against current_student_registrations we know if 
 # some values have been changed, which justifies a transition to the EDIT state.
 # 
-# Each item of this list contains a tuple (a registratiion) with three values: edition year, registration date,
+# Each item of this list contains a tuple (a registration) with three values: edition year, registration date,
 # payment_date. 
 # The registration current_student_registrations[i] corresponds to the registration 
-# registration_data_var[i]. 
-# Note that since registration_data_var contains some header values in the first position, 
-# the first item in current_student_registrations is ("", "", ""); this way a registration 
-# is stored at the same index in both lists.
-current_student_registrations = [("", "", "")]
+# student_registrations[i]. 
+current_student_registrations = []
 
 # The dictionary containing all the messages shown in the GUI.
 messages_bundle = {}
@@ -104,16 +111,13 @@ check_image = None
 # Reference to the edit registration tab.
 edit_reg_tab = None
 
-# Reference to the frame that contains the table withe registrations of the current student.
-scroll_registration_frm = None
-
 # The object used to query the database.
 cursor = None
 
 # The object used to connect to the database.
 conn = None
 
-def init(_messages_bundle, _check_image, _edit_reg_tab, _scroll_registration_frm, _cursor, _conn):
+def init(_messages_bundle, _check_image, _edit_reg_tab, _registration_table, _cursor, _conn):
     """Initializes some of the global variables defined in the file.
 
     Parameters
@@ -124,6 +128,8 @@ def init(_messages_bundle, _check_image, _edit_reg_tab, _scroll_registration_frm
         The image used to indicate that a field contains a correct value.
     _edit_reg_tab : ttk.Frame
         The edit registration tab.
+    _registration_table : ttk.Treeview
+        The table with the registrations of the current student.
     _cursor : 
         The object used to query the database.
     _conn : 
@@ -132,17 +138,31 @@ def init(_messages_bundle, _check_image, _edit_reg_tab, _scroll_registration_frm
     global messages_bundle
     global check_image
     global edit_reg_tab
-    global scroll_registration_frm
+    global registration_table
+    global registration_editor
     global cursor
     global conn
 
     messages_bundle = _messages_bundle
     check_image = _check_image
     edit_reg_tab = _edit_reg_tab
-    scroll_registration_frm = _scroll_registration_frm
+    registration_table = _registration_table
     cursor = _cursor
     conn = _conn
 
+    # The rows with invalid dates are highlighted in red.
+    registration_table.tag_configure("error", background="red")
+    registration_table.bind("<<TreeviewSelect>>", lambda event: rows_selected())
+    registration_table.bind("<Double-1>", start_edit)
+    registration_table.bind("<Control-a>", lambda event: select_all_rows())
+
+    # The text field used to edit a date in place. It is only visible while a date is being edited.
+    registration_editor = ttk.Entry(registration_table, justify="center")
+    registration_editor.bind("<KeyRelease>", lambda event: edited_date_updated())
+    registration_editor.bind("<Return>", lambda event: finish_edit())
+    registration_editor.bind("<FocusOut>", lambda event: finish_edit())
+    registration_editor.bind("<Escape>", lambda event: cancel_edit(restore=True))
+
 def reset():
     """Resets some of the global variables defined in this file.
 
@@ -153,7 +173,7 @@ def reset():
     global nb_rows_selected
     
     filled_mandatory_fields = [0 for i in range(nb_mandatory_fields)]
-    current_student_registrations = [("", "", "")]
+    current_student_registrations = []
     transition()
     reset_control_label()
 
@@ -282,17 +302,32 @@ def are_dates_ok():
     bool
         True if all dates are OK, False otherwise.
     """
-    for i in range(1, len(registration_data_var)):
-        year = int(get_edition_year(i))
-        registration_date = get_registration_date(i)
-        payment_date = get_payment_date(i)
-        if not utils.is_valid_date(registration_date, empty=False) \
-            or not utils.is_valid_date(payment_date) \
-            or not utils.payment_date_after_registration(payment_date, registration_date) \
-            or not utils.check_registration_year(registration_date, year):
+    for i in range(len(student_registrations)):
+        if not is_registration_ok(i):
             return False
     return True
 
+def is_registration_ok(index):
+    """Returns whether the dates of the registration at the given index/row are OK.
+
+    Parameters
+    ----------
+    index : int
+        The index/row of the registration.
+
+    Returns
+    -------
+    bool
+        True if the dates are OK, False otherwise.
+    """
+    year = int(get_edition_year(index))
+    registration_date = get_registration_date(index)
+    payment_date = get_payment_date(index)
+    return utils.is_valid_date(registration_date, empty=False) \
+        and utils.is_valid_date(payment_date) \
+        and utils.payment_date_after_registration(payment_date, registration_date) \
+        and utils.check_registration_year(registration_date, year)
+
 def something_to_edit():
     """Returns whether the user has changed some values.
 
@@ -301,7 +336,7 @@ def something_to_edit():
     bool
         True if the user has changed some values, False otherwise.
     """
-    for i in range(1, len(registration_data_var)):
+    for i in range(len(student_registrations)):
         registration_date = get_registration_date(i)
         payment_date = get_payment_date(i)
         if registration_date != current_student_registrations[i][1] or \
@@ -319,55 +354,17 @@ def mandatory_fields_ok():
     """
     return sum(filled_mandatory_fields) == nb_mandatory_fields
 
-def is_button_checked(index):
-    """Returns whether the check button at the specified index (row) is checked or not.
-
-    Returns
-    -------
-    bool
-        True if the specified check button is checked, False otherwise.
-    """
-    return registration_data_var[index][0].get()
-
-def check_button(index):
-    """Sets the check button at the specified index (row) as checked.
-    """
-    registration_data_var[index][0].set(1)
-        
-
-def check_all_buttons():
-    """Sets all the check buttons as checked.
-    """
-    for i in range(len(registration_data_var)):
-        if not is_button_checked(i):
-            check_button(i)
-
-def uncheck_button(index):
-    """Sets the check button at the specified index as unchecked.
-    """
-    registration_data_var[index][0].set(0)
-
-def uncheck_all_buttons():
-    """Sets all the check buttons as unchecked.
+def select_all_rows():
+    """Selects all the rows of the registration table (key <Control-a>).
     """
-    for i in range(len(registration_data_var)):
-        if is_button_checked(i):
-            uncheck_button(i)
+    registration_table.selection_set(registration_table.get_children())
+    return "break"
 
-def row_selected(index):
-    """Invoked when the user selects/deselects a row.
+def rows_selected():
+    """Invoked when the user selects/deselects rows.
     """
     global nb_rows_selected
-    # if row selected, we increment nb_rows_selected, otherwise we decrement it.
-    nb_rows_selected = nb_rows_selected + 1 if registration_data_var[index][0].get() else nb_rows_selected - 1
-
-    for i in range(1, len(registration_data_var)):
-        if not is_button_checked(i):
-            uncheck_button(0)
-            break
-    else:
-        check_button(0)
-
+    nb_rows_selected = len(registration_table.selection())
     transition()
 
 def clear_fields_student_except_stud_number():
@@ -381,27 +378,15 @@ def clear_fields_student_except_stud_number():
 def clear_registration_table():
     """Clears the table containing all the registrations of the current student.
     """
-    global registration_data
-    global registration_data_var
+    global student_registrations
     global current_student_registrations
-    
-    if len(registration_data) > 0:
-        for row in registration_data[1:]:
-            for item in row:
-                item.grid_remove()
-                item.destroy()
-        
-        for header in registration_data[0]:
-            header.grid_remove()
-            header.destroy()
-        
-        scroll_registration_frm.update()
-        scroll_registration_frm.configure(style="Empty.TFrame")
-
-        uncheck_all_buttons()
-        registration_data = []
-        registration_data_var = []
-        current_student_registrations = [("", "")]
+    global nb_rows_selected
+
+    cancel_edit()
+    registration_table.delete(*registration_table.get_children())
+    student_registrations = []
+    current_student_registrations = []
+    nb_rows_selected = 0
 
 def clear_fields():
     """Clears all the fields
@@ -410,19 +395,11 @@ def clear_fields():
     clear_fields_student_except_stud_number()
 
 
-def check_all_selected():
-    """Invoked when the user checks/unchecks the button on the first row (indicating that s/he wants to select/
-    deselect all rows).
-    """
-    # If the button is checked, we select all rows
-    if is_button_checked(0):
-        check_all_buttons()
-    else: # otherwise, we deselect all rows.
-        uncheck_all_buttons()
-
 def stud_number_updated():
     """Invoked when the user types the student number in the corresponding text field.
     """
+    # The search of the previous student number, if it's still running, is now useless.
+    dbexecutor.cancel(FIND_STUDENT_KEY)
     stud_number = get_stud_number()
     if len(stud_number) > 0:
         if not stud_number.isdigit():
@@ -437,202 +414,200 @@ def stud_number_updated():
         filled_mandatory_fields[STUD_NUMBER] = 0
     transition()
 
-def registration_date_updated(index):
-    """Invoked when the user modifies the registration date at a specified index/row.
+def start_edit(event):
+    """Invoked when the user double-clicks a cell of the registration table.
 
-    Parameter
-    ---------
-    index : int
-        The index/row of the registration of which the registration date has been modified.
+    If the cell contains a date, the text field registration_editor is placed over the cell, 
+    so that the user can edit the date in place.
 
+    Parameters
+    ----------
+    event:
+        Information on the event.
     """
-    year = int(get_edition_year(index))
-    new_registration_date = get_registration_date(index)
-    payment_date = get_payment_date(index)
-    
-    # We highlight in red the date if it's not valid.
-    if not utils.is_valid_date(new_registration_date, empty=False):
-        registration_data[index][2].configure(style="Error.TEntry")
-    else: # the format is OK but....
-        # We compare the registration date against the payment date to make sure that
-        # the latter is greater than  or equal to the former.
-        # If that's not the case, both dates are highlighted in red.
-        if utils.is_valid_date(payment_date) and \
-            not utils.payment_date_after_registration(payment_date, new_registration_date):
-                registration_data[index][2].configure(style="Error.TEntry")
-                registration_data[index][3].configure(style="Error.TEntry")
-        else: # the payment date is OK
-            registration_data[index][3].configure(style="TEntry")
-            # We still need to compare the registration year against the edition year. 
-            # If the registration year is not (edition year - 1), we highlight the 
-            # registration date in red.
-            if not utils.check_registration_year(new_registration_date, year):
-                registration_data[index][2].configure(style="Error.TEntry")
-            else: #  registration date is OK
-                registration_data[index][2].configure(style="TEntry")
-    transition()
+    global edited_cell
+
+    finish_edit()
+    row = registration_table.identify_row(event.y)
+    # The columns are identified as "#1", "#2"...; the edition year can't be edited.
+    column = int(registration_table.identify_column(event.x)[1:] or 0) - 1
+    if not row or column < 1:
+        return
+    bbox = registration_table.bbox(row, REGISTRATION_COLUMNS[column])
+    if not bbox:
+        return
+
+    # The double-click has selected the row: we deselect it, since a selected row is 
+    # meant to be deleted, not edited.
+    registration_table.selection_remove(row)
+
+    edited_cell = (int(row), column, student_registrations[int(row)][column])
+    x, y, width, height = bbox
+    registration_editor.delete(0, tk.END)
+    registration_editor.insert(0, student_registrations[int(row)][column])
+    registration_editor.place(x=x, y=y, width=width, height=height)
+    registration_editor.focus_set()
+    registration_editor.select_range(0, tk.END)
+
+def edited_date_updated():
+    """Invoked when the user types in the text field of the cell being edited (key released).
+
+    The value of the text field is copied into the table and the dates of the registration are checked, 
+    so that the buttons are always in the right state, even before the edition is over.
+    """
+    if edited_cell is None:
+        return
+    index, column, _ = edited_cell
+    value = registration_editor.get().strip()
+    if value != student_registrations[index][column]:
+        student_registrations[index][column] = value
+        registration_table.set(str(index), REGISTRATION_COLUMNS[column], value)
+        registration_updated(index)
+
+def finish_edit():
+    """Invoked when the user has edited a date in place (key <Return>, or the text field loses the focus).
+
+    The new value is copied into the table and the text field is hidden.
+    """
+    global edited_cell
+
+    if edited_cell is None:
+        return
+    edited_date_updated()
+    edited_cell = None
+    registration_editor.place_forget()
 
-def payment_date_updated(index):
-    """Invoked when the user modifies the payment date at a specified index/row.
+def cancel_edit(restore=False):
+    """Invoked when the user cancels the edition of a date (key <Escape>).
+
+    Parameters
+    ----------
+    restore : bool, optional
+        If True, the cell gets back the value it had before the edition (default: False).
+    """
+    global edited_cell
+
+    if edited_cell is not None and restore:
+        index, column, value = edited_cell
+        student_registrations[index][column] = value
+        registration_table.set(str(index), REGISTRATION_COLUMNS[column], value)
+        registration_updated(index)
+    edited_cell = None
+    if registration_editor is not None:
+        registration_editor.place_forget()
+
+def registration_updated(index):
+    """Invoked when the user modifies a date of the registration at a specified index/row.
+
+    The row is highlighted in red if the dates are not valid: a date is not in the format dd/mm/yyyy, 
+    the payment date is before the registration date, or the registration year is not 
+    (edition year - 1).
 
     Parameter
     ---------
     index : int
-        The index/row of the registration of which the payment date has been modified.
+        The index/row of the registration that has been modified.
     """
-    new_payment_date = get_payment_date(index)
-    registration_date = get_registration_date(index)
-    
-    # We hightlight in red the payment date if its format is not correct.
-    if not utils.is_valid_date(new_payment_date):
-        registration_data[index][3].configure(style="Error.TEntry")
-    else:
-        # We compare the registration date against the payment date to make sure that
-        # the latter is greater than  or equal to the former.
-        # If that's not the case, both dates are highlighted in red.
-        registration_data[index][3].configure(style="TEntry")
-        if utils.is_valid_date(registration_date, empty=False):
-            if not utils.payment_date_after_registration(new_payment_date, registration_date):
-                registration_data[index][2].configure(style="Error.TEntry")
-                registration_data[index][3].configure(style="Error.TEntry")
-            else: # The payment date is OK, the registration date must be checked against the year.
-                # We reload the value so as to force a new check on the registration date (dirty hack).
-                registration_data_var[index][2].set(get_registration_date(index))
-                registration_data[index][3].configure(style="TEntry")
+    registration_table.item(str(index), tags=() if is_registration_ok(index) else ("error",))
     transition()
-        
-def get_student_registrations(stud_number):
-    """Invoked when the user presses the key <Tab> after entering the 
-    student number
+
+def load_student(stud_number, cursor):
+    """Loads a student and their registrations from the database.
+
+    This function runs in the thread of the DB executor (see gui/dbexecutor.py).
 
     Parameters
     ----------
-    stud_number : int
+    stud_number : string
         The student number.
+    cursor : 
+        The object used to query the database.
+
+    Returns
+    -------
+    A tuple T
+        T[0] is the student, as returned by mstud.get_student().
+        T[1] is the list of the registrations of the student, as returned by mreg.get_student_registrations()
+        (None if the student is not found).
+    """
+    student = mstud.get_student(stud_number, cursor)
+    if not student:
+        return (student, None)
+    return (student, mreg.get_student_registrations(stud_number, cursor))
+
+def get_student_registrations(stud_regs):
+    """Shows the registrations of the current student in the registration table.
+
+    Parameters
+    ----------
+    stud_regs : list
+        The registrations loaded from the database, as returned by mreg.get_student_registrations().
     """
-    # Get all the registrations from the database.
-    stud_regs = mreg.get_student_registrations(stud_number, cursor)
     if stud_regs is None:
         write_message(messages_bundle["unexpected_error"])
         return 
-    
-    # Nothing to do if the list is empty.
-    if len(stud_regs) == 0:
-        return
 
-    scroll_registration_frm.configure(style="Table.TFrame")
-
-    # In registration_data_var, we add the first item, that corresponds to the 
-    # variables with the current content of the reegistration table header.
-    # The header contains a check button that is used to select/deselect 
-    # all the rows. The tk.IntVar is used to track the current value of 
-    # this check button. 
-    # The header also contains three labels, but they have no associated variable.
-    registration_data_var.append((tk.IntVar(),))
-
-    # Here we add the widgets of the registration table. 
-    # Each row is represented as a tuple.
-    # Here we add the header: a check button (to select/deselect all rows) and three labels 
-    # with the headers of the table.
-    registration_data.append(
-        (
-            ttk.Checkbutton(scroll_registration_frm, width=5, variable=registration_data_var[0][0], \
-                command=check_all_selected),
-            ttk.Label(scroll_registration_frm, anchor=tk.CENTER, \
-                text=messages_bundle["edition_year"], style="Header.TLabel"), 
-            ttk.Label(scroll_registration_frm, anchor=tk.CENTER, \
-                text=messages_bundle["registration_date"], style="Header.TLabel"),
-            ttk.Label(scroll_registration_frm, anchor=tk.CENTER, \
-                text=messages_bundle["payment_date"], style="Header.TLabel")
-        )
-    )
-    
-    # We add the widgets to the frame.
-    registration_data[0][0].grid(row=0, column=0, padx=10, pady=5, sticky='ew')
-    registration_data[0][1].grid(row=0, column=1, padx=10, pady=5, sticky='ew')
-    registration_data[0][2].grid(row=0, column=2, pady=5, sticky='ew')
-    registration_data[0][3].grid(row=0, column=3, pady=5, sticky='ew')
-    
-    # We iterate over all the registrations and 
-    # we add a row to the registration table for each registration.
-    # Each row contains four widgets: a check button (used to select/deselect a row) and 
-    # three text fields (edition year, registration date and payment date).
+    # We add a row to the registration table for each registration.
     for i in range(len(stud_regs)):
-        # Each row is a tuple: tk.IntVar contains the current value of the 
-        # check button; the three tk.StringVar() contain the current values of the 
-        # edition year, the registration date and the payment date respectively.
-        registration_data_var.append(
-            (
-                tk.IntVar(),
-                tk.StringVar(),
-                tk.StringVar(),
-                tk.StringVar()
-            )
-        )
-
-        # The values loaded from the database.
-        year = stud_regs[i][0] 
-        registration_date = stud_regs[i][1]
-        payment_date = "" if stud_regs[i][2] is None else stud_regs[i][2]
-
-        # We trace the value of the check button. 
-        # Whenever the user checks/unchecks the button, the 
-        # function row_selected() is invoked.
-        registration_data_var[i+1][0].trace("w", \
-            lambda name, index, mode, var_index=i+1: row_selected(var_index))
-
-        # Wev set eh values of the three text fields.
-        registration_data_var[i+1][1].set(year)
-        registration_data_var[i+1][2].set(registration_date)
-        registration_data_var[i+1][3].set(payment_date)
+        # The values loaded from the database. 
+        # The dates are stored as yyyy-mm-dd, they are displayed as dd/mm/yyyy.
+        year = str(stud_regs[i][0])
+        registration_date = utils.to_display_date(stud_regs[i][1])
+        payment_date = utils.to_display_date(stud_regs[i][2])
 
         # The values loaded from the database are stored in the list 
         # current_student_registrations. This way, we can track the values that the user
         # changed.
         current_student_registrations.append((year, registration_date, payment_date))
-        
-        # We add the four widgets to the list registration_data.
-        registration_data.append(
-            (
-                ttk.Checkbutton(scroll_registration_frm, width=5, variable=registration_data_var[i+1][0]),
-                ttk.Entry(scroll_registration_frm, state="disabled", justify='center', textvariable=registration_data_var[i+1][1]),
-                ttk.Entry(scroll_registration_frm, justify='center', textvariable=registration_data_var[i+1][2]),
-                ttk.Entry(scroll_registration_frm, justify='center', textvariable=registration_data_var[i+1][3])
-            )
-        )
-        # The four widgets are added to the frame.
-        registration_data[i+1][0].grid(row=i+1, column=0, padx=10, sticky='ew')
-        registration_data[i+1][1].grid(row=i+1, column=1, padx=10, sticky='ew')
-        registration_data[i+1][2].grid(row=i+1, column=2, padx=10, sticky='ew')
-        registration_data[i+1][3].grid(row=i+1, column=3, padx=10, sticky='ew')
-
-        # Whenever the user types a registration date and presses the  key <Tab>, 
-        # the function registration_date_updated is invoked.
-        registration_data[i+1][2].bind(
-            '<FocusOut>', 
-            lambda event, index=i+1: registration_date_updated(index)
-        )
+        student_registrations.append([year, registration_date, payment_date])
+        registration_table.insert("", tk.END, iid=str(i), values=(year, registration_date, payment_date))
 
-        # Whenever the user types a payment date and presses the  key <Tab>, 
-        # the function payment_date_updated is invoked.
-        registration_data[i+1][3].bind(
-            '<FocusOut>', 
-            lambda event, index=i+1: payment_date_updated(index)
-        )
+def reload_student_registrations(stud_number, message=None):
+    """Loads again the registrations of the current student, after they have been modified.
+
+    Parameters
+    ----------
+    stud_number : string
+        The student number.
+    message : string, optional
+        The message written in the message area when the registrations are shown (default: None).
+    """
+    def done(stud_regs):
+        clear_registration_table()
+        # We get the new values.
+        get_student_registrations(stud_regs)
+        if message is not None:
+            write_message(message)
+        transition()
+
+    dbexecutor.submit(lambda cursor, conn: mreg.get_student_registrations(stud_number, cursor), done, 
+        key=FIND_STUDENT_KEY)
 
 def find_student(event):
     """Invoked when the user types a student number in the corresponding 
     text field and then presses the <Tab> key.
 
+    The student and their registrations are loaded in the background (see gui/dbexecutor.py): the 
+    function student_found() is invoked with the result.
+
     Parameters
     ----------
     event:
         Information on the event.
     """
-    
-    # Get the student from the database.
     stud_number = get_stud_number()
-    student = mstud.get_student(stud_number, cursor)
+    dbexecutor.submit(lambda cursor, conn: load_student(stud_number, cursor), student_found, 
+        key=FIND_STUDENT_KEY)
+
+def student_found(res):
+    """Invoked when the search of a student started by find_student() is over.
+
+    Parameters
+    ----------
+    res : tuple
+        The student and their registrations, as returned by load_student() (None if an error occurred).
+    """
+    student, stud_regs = (None, None) if res is None else res
     clear_fields_student_except_stud_number()
 
     if student is None:
@@ -643,9 +618,8 @@ def find_student(event):
         set_last_name(student[2])
         filled_mandatory_fields[FIRST_NAME] = 1
         filled_mandatory_fields[LAST_NAME] = 1
-        # We also get all the student registrations from the database 
-        # and we display them.
-        get_student_registrations(stud_number)
+        # We also display all the student registrations.
+        get_student_registrations(stud_regs)
     else: # We display an error message is the student is not found.
         control_labels["stud_number_ctrl"].configure(text=messages_bundle["student_not_found"], image = "")
         filled_mandatory_fields[FIRST_NAME] = 0
@@ -655,61 +629,85 @@ def find_student(event):
 
 def edit_registration():
     """Invoked when the user clicks on the button Edit.
+
+    The changed dates are read here, then the database is updated in the background.
     """
+    # The date being edited in place, if any, is part of the changes.
+    finish_edit()
+    if current_state != EDIT_STATE:
+        return
 
-    # We iterate over all the registrations and we update the ones for which 
-    # the user has entered new values.
-    cursor.execute("BEGIN")
-    for i in range(1, len(registration_data_var)):
-        stud_number = get_stud_number()
-        edition_year = get_edition_year(i)
+    # We collect all the registrations for which the user has entered new values.
+    # Each item is a tuple (edition year, new registration date or None, new payment date or None).
+    stud_number = get_stud_number()
+    changes = []
+    for i in range(len(student_registrations)):
         registration_date = get_registration_date(i)
         payment_date = get_payment_date(i)
-        if registration_date != current_student_registrations[i][1]:
-            # We update the registration date.
-            res = mreg.update_registration_date(stud_number, edition_year, registration_date, cursor)
-            # If a database error occurs, we stop the update and we exit the loop
-            if not res[0]:
-                write_message(messages_bundle["unexpected_error"] + res[2])
-                conn.rollback()
-                break
-        if payment_date != current_student_registrations[i][2]:
-            # We update the payment date.
-            res = mreg.update_payment_date(stud_number, edition_year, payment_date, cursor)
-            # If a database error occurs, we stop the update and we exit the loop.
-            if not res[0]:
-                write_message(messages_bundle["unexpected_error"] + res[2])
-                conn.rollback()
-                break
-    # If no error has occurred, we commit the modifications.
-    else:
+        changes.append((get_edition_year(i), 
+            registration_date if registration_date != current_student_registrations[i][1] else None, 
+            payment_date if payment_date != current_student_registrations[i][2] else None))
+
+    def edit(cursor, conn):
+        cursor.execute("BEGIN")
+        for edition_year, registration_date, payment_date in changes:
+            if registration_date is not None:
+                # We update the registration date.
+                res = mreg.update_registration_date(stud_number, edition_year, utils.to_iso_date(registration_date), cursor)
+                # If a database error occurs, we stop the update.
+                if not res[0]:
+                    conn.rollback()
+                    return res
+            if payment_date is not None:
+                # We update the payment date.
+                res = mreg.update_payment_date(stud_number, edition_year, utils.to_iso_date(payment_date), cursor)
+                # If a database error occurs, we stop the update.
+                if not res[0]:
+                    conn.rollback()
+                    return res
+        # If no error has occurred, we commit the modifications.
         conn.commit()
-        clear_registration_table()
-        # We get the new values.
-        get_student_registrations(stud_number)
-        write_message(messages_bundle["registration_edited"])
-        transition()
+        return (True, None, None)
+
+    def done(res):
+        if res is None:
+            write_message(messages_bundle["unexpected_error"])
+        elif not res[0]:
+            write_message(messages_bundle["unexpected_error"] + str(res[2]))
+        else:
+            reload_student_registrations(stud_number, messages_bundle["registration_edited"])
+
+    dbexecutor.submit(edit, done)
     
 
 def delete_registration():
     """Invoked when  the user clicks on the button Delete.
     """
+    finish_edit()
+    if current_state != DELETE_STATE:
+        return
     stud_number = get_stud_number()
-    cursor.execute("BEGIN")
-    for i in range(1, len(registration_data_var)):
-        # We delete the row if it's selected.
-        if is_button_checked(i):
-            res = mreg.delete_registration(stud_number, get_edition_year(i), cursor)
-            if not res[0]:
-                write_message(messages_bundle["unexpected_error"] + res[2])
-                conn.rollback()
-                break
-    else:
-        conn.commit()
-        clear_registration_table()
-        get_student_registrations(stud_number)
-        transition()
-        
+    # We delete the selected rows.
+    selected = [(stud_number, get_edition_year(int(row))) for row in registration_table.selection()]
+
+    def delete(cursor, conn):
+        cursor.execute("BEGIN")
+        res = mreg.delete_registrations(selected, cursor)
+        if not res[0]:
+            conn.rollback()
+        else:
+            conn.commit()
+        return res
+
+    def done(res):
+        if res is None:
+            write_message(messages_bundle["unexpected_error"])
+        elif not res[0]:
+            write_message(messages_bundle["unexpected_error"] + str(res[2]))
+        else:
+            reload_student_registrations(stud_number)
+
+    dbexecutor.submit(delete, done)
 
 def cancel_action():
     """Invoked when the user clicks on the button Cancel.
@@ -721,6 +719,7 @@ def cancel_action():
 def clear_action():
     """Invoked when the user clicks on the button Clear.
     """
+    finish_edit()
     reset()
     clear_fields()
 
@@ -880,53 +879,52 @@ def set_last_name(last_name):
     return entries["last_name"][1].set(last_name)
 
 def get_edition_year(index):
-    """Returns the current value of the edition year text field at the 
+    """Returns the current value of the edition year of the registration at the 
     given index/row in the registration table.
 
     Parameters
     ----------
     index : int
-        The index/row of the registration table where the text field is.
+        The index/row of the registration in the registration table.
 
     Returns
     -------
     string
-        The current value of the edition year text field.
+        The current value of the edition year.
     """
-    return registration_data_var[index][1].get().strip()
+    return student_registrations[index][0].strip()
 
 def get_registration_date(index):
-    """Returns the current value of the registration date text field at the 
+    """Returns the current value of the registration date of the registration at the 
     given index/row in the registration table.
 
     Parameters
     ----------
     index : int
-        The index/row of the registration table where the text field is.
+        The index/row of the registration in the registration table.
 
     Returns
     -------
     string
-        The current value of the registration date text field.
+        The current value of the registration date.
     """
-    return registration_data_var[index][2].get().strip()
+    return student_registrations[index][1].strip()
 
 def get_payment_date(index):
-    """Returns the current value of the payment date text field at the 
+    """Returns the current value of the payment date of the registration at the 
     given index/row in the registration table.
 
     Parameters
     ----------
     index : int
-        The index/row of the registration table where the text field is.
+        The index/row of the registration in the registration table.
 
     Returns
     -------
     string
-        The current value of the payment date text field.
+        The current value of the payment date.
     """
-
-    return registration_data_var[index][3].get().strip()
+    return student_registrations[index][2].strip()
 
 def write_message(message):
     """Write a message in the message area.
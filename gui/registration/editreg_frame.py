@@ -31,7 +31,7 @@ def add_widgets(edit_reg_tab, messages_bundle, cursor, conn, lang):
     lang : string
         The language of the interface.
     """
-    check_image = utils.load_check_image()
+    check_image = utils.load_check_image(edit_reg_tab)
 
     # The student frame, where we find all the data fields relative to a student.
     student_frm = ttk.Frame(edit_reg_tab, style="Tab.TFrame")
@@ -39,7 +39,7 @@ def add_widgets(edit_reg_tab, messages_bundle, cursor, conn, lang):
     
     # The registration frame, where we find the list of all the registrations of a student.
     registration_frm = ttk.Frame(edit_reg_tab, style="Tab.TFrame")
-    scroll_registration_frm = registration_widgets(registration_frm, messages_bundle)
+    registration_table = registration_widgets(registration_frm, messages_bundle)
 
     # The message area, where we find the message area (where messages are displayed to the user).
     message_area_frm = ttk.Frame(edit_reg_tab, style="Tab.TFrame")
@@ -59,7 +59,7 @@ def add_widgets(edit_reg_tab, messages_bundle, cursor, conn, lang):
     buttons_frm.pack(fill="both", expand=True, padx=20, pady=10)
     
     # We initialize the fields.
-    clb.init(messages_bundle, check_image, edit_reg_tab, scroll_registration_frm, cursor, conn)
+    clb.init(messages_bundle, check_image, edit_reg_tab, registration_table, cursor, conn)
     clb.reset()
 
 def student_widgets(student_frm, messages_bundle, lang):
@@ -126,47 +126,34 @@ def registration_widgets(registration_frm, messages_bundle):
         The dictionary containing all the messages shown in the GUI.
 
     Returns:
-    ttk.Frame
-        A scrollable frame that is bound to contain the list of all registrations of a student.
+    ttk.Treeview
+        The table that is bound to contain the list of all registrations of a student.
     """
     
-    # We create a frame with a vertical scrollbar. 
-    # In this frame, we find the list of all registrations of a student.
-    # If the list is larger than the frame, a vertical scrollbar appears that 
-    # helps the student browse the list.
-    canvas = tk.Canvas(registration_frm)
-    scrollbar = ttk.Scrollbar(registration_frm, orient="vertical", command=canvas.yview)
-    scroll_registration_frm = ttk.Frame(canvas, style="Table.TFrame")
-
-    # Configuration of the canvas containing the frame with the scrollbar
-    def config_canvas(e):
-        # Define the scrollable region.
-        canvas.configure(scrollregion=canvas.bbox("all"))
-        # The scrollbar must appear at the top of the frame.
-        canvas.yview_moveto(0)
-
-    scroll_registration_frm.bind(
-        "<Configure>",
-        config_canvas
-    )
-    
-    canvas_frm = canvas.create_window((0, 0), window=scroll_registration_frm, anchor="center")
-    canvas.configure(yscrollcommand=scrollbar.set)
-    
-    # Configuration of the frame so that it covers that whole scrollable region.
-    canvas.bind(
-        "<Configure>", 
-        lambda e: canvas.itemconfig(canvas_frm, width=e.width)
-    )
-    
-    # We configure the scrollable frame so that its widgets 
-    # are uniformly spread across the frame.
-    for i in range(4):
-        scroll_registration_frm.columnconfigure(i, weight=1)
-    
-    canvas.pack(side="left", fill="both", expand=True)
+    # We create a table with a vertical scrollbar. 
+    # In this table, we find the list of all registrations of a student, one per row.
+    # If the list is larger than the table, the scrollbar helps the user browse the list.
+    # The table only draws the visible rows, so a long list is shown instantly.
+    registration_table = ttk.Treeview(registration_frm, columns=clb.REGISTRATION_COLUMNS, show="headings", 
+        height=8, selectmode="extended")
+    scrollbar = ttk.Scrollbar(registration_frm, orient="vertical", command=registration_table.yview)
+
+    # A date being edited in place is validated when the table scrolls (the text field 
+    # used to edit it doesn't follow the rows).
+    def table_scrolled(first, last):
+        scrollbar.set(first, last)
+        clb.finish_edit()
+
+    registration_table.configure(yscrollcommand=table_scrolled)
+
+    # The headers of the table; the columns are uniformly spread across the table.
+    for column in clb.REGISTRATION_COLUMNS:
+        registration_table.heading(column, text=messages_bundle[column])
+        registration_table.column(column, anchor=tk.CENTER, stretch=True)
+
+    registration_table.pack(side="left", fill="both", expand=True)
     scrollbar.pack(side="right", fill="y")
-    return scroll_registration_frm
+    return registration_table
 
 def buttons_frame_widgets(buttons_frm, messages_bundle):
     """Creates the widgets of the buttons frame.
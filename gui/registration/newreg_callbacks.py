@@ -6,10 +6,15 @@ All the callbacks associated to users' actions on the new registration tab are
 defined here.
 """
 
+import gui.dbexecutor as dbexecutor
 import mstudent as mstud
 import mregistration as mreg
 import utils
 
+# The keys of the lookups in the DB executor: a new lookup cancels the previous one with the same key.
+FIND_EDITION_KEY = "new_reg_tab.find_skisati_edition"
+FIND_STUDENT_KEY = "new_reg_tab.find_student"
+
 # Here we store all the different widgets of the student tab.
 control_labels = {}
 entries = {}
@@ -228,6 +233,8 @@ def clear_fields():
 def stud_number_updated():
     """Invoked when the student number is updated.
     """
+    # The search of the previous student number, if it's still running, is now useless.
+    dbexecutor.cancel(FIND_STUDENT_KEY)
     stud_number = get_stud_number()
     # If the student number has been filled in, we check that it's correct.
     if len(stud_number) > 0:
@@ -247,6 +254,7 @@ def stud_number_updated():
 def year_updated():
     """Invoked when the year is updated.
     """
+    dbexecutor.cancel(FIND_EDITION_KEY)
     year = get_year()
     # The year has been specified.
     if len(year) > 0:
@@ -356,8 +364,20 @@ def find_skisati_edition(event):
     This functions looks if a Skisati edition in the specified year exists in the database;
     if so, it fills in the field "registration fee".
     """
+    # The query runs in the background (see gui/dbexecutor.py): the function 
+    # skisati_edition_found() is invoked with the result.
     year = get_year()
-    edition = mreg.get_skisati_edition(year, cursor)
+    dbexecutor.submit(lambda cursor, conn: mreg.get_skisati_edition(year, cursor), 
+        skisati_edition_found, key=FIND_EDITION_KEY)
+
+def skisati_edition_found(edition):
+    """Invoked when the search of a Skisati edition started by find_skisati_edition() is over.
+
+    Parameters
+    ----------
+    edition : tuple
+        The edition, as returned by mreg.get_skisati_edition().
+    """
     if not edition:
         set_registration_fee("")
         entries["registration_fee"][0].state(["!disabled"])
@@ -377,10 +397,20 @@ def find_student(event):
     event
         The event information.
     """
-    # Get the student from the database.
+    # Get the student from the database, in the background: the function student_found() 
+    # is invoked with the result.
     stud_number = get_stud_number()
-    student = mstud.get_student(stud_number, cursor)
+    dbexecutor.submit(lambda cursor, conn: mstud.get_student(stud_number, cursor), 
+        student_found, key=FIND_STUDENT_KEY)
+
+def student_found(student):
+    """Invoked when the search of a student started by find_student() is over.
 
+    Parameters
+    ----------
+    student : tuple
+        The student, as returned by mstud.get_student().
+    """
     if student is None:
         write_message(messages_bundle["unexpected_error"])
         return
@@ -404,37 +434,52 @@ def find_student(event):
 def add_registration():
     """Adds a new registration to the database. Invoked when the user clicks on the 
     button Add.
+
+    The values of the data fields are read here, then the registration is added in the background
+    (see gui/dbexecutor.py).
     """
     stud_number = get_stud_number()
     year = get_year()
     registration_fee = get_registration_fee()
-    registration_date = get_registration_date()
-    payment_date = get_payment_date()
+    # The dates are typed as dd/mm/yyyy and stored as yyyy-mm-dd.
+    registration_date = utils.to_iso_date(get_registration_date())
+    payment_date = utils.to_iso_date(get_payment_date())
+
+    def add(cursor, conn):
+        cursor.execute("BEGIN")
+        # If there's no Skisati edition in the specified year, we add one to the database.
+        if not mreg.get_skisati_edition(year, cursor):
+            res = mreg.add_skisati_edition(year, registration_fee, cursor)
+            if not res[0]:
+                conn.rollback()
+                return (False, messages_bundle["unexpected_error"] + str(res[2]))
+        
+        # We add the registration.
+        res = None
+        if payment_date is None:
+            res = mreg.add_registration(stud_number, year, registration_date, cursor)
+        else:
+            res = mreg.add_registration(stud_number, year, registration_date, cursor, 
+                payment_date=payment_date)
+
+        if res[0]:
+            conn.commit()
+            return (True, messages_bundle["registration_added"])
+        # else we rollback the transaction, the modifications are not written to the database.
+        conn.rollback()
+        if res[1] == mreg.DUPLICATE_REGISTRATION_ERROR:
+            return (False, messages_bundle["duplicate_registration"] + str(res[2]))
+        return (False, messages_bundle["unexpected_error"])
 
-    cursor.execute("BEGIN")
-    # If there's no Skisati edition in the specified year, we add one to the database.
-    if not mreg.get_skisati_edition(year, cursor):
-        res = mreg.add_skisati_edition(year, registration_fee, cursor)
-        if not res[0]:
-            write_message(messages_bundle["unexpected_error"] + res[2])
-    
-    # We add the registration.
-    res = None
-    if len(payment_date) == 0:
-        res = mreg.add_registration(stud_number, year, registration_date, cursor)
-    else:
-        res = mreg.add_registration(stud_number, year, registration_date, cursor, payment_date=payment_date)
-
-    if res[0]:
-        conn.commit()
-        write_message(messages_bundle["registration_added"])
-        transition(event=REGISTRATION_ADDED_EVENT)
-    else: # else we rollback the transaction, the modifications are not written to the database.
-        if res[1] == mreg.UNEXPECTED_ERROR:
+    def done(res):
+        if res is None:
             write_message(messages_bundle["unexpected_error"])
-        elif res[1] == mreg.DUPLICATE_REGISTRATION_ERROR:
-            write_message(messages_bundle["duplicate_registration"] + res[2])
-        conn.rollback()
+            return
+        write_message(res[1])
+        if res[0]:
+            transition(event=REGISTRATION_ADDED_EVENT)
+
+    dbexecutor.submit(add, done)
 
 def cancel_action():
     """Invoked when the user clicks on the button Cancel.
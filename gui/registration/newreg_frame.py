@@ -33,7 +33,7 @@ def add_widgets(new_reg_tab, messages_bundle, cursor, conn, lang):
     """
     
     # Loads the image used to indicate that a field contains a correct value.
-    check_image = utils.load_check_image()
+    check_image = utils.load_check_image(new_reg_tab)
     
     # Create the "data fields frame" containing all the data fields to fill
     # in in order to create a new registration.
@@ -7,9 +7,13 @@ defined here.
 """
 
 import tkinter as tk
+import gui.dbexecutor as dbexecutor
 import mstudent as mstud
 import utils
 
+# The key of the search of a student in the DB executor: a new search cancels the previous one.
+FIND_STUDENT_KEY = "student_tab.find_student"
+
 # Here we store all the different widgets of the student tab.
 control_labels = {}
 entries = {}
@@ -400,6 +404,8 @@ def stud_role_selected(event):
 def stud_number_updated():
     """Invoked when the student number is updated.
     """
+    # The search of the previous student number, if it's still running, is now useless.
+    dbexecutor.cancel(FIND_STUDENT_KEY)
     stud_number = get_stud_number()
     # If some value is specified, we check that the format is correct.
     if len(stud_number) > 0:
@@ -507,10 +513,21 @@ def find_student(event):
         The event information.
 
     """
-    # Get the student from the database.
+    # Get the student, their email addresses and their memberships from the database 
+    # with a single query. The query runs in the background (see gui/dbexecutor.py): 
+    # the function student_found() is invoked with the result.
     stud_number = get_stud_number()
-    student = mstud.get_student(stud_number, cursor)
+    dbexecutor.submit(lambda cursor, conn: mstud.get_student_with_memberships(stud_number, cursor), 
+        student_found, key=FIND_STUDENT_KEY)
+
+def student_found(student):
+    """Invoked when the search of a student started by find_student() is over.
 
+    Parameters
+    ----------
+    student : tuple
+        The student, as returned by mstud.get_student_with_memberships().
+    """
     if student is None:
         write_message(messages_bundle["unexpected_error"])
     # If the student exists, the data fields are filled in automatically.
@@ -526,184 +543,204 @@ def find_student(event):
         loaded_student["last_name"] = student[2]
         loaded_student["gender"] = student[3]
         loaded_student["email_addresses"] = [student[4][i] for i in range(len(student[4]))]
-        memberships = mstud.get_memberships(stud_number, cursor)
-        if memberships is None:
-            write_message(messages_bundle["unexpected_error"])
-        else:
-            loaded_student["memberships"] = [(memberships[i][0], memberships[i][1]) \
-                for i in range(len(memberships))]
-            
-            # Fill in the first and last name and the gender.
-            set_first_name(student[1])
-            set_last_name(student[2])
-            set_gender(student[3]) 
-
-            # Fill in the email addresses.   
-            for i in range(len(student[4])):
-                set_email_address(student[4][i], i)
-            
-            # Fill in the membership data.
-            for i in range(len(memberships)):
-                set_membership(memberships[i], i)
-            
-            transition()
+        memberships = student[5]
+        loaded_student["memberships"] = [(memberships[i][0], memberships[i][1]) \
+            for i in range(len(memberships))]
+        
+        # Fill in the first and last name and the gender.
+        set_first_name(student[1])
+        set_last_name(student[2])
+        set_gender(student[3]) 
+
+        # Fill in the email addresses.   
+        for i in range(len(student[4])):
+            set_email_address(student[4][i], i)
+        
+        # Fill in the membership data.
+        for i in range(len(memberships)):
+            set_membership(memberships[i], i)
+        
+        transition()
 
 def add_student_db():
     """Invoked when the user clicks on the add button.
 
     This function adds a new student to the database.
+    The student is added in the background (see gui/dbexecutor.py): the values of the data fields 
+    are read here, then the function add() runs in the thread of the DB executor (it doesn't use 
+    the widgets) and the function done() shows the result.
     """
     # Add the student to the database
     stud_number = get_stud_number()
-    # Begin a transaction
-    cursor.execute("BEGIN")
-    res = mstud.add_student(stud_number, get_first_name(), get_last_name(), \
-        get_gender(), get_email_addresses(), cursor)
-    
-    # Error while adding the student
-    if not res[0]:
-        # Duplicate student number
-        if res[1] == mstud.DUPLICATE_STUD_NUMBER:
-            write_message(messages_bundle["duplicate_stud_number"])
-        # Duplicate email address
-        elif res[1] == mstud.DUPLICATE_EMAIL_ADDRESS:
-            write_message(messages_bundle["duplicate_email_address"] + res[2])
-        else:
-            write_message(messages_bundle["unexpected_error"] + res[2])
-        conn.rollback()
-    else:    
+    first_name = get_first_name()
+    last_name = get_last_name()
+    gender = get_gender()
+    email_addresses = get_email_addresses()
+    stud_associations = get_memberships()
+
+    def add(cursor, conn):
+        # Begin a transaction
+        cursor.execute("BEGIN")
+        res = mstud.add_student(stud_number, first_name, last_name, gender, email_addresses, cursor)
+        
+        # Error while adding the student
+        if not res[0]:
+            conn.rollback()
+            # Duplicate student number
+            if res[1] == mstud.DUPLICATE_STUD_NUMBER:
+                return (False, messages_bundle["duplicate_stud_number"])
+            # Duplicate email address
+            elif res[1] == mstud.DUPLICATE_EMAIL_ADDRESS:
+                return (False, messages_bundle["duplicate_email_address"] + str(res[2]))
+            return (False, messages_bundle["unexpected_error"] + str(res[2]))
+
         # Try to add the student to the associations.
-        stud_associations = get_memberships()
         for stud_association in stud_associations:
             res = mstud.add_membership(stud_number, stud_association, cursor)
             if not res[0]:
+                conn.rollback()
                 # Error while adding the student to the associations
                 if res[1] == mstud.DUPLICATE_MEMBERSHIP:
-                    write_message(messages_bundle["duplicate_membership"] + res[2])
-                else: 
-                    write_message(messages_bundle["unexpected_error"] + res[2])
-                conn.rollback()
-                break
-        else:
-            # If no error arises, we can commit the modifications to the database and 
-            # show a positive message to the user.
-            conn.commit()
-            write_message(messages_bundle["student_added"])
-            transition(event=STUDENT_UPDATED_EVENT)  
-    
+                    return (False, messages_bundle["duplicate_membership"] + str(res[2]))
+                return (False, messages_bundle["unexpected_error"] + str(res[2]))
+
+        # If no error arises, we can commit the modifications to the database and 
+        # show a positive message to the user.
+        conn.commit()
+        return (True, messages_bundle["student_added"])
+
+    def done(res):
+        if res is None:
+            write_message(messages_bundle["unexpected_error"])
+            return
+        write_message(res[1])
+        if res[0]:
+            transition(event=STUDENT_UPDATED_EVENT)
+
+    dbexecutor.submit(add, done)
 
 def edit_student():
     """Invoked when the user clicks on the edit button.
+
+    Like add_student_db(), the values of the data fields are read here and the database 
+    is updated in the background.
     """
     stud_number = get_stud_number()
     first_name = get_first_name()
     last_name = get_last_name()
     gender = get_gender()
-
-    # We start a transaction.
-    # We may have multiple fields to update. Either all are updated correctly, or none.
-    cursor.execute("BEGIN")
-    # This variable is set to True when an error arises (in which case the transaction is aborted).
-    error = False
-
-    # In the following code, we compare the values in the loaded_student dictionary against the values
-    # in the data fields of the student tab. The loaded_student dictionary contains the values as they
-    # have been loaded from the database. If the value in a data field differs from the corresponding value
-    # in student_loaded, then we need to update the database.
-    
-    # We update the first name.
-    if first_name != loaded_student["first_name"]:
-        res = mstud.update_first_name(stud_number, first_name, cursor)
-        if not res[0]:
-            write_message(messages_bundle["unexpected_error"] + res[2])
-            error = True
-    
-    # We update the last name.
-    if last_name != loaded_student["last_name"]:
-        res = mstud.update_last_name(stud_number, last_name, cursor)
-        if not res[0]:
-            write_message(messages_bundle["unexpected_error"] + res[2])
-            error = True
-    
-    # We update the gender.
-    if gender != loaded_student["gender"]:
-        res = mstud.update_gender(stud_number, gender, cursor)
-        if not res[0]:
-            write_message(messages_bundle["unexpected_error"] + res[2])
-            error = True
-
-    # We update the email addresses.
-    for i in range(len(loaded_student["email_addresses"])):
-        new_email_address = get_email_address_by_index(i)
-        if new_email_address != loaded_student["email_addresses"][i]:
-            # If a field in the student tab is empty (and before it was not), 
-            # an email address has been deleted.
-            if len(new_email_address) == 0:
-                res = mstud.delete_email_address(stud_number, loaded_student["email_addresses"][i], cursor)
-                if not res[0]:
-                    error = True
-                    write_message(messages_bundle["unexpected_error"] + res[2])
-            else: # Otherwise, the old email address was updated
-                res = mstud.update_email_address(stud_number, loaded_student["email_addresses"][i], \
-                    new_email_address, cursor)
+    email_addresses = [get_email_address_by_index(i) for i in range(len(entries["email_addresses"]))]
+    memberships = [get_membership_by_index(i) for i in range(len(combo_boxes["asso_name"]))]
+    # The values loaded from the database (the dictionary is replaced when another student is loaded).
+    loaded = dict(loaded_student)
+
+    def edit(cursor, conn):
+        # We start a transaction.
+        # We may have multiple fields to update. Either all are updated correctly, or none.
+        cursor.execute("BEGIN")
+        # This variable is set to an error message when an error arises (in which case the 
+        # transaction is aborted).
+        error = None
+
+        # In the following code, we compare the values in the loaded dictionary against the values
+        # in the data fields of the student tab. The loaded dictionary contains the values as they
+        # have been loaded from the database. If the value in a data field differs from the corresponding value
+        # in loaded, then we need to update the database.
+        
+        # We update the first name.
+        if first_name != loaded["first_name"]:
+            res = mstud.update_first_name(stud_number, first_name, cursor)
+            if not res[0]:
+                error = messages_bundle["unexpected_error"] + str(res[2])
+        
+        # We update the last name.
+        if last_name != loaded["last_name"]:
+            res = mstud.update_last_name(stud_number, last_name, cursor)
+            if not res[0]:
+                error = messages_bundle["unexpected_error"] + str(res[2])
+        
+        # We update the gender.
+        if gender != loaded["gender"]:
+            res = mstud.update_gender(stud_number, gender, cursor)
+            if not res[0]:
+                error = messages_bundle["unexpected_error"] + str(res[2])
+
+        # We update the email addresses.
+        for i in range(len(loaded["email_addresses"])):
+            new_email_address = email_addresses[i]
+            if new_email_address != loaded["email_addresses"][i]:
+                # If a field in the student tab is empty (and before it was not), 
+                # an email address has been deleted.
+                if len(new_email_address) == 0:
+                    res = mstud.delete_email_address(stud_number, loaded["email_addresses"][i], cursor)
+                    if not res[0]:
+                        error = messages_bundle["unexpected_error"] + str(res[2])
+                else: # Otherwise, the old email address was updated
+                    res = mstud.update_email_address(stud_number, loaded["email_addresses"][i], \
+                        new_email_address, cursor)
+                    if not res[0]:
+                        if res[1] == mstud.DUPLICATE_EMAIL_ADDRESS:
+                            error = messages_bundle["duplicate_email_address"] + str(res[2])
+                        elif res[1] == mstud.UNEXPECTED_ERROR:
+                            error = messages_bundle["unexpected_error"] + str(res[2])
+        
+        # If the fields in the student tab contain email addresses that were not in the database
+        # before, this means that a new email address was added.
+        for i in range(len(loaded["email_addresses"]), len(email_addresses)):
+            new_email_address = email_addresses[i]
+            if len(new_email_address) > 0:
+                res = mstud.add_email_address(stud_number, new_email_address, cursor)
                 if not res[0]:
-                    error = True
                     if res[1] == mstud.DUPLICATE_EMAIL_ADDRESS:
-                        write_message(messages_bundle["duplicate_email_address"] + res[2])
+                        error = messages_bundle["duplicate_email_address"] + str(res[2])
                     elif res[1] == mstud.UNEXPECTED_ERROR:
-                        write_message(messages_bundle["unexpected_error"] + res[2])
-    
-    # If the fields in the student tab contain email addresses that were not in the database
-    # before, this means that a new email address was added.
-    for i in range(len(loaded_student["email_addresses"]), len(entries["email_addresses"])):
-        new_email_address = get_email_address_by_index(i)
-        if len(new_email_address) > 0:
-            res = mstud.add_email_address(stud_number, new_email_address, cursor)
-            if not res[0]:
-                error = True
-                if res[1] == mstud.DUPLICATE_EMAIL_ADDRESS:
-                    write_message(messages_bundle["duplicate_email_address"] + res[2])
-                elif res[1] == mstud.UNEXPECTED_ERROR:
-                    write_message(messages_bundle["unexpected_error"] + res[2])
-
-    # Update the membership. Similar code to the email update.
-    for i in range(len(loaded_student["memberships"])):
-        new_membership = get_membership_by_index(i)
-        if new_membership[0] != loaded_student["memberships"][0]:
-            if len(new_membership[0]) == 0:
-                res = mstud.delete_membership(stud_number, loaded_student["memberships"][i][0], cursor)
-                if not res[0]:
-                    error = True
-                    write_message(messages_bundle["unexpected_error"] + res[2])
-            else:
-                res = mstud.update_membership(stud_number, loaded_student["memberships"][i][0], \
-                    new_membership[0], new_membership[1], cursor)
+                        error = messages_bundle["unexpected_error"] + str(res[2])
+
+        # Update the membership. Similar code to the email update.
+        for i in range(len(loaded["memberships"])):
+            new_membership = memberships[i]
+            if new_membership[0] != loaded["memberships"][0]:
+                if len(new_membership[0]) == 0:
+                    res = mstud.delete_membership(stud_number, loaded["memberships"][i][0], cursor)
+                    if not res[0]:
+                        error = messages_bundle["unexpected_error"] + str(res[2])
+                else:
+                    res = mstud.update_membership(stud_number, loaded["memberships"][i][0], \
+                        new_membership[0], new_membership[1], cursor)
+                    if not res[0]:
+                        if res[1] == mstud.DUPLICATE_MEMBERSHIP:
+                            error = messages_bundle["duplicate_membership"] + str(res[2])
+                        elif res[1] == mstud.UNEXPECTED_ERROR:
+                            error = messages_bundle["unexpected_error"] + str(res[2])
+
+        for i in range(len(loaded["memberships"]), len(memberships)):
+            new_membership = memberships[i]
+            if len(new_membership[0]) > 0:
+                res = mstud.add_membership(stud_number, new_membership, cursor)
                 if not res[0]:
-                    error = True
                     if res[1] == mstud.DUPLICATE_MEMBERSHIP:
-                        write_message(messages_bundle["duplicate_membership"] + res[2])
+                        error = messages_bundle["duplicate_membership"] + str(res[2])
                     elif res[1] == mstud.UNEXPECTED_ERROR:
-                        write_message(messages_bundle["unexpected_error"] + res[2])
-
-    for i in range(len(loaded_student["memberships"]), len(combo_boxes["asso_name"])):
-        new_membership = get_membership_by_index(i)
-        if len(new_membership[0]) > 0:
-             res = mstud.add_membership(stud_number, new_membership, cursor)
-             if not res[0]:
-                error = True
-                if res[1] == mstud.DUPLICATE_MEMBERSHIP:
-                    write_message(messages_bundle["duplicate_membership"] + res[2])
-                elif res[1] == mstud.UNEXPECTED_ERROR:
-                    write_message(messages_bundle["unexpected_error"] + res[2])
+                        error = messages_bundle["unexpected_error"] + str(res[2])
 
-    # If no error occurs, the modifications are commited to the database and a positive 
-    # message is shown to the user.
-    if not error:
-        conn.commit()
-        write_message(messages_bundle["student_edited"])
-        transition(event=STUDENT_UPDATED_EVENT)
-    else: # Otherwise we rollback the transaction
+        # If no error occurs, the modifications are commited to the database and a positive 
+        # message is shown to the user.
+        if error is None:
+            conn.commit()
+            return (True, messages_bundle["student_edited"])
+        # Otherwise we rollback the transaction
         conn.rollback()
+        return (False, error)
+
+    def done(res):
+        if res is None:
+            write_message(messages_bundle["unexpected_error"])
+            return
+        write_message(res[1])
+        if res[0]:
+            transition(event=STUDENT_UPDATED_EVENT)
+
+    dbexecutor.submit(edit, done)
     
 def cancel_action():
     """Invoked when the user clicks on the cancel button 
@@ -34,7 +34,7 @@ def add_widgets(stud_tab, messages_bundle, cursor, conn, lang):
     """
     
     # Loads the image used to indicate that a field contains a correct value.
-    check_image = utils.load_check_image()
+    check_image = utils.load_check_image(stud_tab)
     
     # Create the "student frame" containing all the student data fields.
     student_frm = ttk.Frame(stud_tab, style="Tab.TFrame")
@@ -0,0 +1,346 @@
+"""The mail module.
+
+It sends batches of emails (e.g., the payment reminders of the deadline module) through an SMTP relay:
+
+* A small pool of SMTP connections: each sender thread opens one connection and reuses it for all its messages.
+* The messages are sent concurrently by the threads of the pool, with a global rate limit
+  (a relay usually rejects the clients that send too fast).
+* A message that can't be sent because of a temporary error (connection lost, 4xx reply) is retried,
+  on a new connection, with an exponential backoff. A permanent error (5xx reply) is not retried.
+  The failure of a message never aborts the other messages.
+* The function send_messages() returns a report (number of messages sent, failures, throughput).
+
+The settings of the relay are read from the configuration file; see MAILER_DEFAULTS for
+the names of the settings and their default values.
+
+The module also contains a local SMTP stand-in (start_sink()), which accepts and keeps every message.
+It is used to test the module without a real relay.
+
+When you run this file as a Python script, the instructions after the
+statement if __name__ == "__main__": are executed: they send fake messages
+to the local stand-in (or to the relay given with --host) and print the throughput.
+
+    python mailer.py 1000
+    python mailer.py 1000 --pool=8 --rate=0 --delay=0.01
+    python mailer.py 10 --host=localhost --port=1025
+"""
+
+import queue
+import smtplib
+import socket
+import sys
+import threading
+import time
+
+from email.mime.text import MIMEText
+
+# Default settings of the SMTP relay, used when a setting is missing from the configuration file.
+# Each key is the name of the setting in ./config/config.
+MAILER_DEFAULTS = {
+    "smtp_host": "localhost",
+    "smtp_port": "1025",
+    # yes if the connection must be upgraded to TLS (STARTTLS).
+    "smtp_starttls": "no",
+    # Leave the user empty if the relay doesn't require authentication.
+    "smtp_user": "",
+    "smtp_password": "",
+    "smtp_sender": "organization@skisati.fr",
+    # Number of connections (and sender threads).
+    "smtp_pool_size": "4",
+    # Maximum number of messages per second, over all the connections (0: no limit).
+    "smtp_rate": "20",
+    # Number of retries of a message after a temporary error.
+    "smtp_retries": "3",
+    # Timeout of the socket operations, in seconds.
+    "smtp_timeout": "10",
+}
+
+# Delay (in seconds) before the first retry of a message; it doubles at each retry.
+RETRY_DELAY = 0.5
+
+def load_settings(config=None):
+    """Returns the settings of the SMTP relay.
+
+    Parameters
+    ----------
+    config : dictionary, optional
+        The application configuration (default: the configuration loaded from ./config/config).
+
+    Returns
+    -------
+    dictionary
+        The settings listed in MAILER_DEFAULTS.
+    """
+    if config is None:
+        # Imported here, so that the module can be used without the configuration file.
+        import utils
+        config = utils.load_config()
+    settings = dict(MAILER_DEFAULTS)
+    settings.update({key: value for key, value in config.items() if key in MAILER_DEFAULTS})
+    return settings
+
+def _open_connection(settings):
+    """Opens a connection to the SMTP relay.
+
+    Parameters
+    ----------
+    settings : dictionary
+        The settings returned by load_settings().
+
+    Returns
+    -------
+    smtplib.SMTP
+        The connection.
+    """
+    server = smtplib.SMTP(settings["smtp_host"], int(settings["smtp_port"]), timeout=float(settings["smtp_timeout"]))
+    if settings["smtp_starttls"] == "yes":
+        server.starttls()
+    if settings["smtp_user"]:
+        server.login(settings["smtp_user"], settings["smtp_password"])
+    return server
+
+def _close_connection(server):
+    """Closes a connection to the SMTP relay, ignoring the errors (the connection may be already lost).
+    """
+    if server is None:
+        return
+    try:
+        server.quit()
+    except (smtplib.SMTPException, OSError):
+        server.close()
+
+def _rate_limiter(rate):
+    """Returns a function that waits until the next message can be sent.
+
+    The messages are spaced by 1/rate seconds, whatever the thread that sends them.
+
+    Parameters
+    ----------
+    rate : float
+        The maximum number of messages per second (0: no limit).
+    """
+    lock = threading.Lock()
+    next_slot = [time.monotonic()]
+
+    def wait():
+        if rate <= 0:
+            return
+        with lock:
+            now = time.monotonic()
+            slot = max(now, next_slot[0])
+            next_slot[0] = slot + 1 / rate
+        if slot > now:
+            time.sleep(slot - now)
+
+    return wait
+
+def _is_permanent(error):
+    """Returns whether an SMTP error is permanent (the message must not be retried).
+    """
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code >= 500
+
+def _sender(jobs, settings, wait, report, lock):
+    """Sends the messages of the queue jobs until it is empty, over a single connection.
+
+    This function is the target of the threads started by send_messages().
+    """
+    server = None
+    retries = int(settings["smtp_retries"])
+    while True:
+        try:
+            index, (recipient, subject, body) = jobs.get_nowait()
+        except queue.Empty:
+            break
+
+        msg = MIMEText(body, "plain", "utf-8")
+        msg["From"] = settings["smtp_sender"]
+        msg["To"] = recipient
+        msg["Subject"] = subject
+
+        error = None
+        for attempt in range(retries + 1):
+            if attempt > 0:
+                time.sleep(RETRY_DELAY * 2 ** (attempt - 1))
+            try:
+                if server is None:
+                    server = _open_connection(settings)
+                wait()
+                server.send_message(msg)
+                error = None
+                break
+            except (smtplib.SMTPException, OSError) as e:
+                error = e
+                if _is_permanent(e):
+                    break
+                # Temporary error: the message is sent again on a new connection.
+                _close_connection(server)
+                server = None
+
+        with lock:
+            if error is None:
+                report["sent"] += 1
+            else:
+                report["errors"][index] = str(error)
+                report["failed"].append((recipient, str(error)))
+                print("The email to {} could not be sent: {}".format(recipient, error))
+    _close_connection(server)
+
+def send_messages(messages, config=None, settings=None):
+    """Sends a batch of emails.
+
+    Parameters
+    ----------
+    messages : list
+        Each item of the list is a tuple (recipient, subject, body).
+    config : dictionary, optional
+        The application configuration (default: the configuration loaded from ./config/config).
+    settings : dictionary, optional
+        The settings of the relay, as returned by load_settings() (default: load_settings(config)).
+
+    Returns
+    -------
+    dictionary
+        "sent": the number of messages sent.
+        "failed": the list of the messages that could not be sent, as tuples (recipient, error).
+        "errors": for each message (in the same order as messages), None if the message was sent, 
+        the error otherwise.
+        "seconds": the duration of the batch.
+        "throughput": the number of messages sent per second.
+    """
+    if settings is None:
+        settings = load_settings(config)
+
+    jobs = queue.Queue()
+    for index, message in enumerate(messages):
+        jobs.put((index, message))
+
+    report = {"sent": 0, "failed": [], "errors": [None] * len(messages), "seconds": 0.0, "throughput": 0.0}
+    lock = threading.Lock()
+    wait = _rate_limiter(float(settings["smtp_rate"]))
+    nb_senders = max(1, min(int(settings["smtp_pool_size"]), len(messages)))
+
+    start = time.perf_counter()
+    senders = [threading.Thread(target=_sender, args=(jobs, settings, wait, report, lock), name="smtp-sender-{}".format(i))
+        for i in range(nb_senders)]
+    for sender in senders:
+        sender.start()
+    for sender in senders:
+        sender.join()
+    report["seconds"] = time.perf_counter() - start
+    if report["seconds"] > 0:
+        report["throughput"] = report["sent"] / report["seconds"]
+
+    print("{} email(s) sent, {} failed in {:.2f} s ({:.1f} emails/s)".format(report["sent"],
+        len(report["failed"]), report["seconds"], report["throughput"]))
+    return report
+
+def _sink_session(connection, received, delay):
+    """Serves one SMTP session of the local stand-in (see start_sink()).
+    """
+    with connection, connection.makefile("rb") as reader:
+        def reply(line):
+            connection.sendall(line.encode("ascii") + b"\r\n")
+
+        reply("220 localhost SkisatiResa SMTP stand-in")
+        sender, recipients = None, []
+        for line in reader:
+            command = line.decode("utf-8", "replace").strip()
+            verb = command[:4].upper()
+            if verb == "EHLO":
+                reply("250-localhost")
+                reply("250 8BITMIME")
+            elif verb == "MAIL":
+                sender, recipients = command[10:], []
+                reply("250 OK")
+            elif verb == "RCPT":
+                recipients.append(command[8:])
+                reply("250 OK")
+            elif verb == "DATA":
+                reply("354 End data with <CR><LF>.<CR><LF>")
+                data = []
+                for data_line in reader:
+                    if data_line in (b".\r\n", b".\n"):
+                        break
+                    data.append(data_line)
+                # Simulates the latency of a real relay.
+                time.sleep(delay)
+                received.append((sender, recipients, b"".join(data)))
+                reply("250 OK")
+            elif verb == "QUIT":
+                reply("221 Bye")
+                break
+            else:
+                # HELO, RSET, NOOP...
+                reply("250 OK")
+
+def start_sink(port=0, delay=0.0):
+    """Starts a local SMTP stand-in that accepts and keeps every message.
+
+    The stand-in serves each connection in its own thread. It is only meant for tests and
+    benchmarks: it doesn't check the commands it receives.
+
+    Parameters
+    ----------
+    port : int, optional
+        The port of the stand-in (default: a free port chosen by the system).
+    delay : float, optional
+        The time (in seconds) spent on each message, to simulate a real relay (default: 0).
+
+    Returns
+    -------
+    A tuple T
+        T[0] is the listening socket (close it to stop the stand-in).
+        T[1] is the port of the stand-in.
+        T[2] is the list of the received messages; each item is a tuple (sender, recipients, data).
+    """
+    listener = socket.create_server(("localhost", port))
+    received = []
+
+    def accept():
+        while True:
+            try:
+                connection, _ = listener.accept()
+            except OSError:
+                # The listening socket has been closed.
+                break
+            threading.Thread(target=_sink_session, args=(connection, received, delay), daemon=True).start()
+
+    threading.Thread(target=accept, daemon=True).start()
+    return (listener, listener.getsockname()[1], received)
+
+def _option(argv, name, default):
+    """Returns the value of the command line option --name=value (default if the option is missing).
+    """
+    for arg in argv:
+        if arg.startswith("--{}=".format(name)):
+            return arg.split("=", 1)[1]
+    return default
+
+# Entry point of the mail module.
+# Usage: python mailer.py NB_MESSAGES [--pool=N] [--rate=N] [--retries=N] [--delay=SECONDS] [--host=HOST --port=PORT]
+if __name__ == "__main__":
+
+    nb_messages = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1].isdigit() else 100
+
+    settings = dict(MAILER_DEFAULTS)
+    settings["smtp_pool_size"] = _option(sys.argv, "pool", settings["smtp_pool_size"])
+    settings["smtp_rate"] = _option(sys.argv, "rate", "0")
+    settings["smtp_retries"] = _option(sys.argv, "retries", settings["smtp_retries"])
+
+    listener = None
+    if _option(sys.argv, "host", None) is None:
+        listener, port, received = start_sink(delay=float(_option(sys.argv, "delay", "0.005")))
+        settings["smtp_port"] = str(port)
+    else:
+        settings["smtp_host"] = _option(sys.argv, "host", None)
+        settings["smtp_port"] = _option(sys.argv, "port", settings["smtp_port"])
+
+    messages = [("student{}@etudiant.univ-rennes1.fr".format(i), "Payment deadline reminder",
+        "Dear student {},\nThis is just a test.".format(i)) for i in range(nb_messages)]
+    send_messages(messages, settings=settings)
+
+    if listener is not None:
+        listener.close()
+        print("The local stand-in received {} email(s)".format(len(received)))
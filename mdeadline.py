@@ -2,15 +2,18 @@
 """
 
 import datetime
+import queue
 import sqlite3
+import sys
+import threading
+import time
+import db
+import moutbox
 import mregistration as mreg
+import mscheduler
 import mstudent as mstud
 import utils
 
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-
 # The main window of the SkisatiResa application.
 skisati_window = None
 
@@ -20,63 +23,31 @@ cursor = None
 # The object used to connect to the database.
 conn = None
 
+# The queue through which deadline_management() reports its progress, when it runs in the background 
+# (see start_deadline_management()). Each item is a tuple (event, value):
+# ("reminders", number of reminders), ("expired", number of deleted registrations), 
+# ("error", error message), ("done", None) when the job is over and ("skipped", None) when the job 
+# has already run today.
+progress = None
+
+# The name of the deadline management job in the table JobRun (see the module mscheduler).
+JOB_NAME = "deadline_management"
+
 # Code indicating an unexpected database error.
 UNEXPECTED_ERROR = 0
 
-def deadline(registration_date):
-    """Returns the payment deadline given the registration date.
+# Number of days given to a student to pay a registration.
+PAYMENT_DELAY = mreg.PAYMENT_DELAY
 
-    Parameters
-    ----------
-        registration_date : datetime
-            The registration date.
-    
-    Returns
-    -------
-        datetime
-            The deadline computed on the given registration date.
-    """
-    return (registration_date + datetime.timedelta(days=5)).date()
+# Number of days before the payment deadline at which a reminder is sent.
+REMINDER_DELAY = 2
 
+# Delay (in seconds) before the job runs again after a failed run (e.g., the database was locked 
+# by another connection); it doubles after each failed run, up to MAX_RETRY_DELAY.
+RETRY_DELAY = 60
 
-def deadline_expired(_registration_date):
-    """Returns whether the payment deadline has expired for a given registration.
-
-    Parameters
-    ----------
-    _registration_date : string
-        The registration date (dd/mm/yyyy).
-    
-    Returns
-    -------
-    bool
-        True if the deadline has expired, False otherwise.
-    """
-    registration_date = utils.get_date(_registration_date)
-    if registration_date is not None:
-        return (datetime.date.today() - deadline(registration_date)).days > 0
-    
-    return False
-
-def deadline_aproaching(_registration_date):
-    """Returns whether the deadline for the given registration is approaching (2 days before the deadline).
-
-    Parameters:
-    ----------
-        _registration_date : string
-            The registration date.
-    
-    Returns:
-    --------
-        bool
-            True if today is 2 days before the deadline.
-
-    """
-    registration_date = utils.get_date(_registration_date)
-    if registration_date is not None:
-        return (deadline(registration_date) - datetime.date.today()).days == 2
-    
-    return False
+# Maximum delay (in seconds) before the job runs again after a failed run.
+MAX_RETRY_DELAY = 3600
 
 def deadline_management_init(_skisati_window, _cursor, _conn):
     """Initializes the deadline management module.
@@ -98,40 +69,60 @@ def deadline_management_init(_skisati_window, _cursor, _conn):
     cursor = _cursor
     conn = _conn
 
-def _unpaid_registrations():
-    """Returns all the unpaid registrations.
+def _report(event, value=None):
+    """Reports the progress of deadline_management() through the queue progress, if any.
+
+    Parameters
+    ----------
+    event : string
+        The name of the event ("reminders", "expired", "error" or "done").
+    value : optional
+        The value associated with the event.
+    """
+    if progress is not None:
+        progress.put((event, value))
+
+# The columns of the registrations returned by _expired_registrations().
+_REGISTRATION_KEYS = "SELECT stud_number, year, registration_date FROM Registration"
+
+def _select_unpaid_registrations(condition, deadline_date, query=_REGISTRATION_KEYS):
+    """Returns the unpaid registrations whose payment deadline satisfies a condition.
+
+    The condition is evaluated on the column payment_deadline, so that SQLite only reads the 
+    matching entries of the index idx_registration_deadline.
+
+    Parameters
+    ----------
+    condition : string
+        The comparison operator applied to the payment deadline ("<" or "=").
+    deadline_date : datetime.date
+        The date the payment deadlines are compared to.
+    query : string, optional
+        The SELECT ... FROM part of the query (default: _REGISTRATION_KEYS). 
 
     Returns
     -------
-    list.
-        The list of unpaid registrations. 
-        Each item of the list is a tuple (stud_number, year, registration_date).
+    list
+        Each item of the list is a tuple with the columns selected by query.
     """
-    ############ TODO: WRITE HERE THE CODE TO IMPLEMENT THIS FUNCTION ##########
-
-    # 
-    sql_query = "SELECT stud_number, year, registration_date FROM Registration WHERE payment_date IS NULL"
     try:
-        # exécute la requête dans la base de données
-        cursor.execute(sql_query)
-        # récupère toutes les lignes de résultat
-        return cursor.fetchall()
+        cursor.execute("{} WHERE (payment_date IS NULL OR payment_date = '') AND payment_deadline {} ?".format(
+            query, condition), (deadline_date.isoformat(),))
+        return [tuple(row) for row in cursor.fetchall()]
     except sqlite3.Error as e:
-        # si il y a une erreur de base de données on l'affiche
         print(f"erreur de base de données pendant la recherche des non payés: {e}")
-        # retourne une liste vide en cas d'erreur
         return []
 
-    ####################################################################################
-
-def _expired_registrations(unpaid_registrations):
+def _expired_registrations(today=None):
     """Returns all the registrations that haven't met the payment deadline.
 
+    The selection is done in SQL: the cost depends on the number of expired registrations, not 
+    on the number of unpaid registrations.
+
     Parameters
     ----------
-    unpaid_registrations : list
-        List of all the unpaid registrations. 
-        This list is the one returned by the function _unpaid_registrations().
+    today : datetime.date, optional
+        The current date (default: datetime.date.today()).
 
     Returns
     -------
@@ -139,242 +130,352 @@ def _expired_registrations(unpaid_registrations):
         The list of all the registrations that haven't met the payment deadline.
         Each item of the list is a tuple (stud_number, year, registration_date).
     """
-    ############ TODO: WRITE HERE THE CODE TO IMPLEMENT THIS FUNCTION ##########
-
-    expired_regs = []
-    # pour chaque inscription non payée (qui est un tuple stud_number, year, registration_date)
-    for reg in unpaid_registrations:
-        # la date d'inscription est le troisième élément (index 2)
-        registration_date_str = reg[2]
-        # on utilise la fonction déjà faite pour vérifier si la date limite est dépassée
-        if deadline_expired(registration_date_str):
-            # si c'est expiré on ajoute cette inscription à la liste
-            expired_regs.append(reg)
-            
-    # retourne la liste des inscriptions expirées
-    return expired_regs
+    if today is None:
+        today = datetime.date.today()
+
+    # The deadline has expired if payment_deadline < today.
+    return _select_unpaid_registrations("<", today)
+
+# The data needed to send a payment reminder: one row per registration. The reminder is sent to all 
+# the email addresses of the student, separated by commas (NULL if the student has no email address).
+_REMINDER_DATA = """
+    SELECT Registration.stud_number, Registration.year, Student.first_name, 
+        (SELECT group_concat(EmailAddress.email, ', ') FROM EmailAddress 
+            WHERE EmailAddress.stud_number = Registration.stud_number),
+        Registration.registration_date, Registration.payment_deadline
+    FROM Registration 
+    JOIN Student ON Student.stud_number = Registration.stud_number
+"""
 
-    ####################################################################################
-    
-def _late_payment_registrations(unpaid_registrations):
+def _late_payment_registrations(today=None):
     """Returns the registrations for which the payment deadline is two days from the current date.
 
+    A single query selects the registrations (range scan on the index idx_registration_deadline) 
+    and joins them with the students and their email addresses.
+
     Parameters
     ----------
-    unpaid_registrations : list
-        List of all the unpaid registrations. 
-        This list is the one returned the function _unpaid_registrations().
+    today : datetime.date, optional
+        The current date (default: datetime.date.today()).
 
     Returns
     -------
     list
         The list of all the registrations for which the payment deadline is two days from the current date.
-        Each item of the list is  tuple (first_name, email_address, registration_date)
+        Each item of the list is a tuple (stud_number, year, first_name, email_addresses, registration_date, 
+        payment_deadline), where email_addresses are the email addresses of the student separated by commas 
+        (None if the student has no email address).
     """
-    ############ TODO: WRITE HERE THE CODE TO IMPLEMENT THIS FUNCTION ################
-
-    late_payment_regs = []
-    
-    # on parcourt toutes les inscriptions non payées
-    for stud_number, year, registration_date_str in unpaid_registrations:
-        # on vérifie si la date limite approche (dans 2 jours) avec la fonction prédéfinie
-        if deadline_aproaching(registration_date_str):
-            
-            # requête pour trouver le prénom de l'étudiant son email et la date d'inscription
-            # on fait une jointure entre registration student has et emailaddress
-            sql_query = """
-                SELECT 
-                    T1.first_name, 
-                    T3.email,
-                    T0.registration_date
-                FROM 
-                    Registration AS T0
-                INNER JOIN 
-                    Student AS T1 ON T0.stud_number = T1.stud_number
-                INNER JOIN 
-                    has AS T2 ON T1.stud_number = T2.stud_number
-                INNER JOIN
-                    EmailAddress AS T3 ON T2.email = T3.email
-                WHERE 
-                    T0.stud_number = ? AND T0.year = ? AND T0.registration_date = ?
-            """
-            
-            try:
-                # exécute la requête pour cet étudiant et cette inscription
-                cursor.execute(sql_query, (stud_number, year, registration_date_str))
-                result = cursor.fetchone()
-                
-                if result:
-                    # si on trouve les informations on les ajoute à la liste
-                    late_payment_regs.append(result)
-                    
-            except sqlite3.Error as e:
-                # gestion d'erreur si la requête échoue
-                print(f"erreur de base de données lors de la récupération des détails de paiement tardif: {e}")
-
-    # retourne la liste des inscriptions nécessitant un rappel
-    return late_payment_regs
+    if today is None:
+        today = datetime.date.today()
 
-    ####################################################################################
+    # The deadline is approaching if payment_deadline = today + REMINDER_DELAY.
+    return _select_unpaid_registrations("=", today + datetime.timedelta(days=REMINDER_DELAY), 
+        _REMINDER_DATA)
 
 
-def _remove_expired_registrations(expired_registrations):
+def _remove_expired_registrations(today=None):
     """Removes all the expired registrations from the database.
 
-    IMPORTANT:
-
-    * You can use the function delete_registration() defined in the registration module (file mregistration.py)
-
-    * There is likely to be more than one expired registration. 
-    You should remove all the expired registrations within a transaction.
-    If any registration could not be deleted for any reason (look at the delete_registration return value), 
-    you should rollback the transaction. Only if all the registrations could be successfully removed, 
-    you can commit the transaction.
+    The expired registrations are selected (see _expired_registrations()) and deleted with a 
+    single DELETE statement (see mreg.delete_registrations()), within one transaction: 
+    either all the expired registrations are removed, or none.
 
     Parameters
     ----------
-    expired_registrations : list
-        List of all the expired registrations. 
-        This list is the one returned by the function _expired_registrations().
+    today : datetime.date, optional
+        The current date (default: datetime.date.today()).
 
     Returns
     -------
     A tuple.
-        The return value of the function mreg.delete_registration.
+        (True, count, expired_registrations) if no error occurs, where count is the number of deleted 
+        registrations and expired_registrations is the list returned by _expired_registrations().
+        (False, UNEXPECTED_ERROR, error) if an error occurs; the database is left unchanged.
     """
     ############ TODO: WRITE HERE THE CODE TO IMPLEMENT THIS FUNCTION ################
 
-    successful_deletion = True
-    
-    # pour chaque inscription expirée on tente de la supprimer
-    for stud_number, year, _ in expired_registrations:
-        # on appelle la fonction de suppression du module mregistration
-        # on suppose qu'elle renvoie (vrai/faux, code_erreur, données)
-        res = mreg.delete_registration(stud_number, year, cursor, conn)
-        
-        # si la suppression a échoué (res[0] est faux)
-        if not res[0]:
-            successful_deletion = False
-            # on arrête la boucle
-            break
+    # la sélection et la suppression sont faites dans la même transaction :
+    # une inscription payée entre les deux ne peut pas être supprimée
+    cursor.execute("BEGIN")
+    try:
+        expired_regs = _expired_registrations(today)
+        res = mreg.delete_registrations(expired_regs, cursor)
+    except sqlite3.Error as e:
+        res = (False, UNEXPECTED_ERROR, e)
             
     # gestion de la transaction
-    if successful_deletion:
-        # si toutes les suppressions ont réussi on sauvegarde les changements
+    if res[0]:
+        # si la suppression a réussi on sauvegarde les changements
         conn.commit()
-        # on retourne succès
-        return (True, None, None) 
+        return (True, res[1], expired_regs) 
     else:
-        # si une suppression a échoué on annule toutes les suppressions de la transaction
+        # si la suppression a échoué on annule la transaction
         conn.rollback()
         # on retourne le résultat de l'échec
-        return res
+        return (False, UNEXPECTED_ERROR, res[2])
 
     ####################################################################################
 
-def _send_late_payment_reminder(late_payment_registrations):
+def _send_late_payment_reminder(late_payment_registrations, config=None):
     """Sends an automatic email to all students having late registrations.
 
+    The emails are not sent directly: they are written into the outbox (see the module moutbox), 
+    and sent by the outbox sender. The idempotency key of a reminder is made of the student number, 
+    the edition year and the payment deadline, so that a reminder is never sent twice for the same 
+    registration and deadline, even if the deadline job runs again or the email addresses of the 
+    student change.
+
     Parameters
     ----------
-    _late_payment_registrations : list
+    late_payment_registrations : list
         List of all the late registrations. 
         This list is the one returned by the function _late_payment_registrations().
+    config : dictionary, optional
+        The application configuration (default: the configuration loaded from ./config/config).
+
+    Returns
+    -------
+    int
+        The number of reminders written into the outbox (the reminders already in the outbox are ignored).
+        None if the reminders could not be written into the outbox.
     """
     ############ TODO: WRITE HERE THE CODE TO IMPLEMENT THIS FUNCTION ###############
 
-    # configuration smtp (à ajuster)
-    smtp_server = "smtp.example.com"
-    smtp_port = 587 
-    sender_email = "skisatiresa@example.com"
-    sender_password = "your_app_password" 
-
+    # charger la configuration et le modèle de message une seule fois pour tous les rappels
+    if config is None:
+        config = utils.load_config()
+    messages_bundle = utils.load_messages_bundle(config["bundle"] + config["lang"])
+    subject = messages_bundle["payment_reminder_subject"]
+    template = messages_bundle["payment_reminder_email"]
+
+    messages = []
+    for stud_number, year, first_name, recipient_email, registration_date_str, payment_deadline \
+            in late_payment_registrations:
+        # un étudiant sans adresse email ne peut pas recevoir de rappel
+        if not recipient_email:
+            continue
+        # les dates sont stockées au format aaaa-mm-jj, l'email les affiche au format jj/mm/aaaa ;
+        # la date limite est celle de la colonne payment_deadline, utilisée aussi pour l'expiration
+        body = template.format(
+            first_name=first_name,
+            registration_date=utils.to_display_date(registration_date_str),
+            deadline=utils.to_display_date(payment_deadline)
+        )
+        key = "payment_reminder/{}/{}/{}".format(stud_number, year, payment_deadline)
+        messages.append((key, recipient_email, subject, body))
+
+    # écrire les rappels dans la table Outbox, dans une seule transaction
+    cursor.execute("BEGIN")
     try:
-        # se connecter au serveur smtp en utilisant tls pour la sécurité
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            server.starttls()
-            server.login(sender_email, sender_password)
-
-            # pour chaque étudiant à qui envoyer un rappel
-            for first_name, recipient_email, registration_date_str in late_payment_registrations:
-                
-                # charger le modèle de message de rappel
-                # on suppose ici que load_config et load_messages_bundle sont définis
-                config = utils.load_config()
-                messages_bundle = utils.load_messages_bundle(config["bundle"] + config["lang"])
-                
-                body = messages_bundle["payment_reminder_email"].format(
-                    first_name=first_name,
-                    registration_date=registration_date_str,
-                    deadline=deadline(utils.get_date(registration_date_str))
-                )
-                
-                # créer l'email
-                msg = MIMEMultipart()
-                msg['From'] = sender_email
-                msg['To'] = recipient_email
-                msg['Subject'] = "rappel de paiement pour votre inscription skisatiresa"
-                msg.attach(MIMEText(body, 'plain'))
-
-                # envoyer l'email
-                server.sendmail(sender_email, recipient_email, msg.as_string())
-                print(f"rappel envoyé avec succès à {recipient_email} ({first_name})")
-                
-    except Exception as e:
-        # si il y a une erreur lors de l'envoi d'email
-        print(f"erreur lors de l'envoi d'email: {e}")
+        count = moutbox.add_messages(messages, cursor)
+    except sqlite3.Error as e:
+        conn.rollback()
+        print(f"erreur lors de l'écriture des rappels dans la table Outbox: {e}")
+        return None
+    conn.commit()
+    return count
 
     ####################################################################################
      
-def deadline_management():
+def deadline_management(days=None):
     """Function invoked periodically to manage the unpaid registrations.
     
-    * Retrieves the unpaid registrations
-    * Identifies in the unpaid registrations those that are expired.
-    * Identifies in the unpaid registrations those that are late.
-    * Removes the expired registrations.
+    * Identifies the unpaid registrations that are late.
+    * Removes the unpaid registrations that are expired.
     * Sends a reminder to the students who have late registrations.
+    * Deletes the old emails of the outbox (see moutbox.purge()).
+
+    This function is invoked once a day by run_scheduled(), in a background thread started in 
+    the function open_main_window in file ./gui/mainwindow.py, or from the command line 
+    (see the bottom of this file).
 
-    This function is first invoked in the function  open_main_window in file 
-    ./gui/mainwindow.py.
-    The function is then  invoked once a day. 
+    Parameters
+    ----------
+    days : list, optional
+        The days (datetime.date, in chronological order) for which the reminders are sent; the 
+        last one is the current date (default: [datetime.date.today()]). 
+        Several days are given to catch up the days on which the job didn't run.
 
+    Returns
+    -------
+    bool
+        True if the job succeeded, False otherwise.
     """
     ############ TODO: WRITE HERE THE CODE TO IMPLEMENT THIS FUNCTION ################
 
-    print("--- lancement de la gestion des délais ---")
-    
-    # 1 récupère toutes les inscriptions non payées
-    unpaid_regs = _unpaid_registrations()
-    
-    if not unpaid_regs:
-        print("aucune inscription non payée trouvée arrêt")
-        return
+    if days is None:
+        days = [datetime.date.today()]
 
-    # 2 identifie celles qui sont expirées
-    expired_regs = _expired_registrations(unpaid_regs)
+    print("--- lancement de la gestion des délais ---")
     
-    # 3 identifie celles dont le paiement est en retard (rappel à envoyer)
-    late_payment_regs = _late_payment_registrations(unpaid_regs)
+    # 1 identifie les inscriptions non payées dont la date limite approche
+    # et récupère les informations pour le rappel de paiement (une seule requête par jour)
+    late_payment_regs = []
+    for day in days:
+        late_payment_regs.extend(_late_payment_registrations(day))
+    _report("reminders", len(late_payment_regs))
     
-    # 4 supprime les inscriptions expirées
-    if expired_regs:
-        print(f"suppression de {len(expired_regs)} inscriptions expirées...")
-        res = _remove_expired_registrations(expired_regs)
-        if res[0]:
-            print("inscriptions expirées supprimées avec succès")
-        else:
-            print(f"échec de la suppression des inscriptions expirées: {res[1]}")
+    # 2 supprime les inscriptions expirées (une seule requête DELETE)
+    res = _remove_expired_registrations(days[-1])
+    if not res[0]:
+        print(f"échec de la suppression des inscriptions expirées: {res[2]}")
+        _report("error", str(res[2]))
+    else:
+        _report("expired", res[1])
+    if res[0] and res[1]:
+        print(f"{res[1]} inscriptions expirées supprimées avec succès")
     else:
         print("aucune inscription expirée à supprimer")
 
-    # 5 envoie un rappel pour les paiements en retard
+    # 3 envoie un rappel pour les paiements en retard
+    count = 0
     if late_payment_regs:
-        print(f"envoi de rappels à {len(late_payment_regs)} étudiants pour paiement tardif...")
-        _send_late_payment_reminder(late_payment_regs)
+        count = _send_late_payment_reminder(late_payment_regs)
+        if count is not None:
+            print(f"{count} rappels de paiement ajoutés à la table Outbox")
+        else:
+            _report("error", "the reminders could not be written into the outbox")
     else:
         print("aucun rappel de paiement tardif à envoyer")
+
+    # 4 supprime de la table Outbox les emails envoyés ou abandonnés depuis plus de RETENTION_DAYS jours
+    try:
+        purged = moutbox.purge(conn, cursor)
+        if purged:
+            print(f"{purged} anciens emails supprimés de la table Outbox")
+    except sqlite3.Error as e:
+        print(f"erreur lors du nettoyage de la table Outbox: {e}")
         
     print("--- gestion des délais terminée ---")
+    return res[0] and count is not None
     ####################################################################################
-  
\ No newline at end of file
+
+def run_scheduled(today=None, force=False):
+    """Runs deadline_management() if it hasn't run today, catching up the missed days.
+
+    The date of the last successful run is recorded in the table JobRun: the job runs once a day, 
+    even if several instances of the application share the database (see the module mscheduler).
+    The reminders of the missed days are sent only if their deadline hasn't expired yet 
+    (that is, at most REMINDER_DELAY days back); the registrations of the older days are expired.
+
+    Parameters
+    ----------
+    today : datetime.date, optional
+        The current date (default: datetime.date.today()).
+    force : bool, optional
+        If True, the job runs even if it has already run today (default: False).
+
+    Returns
+    -------
+    bool
+        True if the job ran successfully, False if it failed or didn't need to run.
+    """
+    if today is None:
+        today = datetime.date.today()
+
+    started, last_run = mscheduler.start_run(conn, cursor, JOB_NAME, today, force)
+    if not started:
+        print(f"la gestion des délais a déjà été faite aujourd'hui (dernière exécution : {last_run})")
+        _report("skipped")
+        return False
+
+    first_day = today - datetime.timedelta(days=REMINDER_DELAY)
+    if last_run is not None and last_run >= first_day:
+        first_day = min(today, last_run + datetime.timedelta(days=1))
+    days = [first_day + datetime.timedelta(days=i) for i in range((today - first_day).days + 1)]
+
+    succeeded = False
+    try:
+        succeeded = deadline_management(days)
+    finally:
+        if succeeded:
+            mscheduler.finish_run(conn, cursor, JOB_NAME, today)
+        else:
+            mscheduler.abort_run(conn, cursor, JOB_NAME)
+    return succeeded
+
+def _deadline_worker(db_file, config):
+    """Runs the deadline management job once a day, with its own database connection.
+
+    This function is the target of the thread started by start_deadline_management().
+
+    Parameters
+    ----------
+    db_file : string
+        The path to the database file (None: the path specified in the configuration).
+    config : dictionary
+        The application configuration (None: the configuration loaded from ./config/config).
+    """
+    retry_delay = RETRY_DELAY
+    while True:
+        # True when the job has run today (in this instance or in another one).
+        done = False
+        try:
+            # A SQLite connection can only be used by the thread that created it.
+            worker_conn = db.connect(db_file, config)
+            try:
+                deadline_management_init(None, worker_conn.cursor(), worker_conn)
+                if run_scheduled():
+                    _report("done")
+                done = mscheduler.last_run(cursor, JOB_NAME) == datetime.date.today()
+            finally:
+                worker_conn.close()
+            # The reminders are sent by the outbox sender, in its own thread: the job doesn't wait for 
+            # the mail relay.
+            moutbox.start_sender(db_file, config)
+        except Exception as e:
+            print(f"erreur lors de la gestion des délais: {e}")
+            _report("error", str(e))
+
+        if done:
+            # The job runs again tomorrow.
+            retry_delay = RETRY_DELAY
+            time.sleep(mscheduler.seconds_until_tomorrow())
+        else:
+            # A failed run is retried after a short delay, not tomorrow: a transient error 
+            # doesn't skip the reminders and the expiries of a whole day.
+            time.sleep(min(retry_delay, mscheduler.seconds_until_tomorrow()))
+            retry_delay = min(MAX_RETRY_DELAY, retry_delay * 2)
+
+def start_deadline_management(db_file=None, config=None):
+    """Runs the deadline management job once a day (see run_scheduled()) in a background thread.
+
+    The job opens its own connection to the database, so that the GUI thread is never blocked 
+    by the database scan, the deletions or the sending of the emails. The progress of the job 
+    is reported through a thread-safe queue, that the GUI can poll (e.g., with tk.after()).
+
+    Parameters
+    ----------
+    db_file : string, optional
+        The path to the database file (default: the path specified in the configuration).
+    config : dictionary, optional
+        The application configuration (default: the configuration loaded from ./config/config).
+
+    Returns
+    -------
+    A tuple T
+        T[0] is the thread running the job.
+        T[1] is the queue through which the job reports its progress (see the variable progress).
+    """
+    global progress
+
+    progress = queue.Queue()
+    # Daemon thread: closing the main window doesn't wait for the end of the job.
+    thread = threading.Thread(target=_deadline_worker, args=(db_file, config), name="deadline-management", daemon=True)
+    thread.start()
+    return (thread, progress)
+
+# Entry point of the deadline module: runs the deadline management job without the GUI 
+# (e.g., from a cron job), then sends the reminders of the outbox.
+# Usage: python mdeadline.py [--force]
+if __name__ == "__main__":
+
+    main_conn = db.connect()
+    main_cursor = main_conn.cursor()
+    if db.create_database(main_conn, main_cursor):
+        deadline_management_init(None, main_cursor, main_conn)
+        run_scheduled(force="--force" in sys.argv)
+        print(moutbox.drain(main_conn, main_cursor))
+    main_cursor.close()
+    main_conn.close()
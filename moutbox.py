@@ -0,0 +1,291 @@
+"""The outbox module.
+
+The emails sent by the application (e.g., the payment reminders of the deadline module) are not sent
+directly: they are first written into the table Outbox of the database (see add_messages()), then
+sent by a background sender (see start_sender()).
+
+* Writing an email into the outbox is fast: a slow or unavailable mail relay never slows down the
+  deadline job.
+* Each email has an idempotency key: an email with the key of an email already in the outbox
+  (pending or sent) is ignored, so that no email is sent twice, even if the deadline job runs
+  again after a restart.
+* The emails sent or abandoned are kept RETENTION_DAYS days, then deleted (see purge()): the
+  outbox doesn't grow without bound.
+* An email that can't be sent is retried later, with an exponential backoff (see BACKOFF_DELAY),
+  until MAX_ATTEMPTS attempts have failed.
+* An email in the outbox survives a crash or a restart of the application: the sender sends it
+  the next time it runs.
+
+When you run this file as a Python script, the instructions after the
+statement if __name__ == "__main__": are executed: the pending emails of the outbox are sent.
+"""
+
+import sqlite3
+import threading
+import time
+
+import db
+import mailer
+
+# Number of emails read from the outbox and sent in one batch.
+BATCH_SIZE = 100
+
+# Number of failed attempts after which an email is abandoned (status "failed").
+MAX_ATTEMPTS = 8
+
+# Delay (in seconds) before the second attempt to send an email; it doubles after each failed attempt.
+BACKOFF_DELAY = 60
+
+# Maximum delay (in seconds) between two attempts.
+MAX_BACKOFF_DELAY = 6 * 3600
+
+# Time (in seconds) during which the emails read by a sender are reserved: another sender
+# (e.g., another instance of the application using the same database) doesn't read them.
+LEASE = 300
+
+# Number of days during which the emails sent or abandoned are kept in the outbox (their idempotency 
+# keys prevent them from being written again during this time).
+RETENTION_DAYS = 30
+
+# The thread started by start_sender(), if any.
+_sender_thread = None
+
+# Protects the variable _sender_thread.
+_sender_lock = threading.Lock()
+
+def add_messages(messages, cursor):
+    """Writes emails into the outbox.
+
+    This function doesn't commit: the caller is in charge of the transaction.
+
+    Parameters
+    ----------
+    messages : list
+        Each item of the list is a tuple (idempotency_key, recipient, subject, body).
+        An email whose idempotency key is already in the outbox is ignored.
+    cursor :
+        The object used to query the database.
+
+    Returns
+    -------
+    int
+        The number of emails actually written into the outbox.
+    """
+    now = time.time()
+    before = cursor.connection.total_changes
+    cursor.executemany("""
+        INSERT OR IGNORE INTO Outbox (idempotency_key, recipient, subject, body, next_attempt, created_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, [(key, recipient, subject, body, now, now) for key, recipient, subject, body in messages])
+    return cursor.connection.total_changes - before
+
+def _backoff(attempts):
+    """Returns the delay (in seconds) before the next attempt, after the given number of failed attempts.
+    """
+    return min(MAX_BACKOFF_DELAY, BACKOFF_DELAY * 2 ** (attempts - 1))
+
+def _claim(conn, cursor, now, batch_size):
+    """Reads a batch of due emails and reserves them for LEASE seconds.
+
+    The emails are read and reserved in the same write transaction (BEGIN IMMEDIATE), so that
+    two senders never read the same email. If a sender stops before the end of the lease, the 
+    emails are sent again by the next sender: an email may be sent twice only in this case.
+
+    Returns
+    -------
+    list
+        Each item of the list is a tuple (id, recipient, subject, body, attempts).
+    """
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        cursor.execute("""
+            SELECT id, recipient, subject, body, attempts FROM Outbox
+            WHERE status = 'pending' AND next_attempt <= ?
+            ORDER BY next_attempt LIMIT ?
+        """, (now, batch_size))
+        batch = cursor.fetchall()
+        cursor.executemany("UPDATE Outbox SET next_attempt = ? WHERE id = ?", [(now + LEASE, row[0]) for row in batch])
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    conn.commit()
+    return batch
+
+def drain(conn, cursor, settings=None, batch_size=BATCH_SIZE):
+    """Sends all the emails of the outbox whose next attempt is due.
+
+    Parameters
+    ----------
+    conn :
+        The object used to connect to the database.
+    cursor :
+        The object used to query the database.
+    settings : dictionary, optional
+        The settings of the mail relay (default: mailer.load_settings()).
+    batch_size : int, optional
+        The number of emails sent in one batch (default: BATCH_SIZE).
+
+    Returns
+    -------
+    dictionary
+        "sent": the number of emails sent.
+        "retried": the number of emails that could not be sent and will be retried later.
+        "abandoned": the number of emails that could not be sent and won't be retried.
+    """
+    if settings is None:
+        settings = mailer.load_settings()
+
+    counts = {"sent": 0, "retried": 0, "abandoned": 0}
+    while True:
+        batch = _claim(conn, cursor, time.time(), batch_size)
+        if not batch:
+            break
+
+        report = mailer.send_messages([(recipient, subject, body) for _, recipient, subject, body, _ in batch],
+            settings=settings)
+
+        now = time.time()
+        sent, retried, abandoned = [], [], []
+        for (outbox_id, _, _, _, attempts), error in zip(batch, report["errors"]):
+            if error is None:
+                sent.append((attempts + 1, now, outbox_id))
+            elif attempts + 1 >= MAX_ATTEMPTS:
+                abandoned.append((attempts + 1, error, outbox_id))
+            else:
+                retried.append((attempts + 1, now + _backoff(attempts + 1), error, outbox_id))
+
+        cursor.execute("BEGIN")
+        try:
+            cursor.executemany("UPDATE Outbox SET status = 'sent', attempts = ?, sent_at = ?, last_error = NULL \
+                WHERE id = ?", sent)
+            cursor.executemany("UPDATE Outbox SET status = 'failed', attempts = ?, last_error = ? WHERE id = ?", abandoned)
+            cursor.executemany("UPDATE Outbox SET attempts = ?, next_attempt = ?, last_error = ? WHERE id = ?", retried)
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        conn.commit()
+
+        counts["sent"] += len(sent)
+        counts["retried"] += len(retried)
+        counts["abandoned"] += len(abandoned)
+    return counts
+
+def purge(conn, cursor, retention_days=RETENTION_DAYS, now=None):
+    """Deletes the emails sent or abandoned more than retention_days days ago.
+
+    The pending emails are never deleted.
+
+    Parameters
+    ----------
+    conn :
+        The object used to connect to the database.
+    cursor :
+        The object used to query the database.
+    retention_days : int, optional
+        The number of days during which the emails are kept (default: RETENTION_DAYS).
+    now : float, optional
+        The current time, in seconds since the epoch (default: time.time()).
+
+    Returns
+    -------
+    int
+        The number of deleted emails.
+    """
+    if now is None:
+        now = time.time()
+    cursor.execute("BEGIN")
+    try:
+        # An abandoned email has no sending time: its creation time is used instead.
+        cursor.execute("DELETE FROM Outbox WHERE status != 'pending' AND IFNULL(sent_at, created_at) < ?",
+            (now - retention_days * 24 * 3600,))
+        count = cursor.rowcount
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    conn.commit()
+    return count
+
+def next_attempt(cursor):
+    """Returns the time (seconds since the epoch) of the next attempt to send a pending email.
+
+    Returns
+    -------
+    float
+        The time of the next attempt, None if the outbox has no pending email.
+    """
+    cursor.execute("SELECT MIN(next_attempt) FROM Outbox WHERE status = 'pending'")
+    return cursor.fetchone()[0]
+
+def _sender_worker(db_file, config):
+    """Sends the emails of the outbox until no email is pending.
+
+    This function is the target of the thread started by start_sender(). When the remaining
+    emails must be retried later, the thread sleeps until the next attempt is due.
+    """
+    global _sender_thread
+
+    try:
+        # A SQLite connection can only be used by the thread that created it.
+        conn = db.connect(db_file, config)
+        cursor = conn.cursor()
+        try:
+            settings = mailer.load_settings(config)
+            while True:
+                counts = drain(conn, cursor, settings)
+                if counts["sent"] or counts["retried"] or counts["abandoned"]:
+                    print("Outbox: {sent} email(s) sent, {retried} to retry, {abandoned} abandoned".format(**counts))
+                # The outbox is checked with the lock held: an email added after this check
+                # is sent by a new sender (see start_sender()).
+                with _sender_lock:
+                    due = next_attempt(cursor)
+                    if due is None:
+                        _sender_thread = None
+                        break
+                time.sleep(max(1.0, due - time.time()))
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        print("An error occurred while sending the emails of the outbox: {}".format(e))
+    except Exception as e:
+        # E.g., an error of the mail relay (OSError, smtplib.SMTPException) that was not handled by the mailer.
+        print("An unexpected error occurred while sending the emails of the outbox: {!r}".format(e))
+    finally:
+        # Whatever the way the sender stops, the next call to start_sender() starts a new one.
+        with _sender_lock:
+            if _sender_thread is threading.current_thread():
+                _sender_thread = None
+
+def start_sender(db_file=None, config=None):
+    """Starts the background sender of the outbox, unless it is already running.
+
+    Parameters
+    ----------
+    db_file : string, optional
+        The path to the database file (default: the path specified in the configuration).
+    config : dictionary, optional
+        The application configuration (default: the configuration loaded from ./config/config).
+
+    Returns
+    -------
+    threading.Thread
+        The thread of the sender.
+    """
+    global _sender_thread
+
+    with _sender_lock:
+        if _sender_thread is None:
+            # Daemon thread: the pending emails are sent the next time the application runs.
+            _sender_thread = threading.Thread(target=_sender_worker, args=(db_file, config), name="outbox-sender",
+                daemon=True)
+            _sender_thread.start()
+        return _sender_thread
+
+# Entry point of the outbox module: sends the pending emails whose next attempt is due.
+if __name__ == "__main__":
+
+    conn = db.connect()
+    cursor = conn.cursor()
+    db.create_database(conn, cursor)
+    print(drain(conn, cursor))
+    cursor.close()
+    conn.close()
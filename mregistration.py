@@ -3,11 +3,19 @@
 It provides the functions necessary to register students to a Skisati edition and manage all the information 
 related to the registrations.
 
+The registration and payment dates are stored in the format yyyy-mm-dd, so that they sort (and can be 
+filtered with an index) as strings. The GUI converts them from and to dd/mm/yyyy 
+(see utils.to_iso_date() and utils.to_display_date()).
+
 This module is already implemented!
 """
 
+import datetime
 import sqlite3
 
+# Number of days given to a student to pay a registration.
+PAYMENT_DELAY = 5
+
 # Code for an unexpected error in the database.
 UNEXPECTED_ERROR = -1
 
@@ -55,7 +63,8 @@ def get_student_registrations(stud_number, cursor):
     Returns
     -------
     A list.
-        Each item of the list is a tuple (year, registration_date, payment_date).
+        Each item of the list is a tuple (year, registration_date, payment_date); the dates are 
+        in the format yyyy-mm-dd.
         If a database error occurs, the function returns None.
 
     """
@@ -96,6 +105,26 @@ def add_skisati_edition(edition_year, registration_fee, cursor):
         return (False, UNEXPECTED_ERROR, error)
     return (True, None, None)
 
+def payment_deadline(registration_date):
+    """Returns the payment deadline of a registration, as stored in the column payment_deadline.
+
+    Parameters
+    ----------
+    registration_date : string
+        The registration date (yyyy-mm-dd).
+
+    Returns
+    -------
+    string
+        The payment deadline (yyyy-mm-dd), that is the registration date plus PAYMENT_DELAY days.
+        None if the registration date is not valid.
+    """
+    try:
+        date = datetime.date.fromisoformat(str(registration_date))
+    except ValueError:
+        return None
+    return (date + datetime.timedelta(days=PAYMENT_DELAY)).isoformat()
+
 def add_registration(stud_number, edition_year, registration_date, cursor, payment_date=None):
     """Adds a new student registration to a specified Skisati edition.
 
@@ -106,11 +135,11 @@ def add_registration(stud_number, edition_year, registration_date, cursor, payme
     edition_year : string
         The Skisati edition year.
     registration_date : string
-        The registration date.
+        The registration date (yyyy-mm-dd).
     cursor : 
         The object used to query the database. 
     payment_date : string, optional
-        The payment date (default: None).
+        The payment date (yyyy-mm-dd, default: None).
 
     Returns
     -------
@@ -123,7 +152,8 @@ def add_registration(stud_number, edition_year, registration_date, cursor, payme
     
     """
     try:
-        cursor.execute("INSERT INTO Registration  VALUES(?, ?, ?, ?)", (stud_number, edition_year, registration_date, payment_date))
+        cursor.execute("INSERT INTO Registration (stud_number, year, registration_date, payment_date, payment_deadline) \
+            VALUES(?, ?, ?, ?, ?)", (stud_number, edition_year, registration_date, payment_date, payment_deadline(registration_date)))
     except sqlite3.IntegrityError as error:
         print(error)
         return (False, DUPLICATE_REGISTRATION_ERROR, edition_year)
@@ -160,6 +190,44 @@ def delete_registration(stud_number, edition_year, cursor):
     return (True, None, None)
 
 
+def delete_registrations(registrations, cursor):
+    """Deletes many registrations with a single DELETE statement.
+
+    The keys of the registrations are written to a temporary table, which is then joined 
+    with the table Registration. Like delete_registration(), this function doesn't commit: 
+    the caller is in charge of the transaction.
+
+    Parameters
+    ----------
+    registrations : list
+        Each item of the list is a tuple (stud_number, edition_year, ...); the other items 
+        of the tuple, if any, are ignored.
+    cursor : 
+        The object used to query the database. 
+    
+    Returns
+    -------
+    A tuple. 
+        (True, count, None) if no error occurs, where count is the number of deleted registrations.
+        (False, UNEXPECTED_ERROR, error) if an unexpected database error occurs. The detail of the error is in the 
+        variable error.
+
+    """
+    try:
+        cursor.execute("CREATE TEMP TABLE IF NOT EXISTS deleted_registration \
+            (stud_number INTEGER, year TEXT, PRIMARY KEY (stud_number, year))")
+        cursor.execute("DELETE FROM temp.deleted_registration")
+        cursor.executemany("INSERT OR IGNORE INTO temp.deleted_registration VALUES (?, ?)", 
+            [(registration[0], registration[1]) for registration in registrations])
+        cursor.execute("DELETE FROM Registration WHERE (stud_number, year) IN \
+            (SELECT stud_number, year FROM temp.deleted_registration)")
+        count = cursor.rowcount
+        cursor.execute("DELETE FROM temp.deleted_registration")
+    except sqlite3.Error as error:
+        print(error)
+        return (False, UNEXPECTED_ERROR, error)
+    return (True, count, None)
+
 def update_registration_date(stud_number, edition_year, registration_date, cursor):
     """Edits the registration date of a specific student registration.
 
@@ -170,7 +238,7 @@ def update_registration_date(stud_number, edition_year, registration_date, curso
     edition_year : string
         The Skisati edition year.
     registration_date : string
-        The registration date.
+        The registration date (yyyy-mm-dd).
     cursor : 
         The object used to query the database. 
     
@@ -182,8 +250,8 @@ def update_registration_date(stud_number, edition_year, registration_date, curso
         variable error.
     """
     try:
-        cursor.execute("UPDATE registration SET registration_date=? \
-            WHERE stud_number=? AND year=?", (registration_date, stud_number, edition_year))
+        cursor.execute("UPDATE registration SET registration_date=?, payment_deadline=? \
+            WHERE stud_number=? AND year=?", (registration_date, payment_deadline(registration_date), stud_number, edition_year))
     except sqlite3.Error as error:
         print(error)
         return (False, UNEXPECTED_ERROR, error)
@@ -199,7 +267,7 @@ def update_payment_date(stud_number, edition_year, payment_date, cursor):
     edition_year : string
         The Skisati edition year.
     payment_date : string
-        The payment date.
+        The payment date (yyyy-mm-dd, None if the registration is not paid).
     cursor : 
         The object used to query the database. 
     
@@ -0,0 +1,139 @@
+"""The scheduler module.
+
+It runs the daily jobs of the application (e.g., the deadline management job) exactly once a day,
+even when several instances of the application share the same database:
+
+* The date of the last successful run of each job is recorded in the table JobRun, so that the
+  days on which the application wasn't running can be caught up.
+* Before running a job, an instance takes a lease on it (see start_run()). Another instance
+  doesn't run the job while the lease is held, nor after the job has been run for the day.
+  If an instance stops during a run, its lease expires after LEASE seconds and the job can run again.
+"""
+
+import datetime
+import os
+import socket
+import sqlite3
+import time
+
+# Duration (in seconds) of the lease taken by an instance that runs a job.
+LEASE = 3600
+
+# Identifies the instance of the application that holds a lease.
+OWNER = "{}:{}".format(socket.gethostname(), os.getpid())
+
+def start_run(conn, cursor, job, today=None, force=False):
+    """Takes the lease on a job, if the job must run today.
+
+    The job must run if it hasn't run successfully today and no other instance holds the lease.
+
+    Parameters
+    ----------
+    conn :
+        The object used to connect to the database.
+    cursor :
+        The object used to query the database.
+    job : string
+        The name of the job.
+    today : datetime.date, optional
+        The current date (default: datetime.date.today()).
+    force : bool, optional
+        If True, the job runs even if it has already run today (default: False).
+        The lease held by another instance is always respected.
+
+    Returns
+    -------
+    A tuple T
+        T[0] is True if the lease was taken (the caller must run the job, then call finish_run() or abort_run()),
+        False otherwise.
+        T[1] is the date of the last successful run (None if the job has never run).
+    """
+    if today is None:
+        today = datetime.date.today()
+    now = time.time()
+
+    # The row is read and updated in the same write transaction: two instances can't take the lease together.
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        cursor.execute("INSERT OR IGNORE INTO JobRun (job) VALUES (?)", (job,))
+        cursor.execute("SELECT last_run, locked_until, owner FROM JobRun WHERE job = ?", (job,))
+        last_run, locked_until, owner = cursor.fetchone()
+        last_run = datetime.date.fromisoformat(last_run) if last_run else None
+
+        if (locked_until is not None and locked_until > now and owner != OWNER) or \
+                (not force and last_run is not None and last_run >= today):
+            conn.rollback()
+            return (False, last_run)
+
+        cursor.execute("UPDATE JobRun SET locked_until = ?, owner = ? WHERE job = ?", (now + LEASE, OWNER, job))
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    conn.commit()
+    return (True, last_run)
+
+def finish_run(conn, cursor, job, today=None):
+    """Records the successful run of a job and releases the lease.
+
+    Parameters
+    ----------
+    conn :
+        The object used to connect to the database.
+    cursor :
+        The object used to query the database.
+    job : string
+        The name of the job.
+    today : datetime.date, optional
+        The date of the run (default: datetime.date.today()).
+    """
+    if today is None:
+        today = datetime.date.today()
+    cursor.execute("UPDATE JobRun SET last_run = ?, locked_until = NULL, owner = NULL WHERE job = ? AND owner = ?",
+        (today.isoformat(), job, OWNER))
+    conn.commit()
+
+def abort_run(conn, cursor, job):
+    """Releases the lease on a job after a failed run (the job will run again).
+
+    Parameters
+    ----------
+    conn :
+        The object used to connect to the database.
+    cursor :
+        The object used to query the database.
+    job : string
+        The name of the job.
+    """
+    cursor.execute("UPDATE JobRun SET locked_until = NULL, owner = NULL WHERE job = ? AND owner = ?", (job, OWNER))
+    conn.commit()
+
+def last_run(cursor, job):
+    """Returns the date of the last successful run of a job.
+
+    Parameters
+    ----------
+    cursor :
+        The object used to query the database.
+    job : string
+        The name of the job.
+
+    Returns
+    -------
+    datetime.date
+        The date of the last successful run (None if the job has never run).
+    """
+    cursor.execute("SELECT last_run FROM JobRun WHERE job = ?", (job,))
+    row = cursor.fetchone()
+    return datetime.date.fromisoformat(row[0]) if row is not None and row[0] else None
+
+def seconds_until_tomorrow(margin=60):
+    """Returns the number of seconds until the next day (plus a margin).
+
+    Parameters
+    ----------
+    margin : int, optional
+        The number of seconds added after midnight (default: 60).
+    """
+    now = datetime.datetime.now()
+    tomorrow = datetime.datetime.combine(now.date() + datetime.timedelta(days=1), datetime.time())
+    return (tomorrow - now).total_seconds() + margin
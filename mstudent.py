@@ -13,6 +13,7 @@ When you're done implementing a function, you can run this file as a Python scri
 """
 
 import sqlite3
+import db
 import utils
 
 # Code for an unexpected error in the database.
@@ -74,36 +75,206 @@ def get_student(stud_number, cursor):
     """
     ################ TODO: WRITE HERE THE CODE OF THE FUNCTION ##################
     
+    student = get_student_with_memberships(stud_number, cursor)
+    if not student:
+        # None (database error) or empty tuple (no student).
+        return student
+    return student[:5]
+
+    # AFTER YOU FINISH THE IMPLEMENTATION OF THIS FUNCTION, RUN THIS FILE AS A PYTHON
+    # SCRIPT. THIS WILL TRIGGER THE TEST test_get_student().
+    
+    ##############################################################################
+    
+def test_get_student_with_memberships(cursor, conn):
+    """Tests the function get_student_with_memberships
+
+    Parameters
+    ----------
+    cursor :
+        The object used to query the database.
+    conn :
+        The object used to connect to the database.
+    """
     try:
-        cursor.execute("""
-            SELECT stud_number, first_name, last_name, gender 
-            FROM Student 
-            WHERE stud_number = ?
-        """, (stud_number,))
-        
+        # Non-existing student
+        stud = get_student_with_memberships(1234, cursor)
+        assert len(stud) == 0, "when a student doesn't exist, the return tuple must be empty"
+
+        # Existing student
+        stud = get_student_with_memberships(7719175, cursor)
+        assert stud[:5] == get_student(7719175, cursor), "the first five items must be the ones returned by get_student"
+        assert sorted(stud[4]) == sorted(get_email_addresses(7719175, cursor)), \
+            "the fifth item of the returned tuple must be the list of email addresses"
+        assert sorted(stud[5]) == sorted(get_memberships(7719175, cursor)), \
+            "the sixth item of the returned tuple must be the list returned by get_memberships"
+
+        # An empty role and a missing (NULL) role must be returned as they are stored.
+        cursor.execute("BEGIN")
+        asso_names = [membership[0] for membership in get_memberships(7719175, cursor)]
+        cursor.execute("UPDATE membership SET stud_role = '' WHERE stud_number = ? AND asso_name = ?", 
+            (7719175, asso_names[0]))
+        cursor.execute("UPDATE membership SET stud_role = NULL WHERE stud_number = ? AND asso_name = ?", 
+            (7719175, asso_names[1]))
+        stud = get_student_with_memberships(7719175, cursor)
+        memberships = get_memberships(7719175, cursor)
+        conn.rollback()
+        assert sorted(stud[5], key=lambda x: x[0]) == sorted(memberships, key=lambda x: x[0]), \
+            "an empty role and a NULL role must be returned as by get_memberships"
+        print("The function get_student_with_memberships is CORRECT! Great job!\n\n")
+    except NotImplementedError:
+        pass
+
+# Separators used to aggregate the email addresses and the memberships of a student in a single value.
+# These control characters can't appear in an email address, an association name or a role typed in the GUI.
+_ITEM_SEPARATOR = "\x1f"
+_FIELD_SEPARATOR = "\x1e"
+
+# Query that loads students with their email addresses and memberships. The email addresses and 
+# the memberships are aggregated in SQL by two correlated subqueries (each uses an index on 
+# stud_number), so that a student is loaded in one round trip. The WHERE clause is appended by 
+# the caller.
+# A membership is aggregated as asso_name + _FIELD_SEPARATOR + stud_role, or as asso_name alone 
+# when the role is NULL: an empty role and a NULL role are both loaded as they are stored.
+_STUDENT_QUERY = """
+    SELECT s.stud_number, s.first_name, s.last_name, s.gender,
+        (SELECT group_concat(e.email, char(31)) 
+            FROM EmailAddress e WHERE e.stud_number = s.stud_number),
+        (SELECT group_concat(m.asso_name || IFNULL(char(30) || m.stud_role, ''), char(31)) 
+            FROM membership m WHERE m.stud_number = s.stud_number)
+    FROM Student s
+"""
+
+# Maximum number of student numbers in the IN list of one query of get_students() 
+# (SQLite versions older than 3.32 accept at most 999 parameters per statement).
+STUDENTS_CHUNK_SIZE = 900
+
+def _student_from_row(row):
+    """Builds the tuple returned by get_student_with_memberships() from a row of _STUDENT_QUERY.
+    """
+    emails = row[4].split(_ITEM_SEPARATOR) if row[4] is not None else []
+    memberships = []
+    if row[5] is not None:
+        for item in row[5].split(_ITEM_SEPARATOR):
+            fields = item.split(_FIELD_SEPARATOR, 1)
+            memberships.append((fields[0], fields[1] if len(fields) > 1 else None))
+    return (row[0], row[1], row[2], row[3], emails, memberships)
+
+def get_student_with_memberships(stud_number, cursor):
+    """Loads the student with the given number, their email addresses and their memberships 
+    with a single query.
+
+    Parameters
+    ----------
+    stud_number : int
+        The student number.
+    cursor : 
+        The object used to query the database.
+    
+    Returns
+    -------
+    A tuple
+        T[0] to T[4] are the items returned by get_student().
+        T[5] is a (possibly, empty) list of (asso_name, stud_role) tuples, as returned by get_memberships().
+    
+    If no student can be found, the tuple T is empty.
+
+    If an error occurs while querying the database, the function returns None.
+    """
+    try:
+        cursor.execute(_STUDENT_QUERY + " WHERE s.stud_number = ?", (stud_number,))
         row = cursor.fetchone()
 
         if row is None:
             return ()
+        return _student_from_row(row)
 
-        cursor.execute("""
-            SELECT email 
-            FROM EmailAddress 
-            WHERE stud_number = ?
-        """, (stud_number,))
-        
-        emails = [email_row[0] for email_row in cursor.fetchall()]
+    except sqlite3.Error:
+        return None
+
+def test_get_students(cursor):
+    """Tests the function get_students
+
+    Parameters
+    ----------
+    cursor :
+        The object used to query the database.
+    """
+    try:
+        stud_numbers = [row[0] for row in cursor.execute("SELECT stud_number FROM Student").fetchall()]
+
+        # Non-existing students are not in the dictionary.
+        students = get_students([1234] + stud_numbers, cursor, chunk_size=7)
+        assert 1234 not in students, "a student that doesn't exist must not be in the returned dictionary"
+        assert len(students) == len(stud_numbers), "all the existing students must be in the returned dictionary"
+        for stud_number in stud_numbers:
+            assert students[stud_number] == get_student_with_memberships(stud_number, cursor), \
+                "the value of a student must be the tuple returned by get_student_with_memberships"
+        assert get_students([], cursor) == {}, "no student number, no student"
+        print("The function get_students is CORRECT! Great job!\n\n")
+    except NotImplementedError:
+        pass
 
-        return (row[0], row[1], row[2], row[3], emails)
+def get_students(stud_numbers, cursor, chunk_size=STUDENTS_CHUNK_SIZE):
+    """Loads many students, their email addresses and their memberships at once.
+
+    The students are loaded with one query per chunk of chunk_size student numbers, 
+    instead of one query per student.
+    This is the batch API of the module: get_student_with_memberships() loads one student.
+
+    Parameters
+    ----------
+    stud_numbers : iterable of int
+        The student numbers. Duplicates are ignored.
+    cursor : 
+        The object used to query the database.
+    chunk_size : int, optional
+        The maximum number of student numbers per query (default: STUDENTS_CHUNK_SIZE).
+    
+    Returns
+    -------
+    dict
+        The keys are the numbers of the students found in the database, the values are the 
+        tuples returned by get_student_with_memberships(). The numbers of the students that 
+        can't be found are not in the dictionary.
+
+    If an error occurs while querying the database, the function returns None.
+    """
+    stud_numbers = list(dict.fromkeys(stud_numbers))
+    students = {}
+    try:
+        for start in range(0, len(stud_numbers), chunk_size):
+            chunk = stud_numbers[start:start + chunk_size]
+            cursor.execute(_STUDENT_QUERY + " WHERE s.stud_number IN ({})".format(",".join("?" * len(chunk))), 
+                chunk)
+            for row in cursor.fetchall():
+                students[row[0]] = _student_from_row(row)
+        return students
 
     except sqlite3.Error:
         return None
 
-    # AFTER YOU FINISH THE IMPLEMENTATION OF THIS FUNCTION, RUN THIS FILE AS A PYTHON
-    # SCRIPT. THIS WILL TRIGGER THE TEST test_get_student().
-    
-    ##############################################################################
-    
+def get_email_addresses(stud_number, cursor):
+    """Get all the email addresses of a student.
+
+    Parameters
+    ----------
+    stud_number : int
+        The student number.
+    cursor : 
+        The object used to query the database.
+
+    Returns
+    -------
+    A (possibly, empty) list of email addresses.
+
+    If an error occurs while querying the database, the function returns None.
+    """
+    try:
+        cursor.execute("SELECT email FROM EmailAddress WHERE stud_number = ?", (stud_number,))
+        return [row[0] for row in cursor.fetchall()]
+    except sqlite3.Error:
+        return None
 
 def test_get_associations(cursor):
     """Tests the function get_associations
@@ -963,11 +1134,7 @@ if __name__ == '__main__':
     config = utils.load_config()
 
     # Connects to the database.
-    app_config = utils.load_config()
-    db_file = app_config["db"]
-    conn = sqlite3.connect(db_file)
-    # Enables the foreign key contraints support in SQLite.
-    conn.execute("PRAGMA foreign_keys = 1")
+    conn = db.connect(config=config)
     
     # Get the cursor for the connection. This object is used to execute queries 
     # in the database.
@@ -976,6 +1143,8 @@ if __name__ == '__main__':
     ###################### CALLING HERE THE TEST FUNCTIONS ##########################
     
     test_get_student(cursor)
+    test_get_student_with_memberships(cursor, conn)
+    test_get_students(cursor)
     test_get_associations(cursor)
     test_get_roles(cursor)
     test_get_memberships(cursor)
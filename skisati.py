@@ -31,7 +31,7 @@ database and stops its execution.
 """
 
 import tkinter as tk
-import sqlite3
+import db
 import utils
 from gui.mainwindow import open_main_window
 from gui.login import open_login_window
@@ -43,9 +43,7 @@ config = utils.load_config()
 messages_bundle = utils.load_messages_bundle(config["bundle"] + config["lang"])
 
 # Connects to the database.
-conn = sqlite3.connect(config["db"])
-# Enables the foreign key contraints support in SQLite.
-conn.execute("PRAGMA foreign_keys = 1")
+conn = db.connect(config=config)
 # Get the cursor for the connection. This object is used to execute queries 
 # in the database.
 cursor = conn.cursor()
@@ -4,10 +4,11 @@ called in different points of the application.
 """
 
 from datetime import datetime, date
-from PIL import Image, ImageTk
 import re
 import csv
 
+import assets
+
 def load_config():
     """Loads the application configuration from the file into a dictionary.
 
@@ -85,14 +86,17 @@ def load_messages_bundle(messages_bundle_file):
 
     return messages_bundle
 
-def load_check_image():
+def load_check_image(master=None):
     """Loads the image used to indicate that a field contains a correct value.
-    
+
+    The image is decoded and resized once (see assets.py): the tabs opened later share it.
+
+    Parameters
+    ----------
+    master : tkinter widget, optional
+        A widget of the window where the image is shown (default: None).
     """
-    check_image = Image.open("./gui/icons/check-128.png")
-    check_image = check_image.resize((20, 20), Image.ANTIALIAS)
-    check_image = ImageTk.PhotoImage(check_image)
-    return check_image
+    return assets.load_image("./gui/icons/check-128.png", (20, 20), master=master)
 
 def get_date(date):
     """Returns a datetime object from the given date.
@@ -114,7 +118,49 @@ def get_date(date):
         date_obj = datetime.strptime(date, "%d/%m/%Y")
     except ValueError:
         pass
-    return date_obj  
+    return date_obj
+
+def to_iso_date(date):
+    """Converts a date typed in the GUI into the format stored in the database.
+
+    The registration and payment dates are stored as yyyy-mm-dd: in this format,
+    the dates sort (and can be compared) as strings, so they can be filtered with an index.
+
+    Parameters
+    ----------
+    date : string
+        A date (format dd/mm/yyyy).
+
+    Returns
+    -------
+    string
+        The date in the format yyyy-mm-dd.
+        The function returns None if the given date is empty or not in the right format.
+    """
+    date_obj = get_date(date)
+    return None if date_obj is None else date_obj.date().isoformat()
+
+def to_display_date(date):
+    """Converts a date read from the database into the format displayed in the GUI.
+
+    Parameters
+    ----------
+    date : string
+        A date (format yyyy-mm-dd), possibly None or empty.
+
+    Returns
+    -------
+    string
+        The date in the format dd/mm/yyyy.
+        The function returns an empty string if the given date is None or empty;
+        a date that is not in the format yyyy-mm-dd is returned as is.
+    """
+    if not date:
+        return ""
+    try:
+        return datetime.strptime(date, "%Y-%m-%d").strftime("%d/%m/%Y")
+    except ValueError:
+        return date
 
 def is_valid_date(date, empty=True):
     """Returns whether the given date is valid or not.
@@ -294,7 +340,7 @@ if __name__ == "__main__":
             and (config["auth"] == "yes" or config["auth"] == "no")
 
         messages_bundle = load_messages_bundle(config["bundle"] + config["lang"])
-        assert len(messages_bundle) == 63 \
+        assert len(messages_bundle) == 70 \
             and (messages_bundle["add_registration"] == "Add registration" or 
                     messages_bundle["add_registration"] == "Ajouter une inscription")
         print("YOUR IMPLEMENTATION OF load_config() AND load_messages_bundle() IS CORRECT!")